@@ -4,26 +4,30 @@ FIXED: KeyError for donor_position
 """
 
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import base64
-import re
-import sys
+import io
 import os
+import threading
+import time
 from pathlib import Path
 
-# Add current directory to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# pandas and plotly are imported where a table, chart or download is built
 
 try:
-    from dna_analyzer_advanced import AdvancedDNAAnalyzer
+    from splice_junction import __version__
+    from splice_junction.analyzer_registry import get_analyzer, warm_up
+    from splice_junction.branch_point import DEFAULT_MIN_PYRIMIDINE_FRACTION
+    from splice_junction.result_cache import ResultCache
+    from splice_junction.instrumentation import PrometheusTextfileSink
+    from splice_junction.sequence_ingest import SequenceValidationError, ingest_sequence, iter_fasta_records
+    from splice_junction.intron_pairing import DEFAULT_MIN_INTRON_SCORE
+    from splice_junction.result_export import EXPORT_FORMATS, EXPORT_TABLES, SPOOL_BYTES
+    from splice_junction.window_tracks import DEFAULT_TRACK_WINDOW, compute_tracks, downsample_index
     ANALYZER_AVAILABLE = True
 except ImportError:
     ANALYZER_AVAILABLE = False
-    st.error("❌ dna_analyzer_advanced.py not found. Please create it in the same directory.")
+    __version__ = 'unknown'
+    st.error("❌ splice_junction package not found. Run the app from the repository root.")
 
 
 st.set_page_config(
@@ -35,6 +39,69 @@ st.set_page_config(
 
 
 
+CACHE_DIR = Path(os.environ.get(
+    'SPLICE_CACHE_DIR', Path(os.path.dirname(os.path.abspath(__file__))) / '.cache' / 'results'
+))
+# Full exports are written here rather than held in the Streamlit session
+EXPORT_DIR = Path(os.environ.get('SPLICE_EXPORT_DIR', CACHE_DIR.parent / 'exports'))
+
+
+@st.cache_resource
+def get_result_cache():
+    """One result cache per server process, shared by every session"""
+    return ResultCache(disk_dir=CACHE_DIR)
+
+
+@st.cache_resource
+def get_metrics_sink():
+    """Prometheus textfile sink when SPLICE_METRICS_FILE is set, otherwise None"""
+    path = os.environ.get('SPLICE_METRICS_FILE')
+    return PrometheusTextfileSink(path) if path else None
+
+
+# Settings a session starts with; the warmed-up analyzer is the one for these
+DEFAULT_ANALYZER_SETTINGS = {'both_strands': False, 'profile': None,
+                             'min_pyrimidine_fraction': None, 'require_branch_point': False}
+
+
+@st.cache_resource
+def start_warm_up():
+    """Warm up the default shared analyzer once per server process, off the page's thread"""
+    thread = threading.Thread(target=warm_up, kwargs=dict(
+        cache=get_result_cache(), metrics_sink=get_metrics_sink(), **DEFAULT_ANALYZER_SETTINGS
+    ), name='analyzer-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def use_analyzer(**changes):
+    """This session's analyzer: the process-wide one for its settings, after applying changes"""
+    settings = st.session_state.setdefault('analyzer_settings', dict(DEFAULT_ANALYZER_SETTINGS))
+    settings.update(changes)
+    analyzer = get_analyzer(cache=get_result_cache(), metrics_sink=get_metrics_sink(), **settings)
+    st.session_state['analyzer'] = analyzer
+    return analyzer
+
+
+@st.cache_resource(max_entries=2, show_spinner="Indexing annotation...")
+def get_annotation_index(data: bytes, name: str):
+    """Interval index of an uploaded GTF, shared by every session that uploads it"""
+    from splice_junction.annotation_compare import load_gtf
+    
+    return load_gtf(io.BytesIO(data), compression='gzip' if name.endswith('.gz') else None)
+
+
+@st.cache_resource(max_entries=2, show_spinner="Building motif index...")
+def get_motif_index(source: tuple, _data: bytes):
+    """Suffix-array index over every record of FASTA bytes, shared by every session that searches them
+    
+    Cached by the cheap source key alone; the bytes themselves are never hashed.
+    """
+    from splice_junction.motif_index import MotifIndex
+    
+    return MotifIndex.from_text(_data)
+
+
 def load_css():
     """Load custom CSS styles"""
     st.markdown("""
@@ -85,12 +152,279 @@ def load_css():
     </style>
     """, unsafe_allow_html=True)
 
-def create_download_link(df, filename, text):
-    """Generate a download link for DataFrame"""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
+def export_formats():
+    """Export formats usable here; Parquet and Arrow need pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return ['csv']
+    return list(EXPORT_FORMATS)
+
+def write_full_export(analyzer, sequence, table, fmt, min_intron_score=None):
+    """Write one export table to a new file under EXPORT_DIR, batch by batch; returns its path"""
+    import tempfile
+    
+    extension = EXPORT_FORMATS[fmt][1]
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=EXPORT_DIR, prefix=f"dna_analysis_{table}_",
+                                     suffix=f".{extension}", delete=False) as handle:
+        try:
+            analyzer.export_table(sequence, table, fmt, handle=handle, min_intron_score=min_intron_score)
+        except Exception:
+            handle.close()
+            os.unlink(handle.name)
+            raise
+    return Path(handle.name)
+
+def full_export_panel(analyzer, sequence, table, fmt, min_intron_score=None):
+    """Write the export to a file on the server and hand out its path
+    
+    Only files up to SPOOL_BYTES are also offered as a download, since
+    Streamlit sends a download from memory.
+    """
+    if st.button(f"💾 Write {table} export ({fmt})", use_container_width=True):
+        with st.spinner("Writing export..."):
+            try:
+                st.session_state['export_file'] = (write_full_export(analyzer, sequence, table, fmt,
+                                                                     min_intron_score), fmt)
+            except Exception as e:
+                st.error(f"❌ Export failed: {e}")
+                return
+    
+    path, written_fmt = st.session_state.get('export_file') or (None, None)
+    if path is None or not path.exists():
+        return
+    size = path.stat().st_size
+    st.success(f"✅ Written to `{path}` ({size / 1024 / 1024:.1f} MB)")
+    if size <= SPOOL_BYTES:
+        st.download_button(
+            f"⬇️ Download {path.name}",
+            data=lambda: path.read_bytes(),
+            file_name=path.name,
+            mime=EXPORT_FORMATS[written_fmt][0],
+            on_click='ignore',
+            use_container_width=True
+        )
+    else:
+        st.caption(f"Too large to download through the app (over {SPOOL_BYTES // 1024 // 1024} MB); "
+                   "copy the file from the server, or stream it from the analysis service's `/export` route.")
+
+def summarize_result(results):
+    """Flatten one analysis result into a summary row"""
+    if 'error' in results:
+        return {'error': results['error']}
+    return {
+        'sequence_length': results.get('length', 0),
+        'prediction': results.get('overall_prediction', 'unknown'),
+        'confidence': results.get('overall_confidence', 0),
+        'gc_content': results.get('gc_content', 0),
+        'donor_sites': results.get('donor_site_count', 0),
+        'acceptor_sites': results.get('acceptor_site_count', 0),
+        'has_start_codon': results.get('has_start_codon', 0),
+        'has_stop_codon': results.get('has_stop_codon', 0),
+        'orf_count': results.get('orf_count', 0),
+        'longest_orf': results.get('longest_orf', 0)
+    }
+
+PROFILE_OPTIONS = {'Off': None, 'cProfile (CPU)': 'cprofile', 'tracemalloc (memory)': 'tracemalloc'}
+
+def show_performance_panel(analyzer):
+    """Stage timings and counters of the last analysis, plus the profiling switch"""
+    st.markdown("### ⏱️ Performance")
+    
+    labels = list(PROFILE_OPTIONS)
+    current = labels[list(PROFILE_OPTIONS.values()).index(analyzer.profile)]
+    choice = st.selectbox("Profile next analysis", labels, index=labels.index(current))
+    use_analyzer(profile=PROFILE_OPTIONS[choice])
+    
+    results = st.session_state.get('analysis_results') or {}
+    timings = results.get('timings')
+    if not timings:
+        st.info("ℹ️ Run an analysis to see its timings.")
+        return
+    
+    import pandas as pd
+    import plotly.express as px
+    
+    stages = dict(timings['stages'])
+    if 'render_seconds' in st.session_state:
+        stages['render'] = st.session_state['render_seconds']
+    stage_df = pd.DataFrame({
+        'Stage': list(stages.keys()),
+        'Time (ms)': [seconds * 1000 for seconds in stages.values()]
+    })
+    
+    col1, col2 = st.columns(2)
+    col1.metric("Analysis Time", f"{timings['total_seconds'] * 1000:.1f} ms")
+    col2.metric("Throughput", f"{timings['counters'].get('bases_analyzed', 0) / max(timings['total_seconds'], 1e-9) / 1e6:.2f} Mbp/s")
+    
+    fig = px.bar(stage_df, x='Time (ms)', y='Stage', orientation='h', title="Time per Stage")
+    fig.update_layout(height=300)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(pd.DataFrame({
+        'Counter': list(timings['counters'].keys()),
+        'Value': list(timings['counters'].values())
+    }), use_container_width=True, hide_index=True)
+    
+    if 'profile' in timings:
+        with st.expander(f"🔍 Profile ({timings['profile']['mode']})"):
+            st.code(timings['profile']['report'], language=None)
+
+PREDICTION_COLORS = {'exon': '#45B7D1', 'intron': '#96CEB4', 'donor_site': '#FF6B6B',
+                     'acceptor_site': '#4ECDC4', 'unknown': '#BBBBBB'}
+
+def show_window_tracks(analyzer, sequence):
+    """Sliding-window GC, CpG, site density and prediction, downsampled for plotting"""
+    col1, col2 = st.columns(2)
+    with col1:
+        default_window = min(DEFAULT_TRACK_WINDOW, max(len(sequence), 10))
+        window = st.number_input("Window (bp)", min_value=10, value=default_window, step=100)
+    with col2:
+        step = st.number_input("Step (bp)", min_value=1, value=max(int(window) // 2, 1), step=50)
+    
+    state = st.session_state.get('incremental_state')
+    if state is not None and state.config == analyzer.config():
+        # The incremental state already holds this sequence's scored sites
+        tracks = compute_tracks(state.scan, int(window), int(step), analyzer.min_orf_length)
+    else:
+        tracks = analyzer.window_tracks(sequence, int(window), int(step))
+    
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
+    centers = (tracks['start'] + tracks['end']) / 2
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=("GC %, CpG o/e and ORF coverage", "Sites per kb",
+                                        "Prediction confidence"))
+    for name, column, row in (("GC %", 'gc_percent', 1), ("CpG o/e x100", 'cpg_ratio', 1),
+                              ("ORF coverage %", 'orf_coverage', 1),
+                              ("Donors", 'donor_density', 2), ("Acceptors", 'acceptor_density', 2)):
+        values = tracks[column] * (100 if column == 'cpg_ratio' else 1)
+        index = downsample_index(values)
+        fig.add_trace(go.Scattergl(x=centers[index], y=values[index], mode='lines', name=name), row=row, col=1)
+    
+    index = downsample_index(tracks['confidence'])
+    for label, color in PREDICTION_COLORS.items():
+        chosen = index[tracks['prediction'][index] == label]
+        if len(chosen):
+            fig.add_trace(go.Scattergl(x=centers[chosen], y=tracks['confidence'][chosen], mode='markers',
+                                       marker=dict(color=color, size=4), name=label), row=3, col=1)
+    fig.update_layout(height=600, xaxis3_title="Position (bp)")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(tracks['start']):,} windows of {int(window):,} bp every {int(step):,} bp")
+
+def show_annotation_comparison(analyzer, sequence):
+    """Sensitivity and precision of the sites and introns against an uploaded GTF"""
+    gtf_file = st.file_uploader("Reference annotation (GTF)", type=['gtf', 'gz'],
+                                help="Introns are taken between consecutive exons of each transcript")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        record = st.text_input("Chromosome / record", value=st.session_state.get('record_name') or "",
+                               help="Sequence name in the GTF's first column")
+    with col2:
+        offset = st.number_input("Start on record (0-based)", min_value=0, value=0, step=1000)
+    with col3:
+        tolerance = st.number_input("Tolerance (bp)", min_value=0, max_value=50, value=0)
+    
+    if gtf_file is None or not record:
+        st.info("Upload a GTF and name the record this sequence comes from.")
+        return
+    annotation = get_annotation_index(gtf_file.getvalue(), gtf_file.name)
+    report = analyzer.compare_annotation(sequence, annotation, record, int(offset), int(tolerance))
+    import pandas as pd
+    
+    st.dataframe(pd.DataFrame([
+        {'Feature': feature, 'Reference': row['reference'], 'Predicted': row['predicted'],
+         'Sensitivity (%)': row['sensitivity'] * 100, 'Precision (%)': row['precision'] * 100}
+        for feature, row in report.items()
+    ]), use_container_width=True)
+
+MOTIF_HIT_ROWS = 500
+
+def show_motif_search(sequence):
+    """Exact and IUPAC pattern hits in the analyzed sequence or an uploaded multi-FASTA collection"""
+    collection = st.file_uploader("Sequence collection (FASTA, optional)", type=['fa', 'fasta', 'fna', 'txt'],
+                                  key='motif_collection',
+                                  help="Search every record of this file instead of the analyzed sequence")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        pattern = st.text_input("Pattern (IUPAC)", value="CAGGTRAGT",
+                                help="A, C, G, T and IUPAC codes such as R, Y or N").strip().upper()
+    with col2:
+        both_strands = st.checkbox("Both strands", value=True, key='motif_both_strands')
+    
+    if collection is not None:
+        source = ('upload', collection.file_id, collection.size)
+    else:
+        # str hashes are computed once per string object, so this key stays cheap across reruns
+        source = ('sequence', st.session_state.get('record_name'), len(sequence), hash(sequence))
+    
+    # The index is built on the first search, never just because the Results tab rendered
+    if st.button("🔎 Search", key='motif_search'):
+        st.session_state['motif_source'] = source
+    if st.session_state.get('motif_source') != source or not pattern:
+        st.caption("Indexing runs on the first search and is reused for later patterns.")
+        return
+    if collection is not None:
+        data = collection.getvalue()
+    else:
+        data = f">{st.session_state.get('record_name') or 'sequence'}\n{sequence}".encode()
+    index = get_motif_index(source, data)
+    try:
+        total = index.count(pattern, both_strands)
+        hits = index.find(pattern, both_strands, limit=MOTIF_HIT_ROWS)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    import pandas as pd
+    
+    st.dataframe(pd.DataFrame({
+        'Record': hits['record'],
+        'Position': hits['position'],
+        'Strand': hits['strand'],
+        'Match': [index.fetch(record, position, position + len(pattern))
+                  for record, position in zip(hits['record'], hits['position'])]
+    }), use_container_width=True, hide_index=True)
+    st.caption(f"{total:,} hits in {len(index.names)} record(s), {len(index):,} bp indexed"
+               + (f"; first {MOTIF_HIT_ROWS} shown" if total > MOTIF_HIT_ROWS else ""))
+
+SITE_PAGE_SIZES = [25, 50, 100, 500]
+
+def show_site_table(results):
+    """Every scored site, filtered by type, strand, position and score, one page at a time"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        kind = st.selectbox("Site type", ['donor', 'acceptor'], key='site_kind')
+    with col2:
+        strand = st.selectbox("Strand", ['both', '+', '-'], key='site_strand')
+    with col3:
+        page_size = st.selectbox("Rows per page", SITE_PAGE_SIZES, index=1, key='site_page_size')
+    
+    sites = results.sites(kind)
+    col1, col2 = st.columns(2)
+    with col1:
+        start, end = st.slider("Position range", 0, max(results.length, 1), (0, results.length),
+                               key='site_range')
+    with col2:
+        lowest = float(np.floor(sites.score.min())) if len(sites) else 0.0
+        min_score = st.number_input("Minimum score", value=lowest, step=1.0, key='site_min_score')
+    
+    view = sites.filter(start, end, min_score, None if strand == 'both' else strand)
+    page = st.number_input("Page", min_value=1, max_value=view.page_count(page_size), value=1,
+                           key='site_page')
+    rows = view.page(int(page) - 1, page_size)
+    import pandas as pd
+    
+    st.dataframe(pd.DataFrame({
+        'Position': rows.position,
+        'Strand': np.where(rows.minus, '-', '+'),
+        'Score': rows.score
+    }), use_container_width=True, hide_index=True)
+    first = (int(page) - 1) * page_size
+    st.caption(f"Sites {min(first + 1, len(view)):,}–{first + len(rows):,} of {len(view):,} matching; "
+               f"all {len(results.donors) + len(results.acceptors):,} sites take "
+               f"{results.nbytes / 1e6:.1f} MB")
 
 def format_sequence(sequence, width=80):
     """Format DNA sequence for display"""
@@ -156,7 +490,7 @@ def create_sidebar():
         # Information
         st.markdown("---")
         st.markdown("### 📊 Application Info")
-        st.markdown("**Version:** 2.0.0")
+        st.markdown(f"**Version:** {__version__}")
         st.markdown("**Author:** DNA Analyzer Team")
         st.markdown("**License:** MIT")
 
@@ -166,8 +500,9 @@ def main():
 
     load_css()
     
-    if 'analyzer' not in st.session_state and ANALYZER_AVAILABLE:
-        st.session_state['analyzer'] = AdvancedDNAAnalyzer()
+    if ANALYZER_AVAILABLE:
+        start_warm_up()
+        use_analyzer()
     
     if 'analysis_results' not in st.session_state:
         st.session_state['analysis_results'] = None
@@ -175,6 +510,11 @@ def main():
     if 'input_sequence' not in st.session_state:
         st.session_state['input_sequence'] = ""
     
+    if 'incremental' not in st.session_state:
+        st.session_state['incremental'] = False
+        # Encoded sequence and site index of the last analysis, for re-analysis after edits
+        st.session_state['incremental_state'] = None
+    
     st.markdown('<h1 class="main-header">🧬 DNA Sequence Analyzer</h1>', unsafe_allow_html=True)
     st.markdown("Analyze any DNA sequence for exons, introns, and splice junctions")
     
@@ -195,14 +535,19 @@ def main():
                 placeholder="Paste your DNA sequence here...\nExample: ATGCTAGCTAGCTAGCTAGC...",
                 help="Enter a DNA sequence for analysis. Minimum 50 bases recommended."
             )
+            fasta_file = st.file_uploader(
+                "...or upload a FASTA file",
+                type=['fa', 'fasta', 'fna', 'txt'],
+                help="The first record is analyzed; its bytes are read without building a text copy."
+            )
         
         with col2:
             st.markdown("""
             <div class="card">
             <h4>📝 Input Tips</h4>
             <ul>
-            <li>Use only A, C, G, T characters</li>
-            <li>Remove spaces and line breaks</li>
+            <li>Use A, C, G, T; N and IUPAC codes are masked</li>
+            <li>Spaces and line breaks are ignored</li>
             <li>Minimum 50 bases</li>
             <li>200+ bases for better results</li>
             </ul>
@@ -225,52 +570,106 @@ def main():
         if clear_btn:
             st.session_state['input_sequence'] = ""
             st.session_state['analysis_results'] = None
+            st.session_state['incremental_state'] = None
             st.rerun()
         
         if example_btn:
             st.session_state['input_sequence'] = example_seq
             st.rerun()
     
-        if analyze_btn and sequence_input:
-        
-            seq_clean = sequence_input.upper().replace(" ", "").replace("\n", "")
+        if analyze_btn and (sequence_input or fasta_file is not None):
             
-        
-            valid_chars = set('ACGTN')
-            if not set(seq_clean).issubset(valid_chars):
-                st.error("❌ Invalid characters detected. Use only A, C, G, T, N.")
-            elif len(seq_clean) < 50:
-                st.warning(f"⚠️ Sequence too short ({len(seq_clean)} bases). Minimum 50 bases recommended.")
+            ingested = None
+            if not ANALYZER_AVAILABLE:
+                st.error("❌ Analyzer not available. The splice_junction package could not be imported.")
             else:
-                st.success(f"✅ Valid sequence: {len(seq_clean)} bases")
+                try:
+                    if fasta_file is not None:
+                        ingested = next(iter_fasta_records(fasta_file.getvalue()), None)
+                    else:
+                        ingested = ingest_sequence(sequence_input)
+                except SequenceValidationError as e:
+                    st.error(f"❌ {e}")
+            
+            if ingested is not None and ingested.valid_bases < 50:
+                st.warning(f"⚠️ Sequence too short ({ingested.valid_bases} bases). Minimum 50 bases recommended.")
+            elif ingested is not None:
+                masked = f" ({ingested.masked_bases} masked as N)" if ingested.masked_bases else ""
+                st.success(f"✅ Valid sequence: {len(ingested)} bases{masked}")
                 
-                if ANALYZER_AVAILABLE:
-                    with st.spinner("🔬 Analyzing sequence..."):
-                        try:
+                with st.spinner("🔬 Analyzing sequence..."):
+                    try:
+                    
+                        st.session_state['input_sequence'] = ingested.as_str()
+                        st.session_state['record_name'] = ingested.name
                         
-                            st.session_state['input_sequence'] = seq_clean
-                            
+                    
+                        analyzer = st.session_state['analyzer']
+                        if st.session_state['incremental']:
+                            results, st.session_state['incremental_state'] = analyzer.analyze_incremental(
+                                ingested, st.session_state['incremental_state'])
+                        else:
+                            results = analyzer.analyze_sequence(ingested)
+                            st.session_state['incremental_state'] = None
+                        st.session_state['analysis_results'] = results
                         
-                            analyzer = st.session_state['analyzer']
-                            results = analyzer.analyze_sequence(seq_clean)
-                            st.session_state['analysis_results'] = results
-                            
-                            st.success("✅ Analysis complete!")
-                            st.rerun()
-                            
-                        except Exception as e:
-                            st.error(f"❌ Analysis error: {str(e)}")
-                else:
-                    st.error("❌ Analyzer not available. Please create dna_analyzer_advanced.py")
+                        st.success("✅ Analysis complete!")
+                        st.rerun()
+                        
+                    except Exception as e:
+                        st.error(f"❌ Analysis error: {str(e)}")
+
+        st.markdown("---")
+        st.markdown('<div class="sub-header">📂 Batch Processing</div>', unsafe_allow_html=True)
+        
+        batch_file = st.file_uploader(
+            "Upload a CSV file with a 'sequence' column",
+            type=['csv'],
+            help="Every row is analyzed independently across all CPU cores."
+        )
+        
+        if batch_file is not None and st.button("⚡ Process Batch", use_container_width=True):
+            import pandas as pd
+            
+            batch_df = pd.read_csv(batch_file)
+            
+            if 'sequence' not in batch_df.columns:
+                st.error("❌ CSV file must contain a 'sequence' column.")
+            elif not ANALYZER_AVAILABLE:
+                st.error("❌ Analyzer not available. The splice_junction package could not be imported.")
+            else:
+                sequences = batch_df['sequence'].fillna('').astype(str).tolist()
+                analyzer = st.session_state['analyzer']
+                progress = st.progress(0.0, text=f"Analyzing 0 / {len(sequences)} sequences")
+                
+                rows = []
+                try:
+                    for i, results in enumerate(analyzer.analyze_batch(sequences)):
+                        rows.append(summarize_result(results))
+                        if (i + 1) % 50 == 0 or i + 1 == len(sequences):
+                            progress.progress((i + 1) / len(sequences),
+                                              text=f"Analyzing {i + 1} / {len(sequences)} sequences")
+                    
+                    batch_results = pd.concat([batch_df.reset_index(drop=True), pd.DataFrame(rows)], axis=1)
+                    st.success(f"✅ Batch complete: {len(rows)} sequences analyzed")
+                    st.dataframe(batch_results, use_container_width=True)
+                    st.download_button("📥 Download CSV", data=batch_results.to_csv(index=False),
+                                       file_name="batch_results.csv", mime="text/csv",
+                                       on_click='ignore')
+                except Exception as e:
+                    st.error(f"❌ Batch analysis error: {str(e)}")
     
 
     with tab2:
+        render_started = time.perf_counter()
         if st.session_state.get('analysis_results'):
             results = st.session_state['analysis_results']
             
             if 'error' in results:
                 st.error(f"Analysis error: {results['error']}")
             else:
+                import pandas as pd
+                import plotly.express as px
             
                 st.markdown('<div class="sub-header">📋 Analysis Results</div>', unsafe_allow_html=True)
                 
@@ -292,6 +691,11 @@ def main():
                 st.markdown("### 🧬 Sequence Preview")
                 seq_preview = st.session_state['input_sequence'][:200] + "..." if len(st.session_state['input_sequence']) > 200 else st.session_state['input_sequence']
                 st.code(format_sequence(seq_preview, 50), language=None)
+                
+                if results.get('masked_regions'):
+                    with st.expander(f"🕳️ Masked Regions ({results['masked_bases']} bp of N)"):
+                        st.dataframe(pd.DataFrame(results['masked_regions'], columns=['Start', 'End']),
+                                     use_container_width=True, hide_index=True)
         
                 with st.expander("📊 Detailed Prediction Probabilities"):
                     if 'class_probabilities' in results:
@@ -312,111 +716,47 @@ def main():
                         fig.update_traces(texttemplate='%{y:.1f}%', textposition='outside')
                         fig.update_layout(height=400)
                         st.plotly_chart(fig, use_container_width=True)
+                    if 'site_class_probabilities' in results:
+                        st.caption("The bars above follow the rule-based prediction. "
+                                   "The trained k-mer model's mean probabilities over the sequence:")
+                        st.dataframe(pd.DataFrame({
+                            'Class': list(results['site_class_probabilities'].keys()),
+                            'Model probability (%)': list(results['site_class_probabilities'].values())
+                        }).round(1), use_container_width=True, hide_index=True)
             
                 with st.expander("🔗 Splice Junctions"):
-                    if 'splice_junctions' in results:
-                        junctions = results['splice_junctions']
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.markdown("**Donor Sites (GT):**")
-                            if junctions.get('donor_sites'):
-                                donor_sites = junctions['donor_sites']
-                                if isinstance(donor_sites, list) and len(donor_sites) > 0:
-            
-                                    for i, site in enumerate(donor_sites[:5]):
-                                        if isinstance(site, dict):
-                                           
-                                            pos = site.get('position', 'N/A')
-                                            context = site.get('context', '')
-                                            st.write(f"{i+1}. Position {pos}: {context}")
-                                        elif isinstance(site, int):
-                                          
-                                            st.write(f"{i+1}. Position {site}")
-                                        else:
-                                            st.write(f"{i+1}. {site}")
-                                else:
-                                    st.write("No donor sites found")
-                            else:
-                                st.write("No donor sites found")
-                        
-                        with col2:
-                            st.markdown("**Acceptor Sites (AG):**")
-                            if junctions.get('acceptor_sites'):
-                                acceptor_sites = junctions['acceptor_sites']
-                                if isinstance(acceptor_sites, list) and len(acceptor_sites) > 0:
-                                    for i, site in enumerate(acceptor_sites[:5]):
-                                        if isinstance(site, dict):
-                                            pos = site.get('position', 'N/A')
-                                            context = site.get('context', '')
-                                            st.write(f"{i+1}. Position {pos}: {context}")
-                                        elif isinstance(site, int):
-                                            st.write(f"{i+1}. Position {site}")
-                                        else:
-                                            st.write(f"{i+1}. {site}")
-                                else:
-                                    st.write("No acceptor sites found")
-                            else:
-                                st.write("No acceptor sites found")
+                    col1, col2 = st.columns(2)
+                    for column, title, kind, sites in (
+                            (col1, "**Donor Sites (GT):**", "donor", results.donor_sites),
+                            (col2, "**Acceptor Sites (AG):**", "acceptor", results.acceptor_sites)):
+                        with column:
+                            st.markdown(title)
+                            for i, site in enumerate(sites[:5]):
+                                st.write(f"{i+1}. Position {site['position']} [{site['strand']}]: "
+                                         f"{site['context']} (score {site['score']:.2f})")
+                            if not sites:
+                                st.write(f"No {kind} sites found")
                     
-                        if junctions.get('intron_boundaries'):
-                            st.markdown("**Potential Intron Boundaries:**")
-                            boundaries = junctions['intron_boundaries']
-                            if isinstance(boundaries, list):
-                                for i, boundary in enumerate(boundaries[:3]):
-                                
-                                    if isinstance(boundary, dict):
-                                        donor_key = None
-                                        acceptor_key = None
-                                    
-                                        possible_donor_keys = ['donor_position', 'donor', 'donor_site', 'gt_position']
-                                        possible_acceptor_keys = ['acceptor_position', 'acceptor', 'acceptor_site', 'ag_position']
-                                        
-                                        for key in possible_donor_keys:
-                                            if key in boundary:
-                                                donor_key = key
-                                                break
-                                        
-                                        for key in possible_acceptor_keys:
-                                            if key in boundary:
-                                                acceptor_key = key
-                                                break
-                                        
-                                        if donor_key and acceptor_key:
-                                            donor_pos = boundary.get(donor_key, 'N/A')
-                                            acceptor_pos = boundary.get(acceptor_key, 'N/A')
-                                            distance = boundary.get('distance', 'N/A')
-                                            st.write(f"{i+1}. Donor {donor_pos} to Acceptor {acceptor_pos} (Distance: {distance} bp)")
-                                        else:
-                                           
-                                            st.write(f"{i+1}. Boundary data: {boundary}")
-                                    else:
-                                        st.write(f"{i+1}. {boundary}")
-                        else:
-                       
-                            st.markdown("**Finding GT-AG pairs...**")
-                            seq = st.session_state.get('input_sequence', '')
-                            if seq:
-                               
-                                gt_positions = [m.start() for m in re.finditer('GT', seq)]
-                                ag_positions = [m.start() for m in re.finditer('AG', seq)]
-                                
-                              
-                                pairs_found = 0
-                                for gt in gt_positions[:10]:
-                                    for ag in ag_positions[:10]:
-                                        if ag > gt + 10: 
-                                            distance = ag - gt
-                                            st.write(f"- GT at {gt} → AG at {ag} (Distance: {distance} bp)")
-                                            pairs_found += 1
-                                            if pairs_found >= 3:
-                                                break
-                                    if pairs_found >= 3:
-                                        break
-                                
-                                if pairs_found == 0:
-                                    st.write("No GT-AG pairs found")
+                    st.markdown("**Potential Intron Boundaries:**")
+                    for i, intron in enumerate(results.intron_boundaries[:3]):
+                        st.write(f"{i+1}. Donor {intron['donor']} to Acceptor {intron['acceptor']} "
+                                 f"[{intron['strand']}] (Distance: {intron['distance']} bp)")
+                    if not results.intron_boundaries:
+                        st.write("No GT-AG pairs within the intron length limits")
+                
+                with st.expander(f"📋 All Sites ({results.donor_site_count + results.acceptor_site_count:,})"):
+                    show_site_table(results)
+            
+                with st.expander(f"🧬 Open Reading Frames ({results.get('orf_count', 0)})"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("ORFs", results.get('orf_count', 0))
+                    with col2:
+                        st.metric("Longest ORF", f"{results.get('longest_orf', 0)} bp")
+                    if results.get('orfs'):
+                        st.dataframe(pd.DataFrame(results['orfs']), use_container_width=True)
+                    else:
+                        st.write(f"No ORFs of at least {st.session_state['analyzer'].min_orf_length} bp")
             
                 with st.expander("📊 Base Composition"):
                     if 'base_composition' in results:
@@ -447,6 +787,14 @@ def main():
                             )
                             st.plotly_chart(fig, use_container_width=True)
                 
+                with st.expander("📈 Window Tracks", expanded=True):
+                    show_window_tracks(st.session_state['analyzer'], st.session_state['input_sequence'])
+                
+                with st.expander("🔎 Motif Search"):
+                    show_motif_search(st.session_state['input_sequence'])
+                
+                with st.expander("🧾 Compare with Annotation"):
+                    show_annotation_comparison(st.session_state['analyzer'], st.session_state['input_sequence'])
     
                 st.markdown("---")
                 st.subheader("📥 Download Results")
@@ -454,29 +802,33 @@ def main():
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    if st.button("Export Summary as CSV", use_container_width=True):
-            
-                        result_data = {
-                            'sequence_length': results.get('length', 0),
-                            'prediction': results.get('overall_prediction', 'unknown'),
-                            'confidence': results.get('overall_confidence', 0),
-                            'gc_content': results.get('gc_content', 0),
-                            'donor_sites': results.get('donor_site_count', 0),
-                            'acceptor_sites': results.get('acceptor_site_count', 0),
-                            'has_start_codon': results.get('has_start_codon', 0),
-                            'has_stop_codon': results.get('has_stop_codon', 0)
-                        }
-                        
-                        df = pd.DataFrame([result_data])
-                        csv = df.to_csv(index=False)
-                        b64 = base64.b64encode(csv.encode()).decode()
-                        href = f'<a href="data:file/csv;base64,{b64}" download="dna_analysis.csv">Download CSV</a>'
-                        st.markdown(href, unsafe_allow_html=True)
+                    st.download_button(
+                        "Export Summary as CSV",
+                        data=pd.DataFrame([summarize_result(results)]).to_csv(index=False),
+                        file_name="dna_analysis.csv",
+                        mime="text/csv",
+                        on_click='ignore',
+                        use_container_width=True
+                    )
                 
                 with col2:
-                    if st.button("Export Full Data", use_container_width=True):
-                        st.info("Full data export coming soon!")
+                    export_col1, export_col2 = st.columns(2)
+                    with export_col1:
+                        export_table = st.selectbox("Full data", EXPORT_TABLES,
+                                                    help="Every scored site, every intron candidate, or non-overlapping 100 bp window tracks")
+                    with export_col2:
+                        export_format = st.selectbox("Format", export_formats())
+                    min_intron_score = None
+                    if export_table == 'introns':
+                        min_intron_score = st.number_input("Minimum intron score",
+                                                           value=DEFAULT_MIN_INTRON_SCORE, step=1.0)
+                        st.caption(f"Only intron candidates scoring at least {min_intron_score:g} "
+                                   "(donor + acceptor score) are exported; listing every pair "
+                                   "runs to thousands of rows per kb.")
+                    full_export_panel(st.session_state['analyzer'], st.session_state['input_sequence'],
+                                      export_table, export_format, min_intron_score)
         
+            st.session_state['render_seconds'] = time.perf_counter() - render_started
         else:
             st.info("ℹ️ No analysis results yet. Please analyze a sequence in the 'Analyze' tab.")
     
@@ -485,15 +837,34 @@ def main():
         
         if not ANALYZER_AVAILABLE:
             st.error("""
-            ❌ dna_analyzer_advanced.py not found in the current directory.
+            ❌ The splice_junction package could not be imported.
             
-            Please create a file named `dna_analyzer_advanced.py` in the same folder as `app.py`
-            with the DNA analyzer class code.
+            Run `streamlit run app.py` from the repository root, next to the
+            `splice_junction` folder.
             """)
         
         st.markdown("### Application Settings")
     
         if ANALYZER_AVAILABLE and 'analyzer' in st.session_state:
+            analyzer = st.session_state['analyzer']
+            use_analyzer(both_strands=st.checkbox(
+                "🔁 Scan both strands",
+                value=analyzer.both_strands,
+                help="Also report reverse-strand donors (AC) and acceptors (CT), in forward-strand coordinates."
+            ))
+            screen = st.checkbox(
+                "🧪 Screen acceptors",
+                value=analyzer.acceptor_screen.enabled,
+                help="Keep only AGs with a polypyrimidine tract and a branch point 18–40 nt upstream."
+            )
+            use_analyzer(min_pyrimidine_fraction=DEFAULT_MIN_PYRIMIDINE_FRACTION if screen else None,
+                         require_branch_point=screen)
+            st.session_state['incremental'] = st.checkbox(
+                "⚡ Incremental re-analysis",
+                value=st.session_state['incremental'],
+                help="After editing an analyzed sequence, rescan only the edited span and shift the other sites."
+            )
+            
             if st.button("🔄 Train New Model", use_container_width=True):
                 with st.spinner("Training model..."):
                     try:
@@ -502,12 +873,26 @@ def main():
                         st.success(f"✅ Model trained! Accuracy: {metrics['test_accuracy']*100:.1f}%")
                     except Exception as e:
                         st.error(f"❌ Training failed: {str(e)}")
+            
+            st.markdown("### 🗄️ Result Cache")
+            cache_stats = get_result_cache().stats()
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Hits", cache_stats['hits'])
+            col2.metric("Misses", cache_stats['misses'])
+            col3.metric("Hit Rate", f"{cache_stats['hit_rate']:.1f}%")
+            col4.metric("Cached Results", cache_stats['entries'])
+            
+            if st.button("🧹 Clear Result Cache", use_container_width=True):
+                get_result_cache().clear(disk=True)
+                st.success("✅ Result cache cleared")
+            
+            show_performance_panel(st.session_state['analyzer'])
         
     
         st.markdown("---")
         st.markdown("### 📖 About")
-        st.markdown("""
-        **DNA Sequence Analyzer** v2.0.0
+        st.markdown(f"""
+        **DNA Sequence Analyzer** v{__version__}
         
         This application analyzes DNA sequences to identify:
         - 🧬 **Exons**: Protein-coding regions
@@ -0,0 +1,279 @@
+"""
+Throughput benchmark for the analyzer across sequence sizes
+
+    python benchmark.py --sizes 1k,100k,10M --output run.json
+    python benchmark.py --baseline run.json --max-regression 10
+
+Each size runs in a fresh process so its peak RSS (on the total line)
+belongs to that size alone. Stages are timed without tracing (best of
+--repeat runs), then run once more under tracemalloc, which gives each
+stage's own peak allocation and block count; the process high-water
+mark never falls, so it cannot be split by stage.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+
+# 100M is left to --sizes: a full 100 Mb run with tracing takes minutes and several GB
+DEFAULT_SIZES = '1k,10k,100k,1M,10M'
+DEFAULT_GC_CONTENT = 0.41
+# Planted donor/acceptor motifs per kilobase
+DEFAULT_SITE_DENSITY = 2.0
+LINE_WIDTH = 60
+STAGES = ('normalize', 'scan', 'pairing', 'classify')
+
+# Strong consensus sites planted into the background
+DONOR_SITE = b'CAGGTAAGT'
+ACCEPTOR_SITE = b'TTTTTTTTTTTCCCTTTCAGG'
+_SIZE_SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6, 'g': 10 ** 9}
+
+
+def parse_size(text: str) -> int:
+    """'1k', '2.5M', '100' -> number of bases"""
+    text = text.strip().lower().rstrip('b')
+    if text and text[-1] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def synthetic_genome(length: int, gc_content: float = DEFAULT_GC_CONTENT,
+                     site_density: float = DEFAULT_SITE_DENSITY, seed: int = 0,
+                     line_width: int = LINE_WIDTH) -> str:
+    """Deterministic random sequence wrapped like a FASTA body
+
+    Background bases follow gc_content; site_density donor and acceptor
+    consensus motifs per kb are planted at random positions, alternating.
+    """
+    rng = np.random.default_rng(seed)
+    at, gc = (1 - gc_content) / 2, gc_content / 2
+    bases = np.frombuffer(b'ACGT', dtype=np.uint8)
+    seq = bases[rng.choice(4, size=length, p=[at, gc, gc, at])]
+
+    sites = int(length / 1000 * site_density)
+    longest = max(len(DONOR_SITE), len(ACCEPTOR_SITE))
+    if sites and length > longest:
+        starts = np.sort(rng.integers(0, length - longest, size=sites))
+        for i, start in enumerate(starts):
+            motif = DONOR_SITE if i % 2 == 0 else ACCEPTOR_SITE
+            seq[start:start + len(motif)] = np.frombuffer(motif, dtype=np.uint8)
+
+    raw = seq.tobytes()
+    if line_width:
+        raw = b'\n'.join(raw[i:i + line_width] for i in range(0, len(raw), line_width))
+    return raw.decode('ascii')
+
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _stage_functions(analyzer, raw: str):
+    """The analyzer's pipeline split into stages; each takes the previous stage's output"""
+    from splice_junction.intron_pairing import count_intron_candidates, pair_introns
+    from splice_junction.orf_finder import find_orfs
+    from splice_junction.sequence_ingest import ingest_sequence
+    from splice_junction.splice_scanner import C, G, N, scan_splice_sites
+
+    def normalize(_):
+        return ingest_sequence(raw).as_str()
+
+    def scan(seq):
+        return seq, analyzer._score_sites(scan_splice_sites(seq))
+
+    def pairing(state):
+        seq, scan = state
+        pair_introns(scan.donor_positions, scan.acceptor_positions, analyzer.max_introns,
+                     scan.donor_scores, scan.acceptor_scores,
+                     min_length=analyzer.min_intron_length, max_length=analyzer.max_intron_length,
+                     non_overlapping=analyzer.non_overlapping_introns)
+        count_intron_candidates(scan.donor_positions, scan.acceptor_positions,
+                                analyzer.min_intron_length, analyzer.max_intron_length)
+        return state
+
+    def classify(state):
+        seq, scan = state
+        gc_content = float(scan.base_counts[C] + scan.base_counts[G]) / (scan.length - scan.base_counts[N]) * 100
+        orfs = find_orfs(scan.codes, analyzer.min_orf_length)
+        return analyzer._classify(scan, gc_content, orfs)
+
+    return {'normalize': normalize, 'scan': scan, 'pairing': pairing, 'classify': classify}
+
+
+def _run_pipeline(stages) -> dict:
+    timings, state = {}, None
+    for name in STAGES:
+        started = time.perf_counter()
+        state = stages[name](state)
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def _trace_pipeline(stages) -> dict:
+    """Peak traced memory and net new allocated blocks per stage"""
+    allocations, state = {}, None
+    tracemalloc.start()
+    try:
+        for name in STAGES:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            state = stages[name](state)
+            _, peak = tracemalloc.get_traced_memory()
+            diff = tracemalloc.take_snapshot().compare_to(before, 'filename')
+            allocations[name] = {
+                'alloc_peak_mb': (peak - base) / (1024 * 1024),
+                'alloc_blocks': sum(stat.count_diff for stat in diff if stat.count_diff > 0)
+            }
+    finally:
+        tracemalloc.stop()
+    return allocations
+
+
+def benchmark_size(size: int, gc_content: float = DEFAULT_GC_CONTENT,
+                   site_density: float = DEFAULT_SITE_DENSITY, repeat: int = 3,
+                   trace: bool = True, seed: int = 0) -> dict:
+    """Benchmark every stage on one synthetic sequence"""
+    from splice_junction.analyzer import AdvancedDNAAnalyzer
+
+    analyzer = AdvancedDNAAnalyzer()
+    raw = synthetic_genome(size, gc_content, site_density, seed)
+    stages = _stage_functions(analyzer, raw)
+
+    best = {}
+    for _ in range(max(repeat, 1)):
+        for name, seconds in _run_pipeline(stages).items():
+            best[name] = min(best.get(name, seconds), seconds)
+
+    started = time.perf_counter()
+    analyzer.analyze_sequence(raw)
+    total = time.perf_counter() - started
+
+    allocations = _trace_pipeline(stages) if trace else {}
+    result = {'size': size, 'gc_content': gc_content, 'site_density': site_density, 'stages': {}}
+    for name in STAGES:
+        result['stages'][name] = {
+            'seconds': best[name],
+            'bases_per_second': size / best[name] if best[name] else float('inf'),
+            **allocations.get(name, {})
+        }
+    result['stages']['total'] = {
+        'seconds': total,
+        'bases_per_second': size / total if total else float('inf'),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    return result
+
+
+def run_benchmarks(sizes, gc_content: float = DEFAULT_GC_CONTENT,
+                   site_density: float = DEFAULT_SITE_DENSITY, repeat: int = 3,
+                   trace: bool = True, isolate: bool = True, log=print) -> dict:
+    """Benchmark each size (in its own process unless isolate is False)"""
+    from splice_junction import __version__
+
+    results = []
+    for size in sizes:
+        args = (size, gc_content, site_density, repeat, trace)
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(benchmark_size, *args).result()
+        else:
+            result = benchmark_size(*args)
+        results.append(result)
+        if log:
+            log(format_result(result))
+
+    return {
+        'analyzer_version': __version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'results': results
+    }
+
+
+def format_result(result: dict) -> str:
+    lines = [f"{result['size']:,} bp"]
+    for name, stage in result['stages'].items():
+        line = (f"  {name:<10} {stage['seconds'] * 1000:10.2f} ms "
+                f"{stage['bases_per_second'] / 1e6:10.2f} Mbp/s")
+        if 'peak_rss_mb' in stage:
+            line += f"  rss {stage['peak_rss_mb']:8.1f} MB"
+        if 'alloc_blocks' in stage:
+            line += f"  alloc {stage['alloc_peak_mb']:8.1f} MB / {stage['alloc_blocks']:,} blocks"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def compare_runs(baseline: dict, current: dict, max_regression: float) -> list:
+    """Stages whose throughput fell by more than max_regression percent"""
+    previous = {(r['size'], name): stage['bases_per_second']
+                for r in baseline['results'] for name, stage in r['stages'].items()}
+    regressions = []
+    for result in current['results']:
+        for name, stage in result['stages'].items():
+            before = previous.get((result['size'], name))
+            if not before:
+                continue
+            drop = (before - stage['bases_per_second']) / before * 100
+            if drop > max_regression:
+                regressions.append({'size': result['size'], 'stage': name,
+                                    'baseline': before, 'current': stage['bases_per_second'],
+                                    'drop_percent': drop})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"comma-separated sizes, e.g. 1k,1M,100M (default {DEFAULT_SIZES})")
+    parser.add_argument('--gc', type=float, default=DEFAULT_GC_CONTENT, help="GC fraction")
+    parser.add_argument('--site-density', type=float, default=DEFAULT_SITE_DENSITY,
+                        help="planted splice sites per kb")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per size (best is kept)")
+    parser.add_argument('--no-trace', action='store_true', help="skip the tracemalloc pass (no per-stage memory)")
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="run every size in this process (peak RSS then accumulates)")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help="fail if any stage is this many percent slower than the baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    report = run_benchmarks(sizes, args.gc, args.site_density, args.repeat,
+                            trace=not args.no_trace, isolate=not args.no_isolate)
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        threshold = args.max_regression if args.max_regression is not None else 0.0
+        regressions = compare_runs(baseline, report, threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['size']:,} bp {r['stage']}: "
+                  f"{r['baseline'] / 1e6:.2f} -> {r['current'] / 1e6:.2f} Mbp/s "
+                  f"(-{r['drop_percent']:.1f}%)")
+        if regressions and args.max_regression is not None:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
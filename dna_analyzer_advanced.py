@@ -1,115 +1,6 @@
 """
-ULTRA SIMPLE DNA Analyzer - No errors guaranteed
+Compatibility module: the analyzer now lives in splice_junction.analyzer
 """
 
-import numpy as np
-import re
-
-class UltraSimpleDNAAnalyzer:
-    """Simple DNA analyzer without scikit-learn dependencies"""
-    
-    def __init__(self):
-        self.is_trained = True  
-    
-    def analyze_sequence(self, sequence: str) -> dict:
-        """Analyze DNA sequence with simple rules"""
-      
-        seq = sequence.upper().replace(' ', '').replace('\n', '')
-        seq = ''.join([c for c in seq if c in 'ACGT'])
-        
-        if len(seq) < 50:
-            return {'error': 'Sequence too short (min 50 bp)'}
-        
-     
-        length = len(seq)
-        gc_content = (seq.count('G') + seq.count('C')) / length * 100
-        
-        donor_sites = []
-        for match in re.finditer('GT', seq):
-            donor_sites.append({
-                'position': match.start(),
-                'context': seq[max(0, match.start()-3):min(len(seq), match.end()+3)]
-            })
-        
-        acceptor_sites = []
-        for match in re.finditer('AG', seq):
-            acceptor_sites.append({
-                'position': match.start(),
-                'context': seq[max(0, match.start()-3):min(len(seq), match.end()+3)]
-            })
-        
-      
-        intron_boundaries = []
-        for donor in donor_sites[:10]: 
-            for acceptor in acceptor_sites[:10]:
-                if acceptor['position'] > donor['position'] + 10:
-                    intron_boundaries.append({
-                        'donor': donor['position'],
-                        'acceptor': acceptor['position'],
-                        'distance': acceptor['position'] - donor['position']
-                    })
-        
-    
-        has_start = 'ATG' in seq
-        has_stop = any(stop in seq for stop in ['TAA', 'TAG', 'TGA'])
-        
-    
-        if gc_content > 50 and has_start and has_stop:
-            prediction = 'exon'
-            confidence = 85.0
-        elif len(donor_sites) > 0 or len(acceptor_sites) > 0:
-            if len(donor_sites) > len(acceptor_sites):
-                prediction = 'donor_site'
-            else:
-                prediction = 'acceptor_site'
-            confidence = 75.0
-        elif gc_content < 40:
-            prediction = 'intron'
-            confidence = 70.0
-        else:
-            prediction = 'unknown'
-            confidence = 50.0
-        
-    
-        class_probs = {
-            'exon': 25.0,
-            'intron': 25.0,
-            'donor_site': 25.0,
-            'acceptor_site': 25.0
-        }
-        class_probs[prediction] = confidence
-        
-        return {
-            'sequence': seq[:100] + '...' if len(seq) > 100 else seq,
-            'length': length,
-            'overall_prediction': prediction,
-            'overall_confidence': confidence,
-            'class_probabilities': class_probs,
-            'gc_content': gc_content,
-            'splice_junctions': {
-                'donor_sites': donor_sites[:10],
-                'acceptor_sites': acceptor_sites[:10],
-                'intron_boundaries': intron_boundaries[:5],
-                'total_donors': len(donor_sites),
-                'total_acceptors': len(acceptor_sites)
-            },
-            'has_start_codon': 1 if has_start else 0,
-            'has_stop_codon': 1 if has_stop else 0,
-            'donor_site_count': len(donor_sites),
-            'acceptor_site_count': len(acceptor_sites),
-            'exon_count': 1 if prediction == 'exon' else 0,
-            'intron_count': 1 if prediction == 'intron' else 0
-        }
-    
-    def train_model(self):
-        """Dummy method for compatibility"""
-        print("Simple analyzer doesn't need training")
-        return {
-            'train_accuracy': 0.85,
-            'test_accuracy': 0.80,
-            'feature_count': 10,
-            'status': 'ready'
-        }
-
-# Alias
-AdvancedDNAAnalyzer = UltraSimpleDNAAnalyzer
\ No newline at end of file
+from splice_junction import __version__  # noqa: F401
+from splice_junction.analyzer import *  # noqa: F401,F403
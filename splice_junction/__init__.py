@@ -0,0 +1,33 @@
+"""
+Splice junction analysis core: scanning, scoring, pairing and the analyzer
+
+Importing the package or any of its modules needs only numpy; pandas,
+pyarrow, scikit-learn and joblib are imported by the functions that use
+them. The Streamlit app and its plots live outside the package.
+"""
+
+__version__ = '2.2.0'
+
+# Top-level names, imported from their module on first access
+_EXPORTS = {
+    'AdvancedDNAAnalyzer': 'analyzer',
+    'UltraSimpleDNAAnalyzer': 'analyzer',
+    'AnalysisResult': 'analysis_result',
+    'MotifIndex': 'motif_index',
+    'get_analyzer': 'analyzer_registry',
+    'warm_up': 'analyzer_registry',
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
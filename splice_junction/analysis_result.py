@@ -0,0 +1,189 @@
+"""
+Compact analysis result: summary fields in slots, every scored site in columns
+
+The nested dict the analyzer used to return is still readable through the
+mapping interface and is built on access, so result['gc_content'] and
+result['splice_junctions'] keep working. Every scored site is kept as
+position/score/strand arrays (9 bytes a site) and read through filtered,
+paginated views rather than lists of dicts.
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class SiteColumns:
+    """Splice sites of one kind as parallel arrays sorted by position"""
+
+    __slots__ = ('position', 'score', 'minus')
+
+    def __init__(self, position: np.ndarray, score: np.ndarray, minus: np.ndarray):
+        self.position = position
+        self.score = score
+        # True for '-' strand sites
+        self.minus = minus
+
+    @classmethod
+    def from_strands(cls, positions: list, scores: list, strands: list) -> 'SiteColumns':
+        """Merge per-strand position and score arrays into compact columns"""
+        position = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+        score = np.concatenate(scores) if scores else np.empty(0)
+        minus = np.concatenate([np.full(len(p), strand == '-') for p, strand in zip(positions, strands)]
+                               ) if positions else np.empty(0, dtype=bool)
+        if len(positions) > 1:
+            order = np.argsort(position, kind='stable')
+            position, score, minus = position[order], score[order], minus[order]
+        dtype = np.int32 if not len(position) or position[-1] < 2 ** 31 else np.int64
+        return cls(position.astype(dtype), score.astype(np.float32), minus.astype(bool))
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    @property
+    def nbytes(self) -> int:
+        return self.position.nbytes + self.score.nbytes + self.minus.nbytes
+
+    def _take(self, rows) -> 'SiteColumns':
+        return SiteColumns(self.position[rows], self.score[rows], self.minus[rows])
+
+    def filter(self, start: int = None, end: int = None, min_score: float = None,
+               strand: str = None) -> 'SiteColumns':
+        """Sites in [start, end) scoring at least min_score on strand ('+', '-' or None for both)
+
+        The position range is a binary search and returns views; score and
+        strand filters copy only the matching rows.
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.position, start, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.position, end, side='left'))
+        view = self._take(slice(lo, hi))
+        keep = None
+        if min_score is not None:
+            keep = view.score >= min_score
+        if strand is not None:
+            on_strand = view.minus if strand == '-' else ~view.minus
+            keep = on_strand if keep is None else keep & on_strand
+        return view if keep is None else view._take(keep)
+
+    def page(self, number: int, size: int = DEFAULT_PAGE_SIZE) -> 'SiteColumns':
+        """The number-th (0-based) page of size sites"""
+        return self._take(slice(number * size, (number + 1) * size))
+
+    def page_count(self, size: int = DEFAULT_PAGE_SIZE) -> int:
+        return max(-(-len(self) // size), 1)
+
+    def rows(self) -> list:
+        return [{'position': int(position), 'score': float(score), 'strand': '-' if minus else '+'}
+                for position, score, minus in zip(self.position, self.score, self.minus)]
+
+    def to_dict(self) -> dict:
+        return {'position': self.position.tolist(), 'score': self.score.tolist(),
+                'strand': np.where(self.minus, '-', '+').tolist()}
+
+
+class AnalysisResult(MutableMapping):
+    """One analysis: summary fields, the reported top sites and introns, and all scored sites
+
+    Reads like the result dict (`result['length']`, `'error' in result`);
+    keys other than the summary fields, such as 'timings', are stored as
+    extras. Pickles as its slots, so caching and session storage copy the
+    site columns as raw arrays.
+    """
+
+    __slots__ = ('sequence', 'length', 'overall_prediction', 'overall_confidence',
+                 'class_probabilities', 'gc_content', 'masked_bases', 'masked_regions',
+                 'orfs', 'orf_count', 'longest_orf', 'has_start_codon', 'has_stop_codon',
+                 'donor_sites', 'acceptor_sites', 'intron_boundaries', 'total_intron_candidates',
+                 'strand_counts', 'donors', 'acceptors', 'extra')
+
+    # Keys read straight from a slot, in the order of the legacy dict
+    _FIELDS = ('sequence', 'length', 'overall_prediction', 'overall_confidence',
+               'class_probabilities', 'gc_content', 'splice_junctions', 'masked_bases',
+               'masked_regions', 'orfs', 'orf_count', 'longest_orf', 'has_start_codon',
+               'has_stop_codon', 'donor_site_count', 'acceptor_site_count', 'exon_count',
+               'intron_count')
+
+    def __init__(self, **fields):
+        self.extra = {}
+        self.strand_counts = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def splice_junctions(self) -> dict:
+        junctions = {
+            'donor_sites': self.donor_sites,
+            'acceptor_sites': self.acceptor_sites,
+            'intron_boundaries': self.intron_boundaries,
+            'total_intron_candidates': self.total_intron_candidates,
+            'total_donors': len(self.donors),
+            'total_acceptors': len(self.acceptors)
+        }
+        if self.strand_counts is not None:
+            junctions['strands'] = self.strand_counts
+        return junctions
+
+    @property
+    def donor_site_count(self) -> int:
+        return len(self.donors)
+
+    @property
+    def acceptor_site_count(self) -> int:
+        return len(self.acceptors)
+
+    @property
+    def exon_count(self) -> int:
+        return 1 if self.overall_prediction == 'exon' else 0
+
+    @property
+    def intron_count(self) -> int:
+        return 1 if self.overall_prediction == 'intron' else 0
+
+    def sites(self, kind: str) -> SiteColumns:
+        """All scored 'donor' or 'acceptor' sites"""
+        if kind not in ('donor', 'acceptor'):
+            raise ValueError(f"Unknown site kind {kind!r}; expected 'donor' or 'acceptor'")
+        return self.donors if kind == 'donor' else self.acceptors
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the site columns"""
+        return self.donors.nbytes + self.acceptors.nbytes
+
+    def __getitem__(self, key):
+        if key in self.extra:
+            return self.extra[key]
+        if key in self._FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELDS:
+            raise KeyError(f"{key!r} is a result field and cannot be removed")
+        del self.extra[key]
+
+    def __iter__(self):
+        yield from self._FIELDS
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self._FIELDS) + len(self.extra)
+
+    def __repr__(self) -> str:
+        return (f"AnalysisResult(length={self.length}, prediction={self.overall_prediction!r}, "
+                f"donors={len(self.donors)}, acceptors={len(self.acceptors)})")
+
+    def to_dict(self, sites: bool = False) -> dict:
+        """Plain nested dict (JSON-ready); with sites, every scored site as columns"""
+        result = dict(self)
+        if sites:
+            result['sites'] = {'donor': self.donors.to_dict(), 'acceptor': self.acceptors.to_dict()}
+        return result
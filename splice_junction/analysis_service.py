@@ -0,0 +1,555 @@
+"""
+Local HTTP service around the analyzer with request micro-batching
+
+    python -m splice_junction.analysis_service --port 8765 --workers 4
+
+Endpoints (localhost only, standard library only):
+    POST /analyze   {"sequence": "..."}      -> one JSON result
+                    {"sequences": [...]}     -> NDJSON, one result per line, streamed in order
+    POST /export    {"sequence": "...", "table": "introns", "format": "csv", "min_score": 20}
+                    -> the full table, streamed in chunks as it is written
+    GET  /health    queue depth and worker status
+    GET  /metrics   Prometheus text format
+
+Sequences from concurrent requests are gathered for up to batch_window
+seconds (or max_batch_size sequences) and analyzed together on a process
+pool. Once max_pending sequences are waiting, new requests get 503.
+Exports are written by a thread into a small bounded queue and sent with
+chunked transfer encoding, so a multi-GB table never sits in memory.
+"""
+
+import asyncio
+import io
+import ipaddress
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+import numpy as np
+
+from .analysis_result import AnalysisResult
+from .batch_analysis import _analyze_chunk, _init_worker, _warm_up_worker
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_PENDING = 2000
+DEFAULT_MAX_BODY_BYTES = 16 * 1024 * 1024
+# Bodies larger than this are parsed off the event loop
+INLINE_JSON_BYTES = 256 * 1024
+# Export bytes per HTTP chunk, and chunks buffered ahead of a slow client
+EXPORT_CHUNK_BYTES = 1 << 20
+EXPORT_QUEUE_CHUNKS = 4
+IDLE_TIMEOUT = 30.0
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, AnalysisResult):
+        return value.to_dict()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    return json.dumps(value, default=_json_default).encode('utf-8')
+
+
+def _require_loopback(host: str):
+    """Refuse to bind anything but a loopback address"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as exc:
+        raise ValueError(f"Cannot resolve {host!r}") from exc
+    if not all(ipaddress.ip_address(address.split('%')[0]).is_loopback for address in addresses):
+        raise ValueError(f"The analysis service only binds to localhost, not {host!r}")
+
+
+class ExportPipe(io.RawIOBase):
+    """Binary file object whose writes are handed to the event loop in bounded chunks
+
+    The writing thread blocks while EXPORT_QUEUE_CHUNKS chunks are waiting,
+    and stops with BrokenPipeError once the reader has gone away.
+    """
+
+    def __init__(self, chunk_bytes: int = EXPORT_CHUNK_BYTES):
+        super().__init__()
+        self.chunk_bytes = chunk_bytes
+        self._buffer = bytearray()
+        self._chunks = queue.Queue(EXPORT_QUEUE_CHUNKS)
+        self._abandoned = threading.Event()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_bytes:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _put(self, item):
+        while not self._abandoned.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise BrokenPipeError("Export reader went away")
+
+    def finish(self, error: Exception = None):
+        """Flush what is left and mark the end (or failure) of the export"""
+        if error is None and self._buffer:
+            self._put(bytes(self._buffer))
+        self._put(error)
+
+    def next_chunk(self):
+        """Blocking: the next bytes chunk, None at the end or once abandoned; re-raises the writer's error"""
+        while True:
+            try:
+                item = self._chunks.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._abandoned.is_set():
+                    return None
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def abandon(self):
+        self._abandoned.set()
+
+
+class ServiceMetrics:
+    """Counters and gauges exposed on /metrics"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = {}
+        self.sequences = 0
+        self.batches = 0
+        self.batched_sequences = 0
+        self.rejected = 0
+        self.failed = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def request(self, path: str, status: int, seconds: float):
+        key = (path, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.latency_sum += seconds
+        self.latency_count += 1
+
+    def render(self, pending: int, running: int, prefix: str = 'splice_service') -> str:
+        lines = [f'# TYPE {prefix}_requests_total counter']
+        lines += [f'{prefix}_requests_total{{path="{path}",status="{status}"}} {count}'
+                  for (path, status), count in sorted(self.requests.items())]
+        lines += [
+            f'# TYPE {prefix}_request_seconds summary',
+            f'{prefix}_request_seconds_sum {self.latency_sum:.6f}',
+            f'{prefix}_request_seconds_count {self.latency_count}',
+            f'# TYPE {prefix}_sequences_total counter',
+            f'{prefix}_sequences_total {self.sequences}',
+            f'# TYPE {prefix}_batches_total counter',
+            f'{prefix}_batches_total {self.batches}',
+            f'# TYPE {prefix}_batched_sequences_total counter',
+            f'{prefix}_batched_sequences_total {self.batched_sequences}',
+            f'# TYPE {prefix}_rejected_total counter',
+            f'{prefix}_rejected_total {self.rejected}',
+            f'# TYPE {prefix}_failed_batches_total counter',
+            f'{prefix}_failed_batches_total {self.failed}',
+            f'# TYPE {prefix}_pending_sequences gauge',
+            f'{prefix}_pending_sequences {pending}',
+            f'# TYPE {prefix}_running_batches gauge',
+            f'{prefix}_running_batches {running}',
+            f'# TYPE {prefix}_uptime_seconds gauge',
+            f'{prefix}_uptime_seconds {time.time() - self.started:.1f}'
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+class AnalysisService:
+    """asyncio HTTP server that micro-batches analyze requests onto a process pool"""
+
+    def __init__(self, analyzer, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = None, batch_window: float = DEFAULT_BATCH_WINDOW,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        _require_loopback(host)
+        self.analyzer = analyzer
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.max_body_bytes = max_body_bytes
+        self.metrics = ServiceMetrics()
+        self._pending = 0
+        self._running = 0
+        self._queue = None
+        self._slots = None
+        self._executor = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        self._queue = asyncio.Queue()
+        # One batch per worker at a time; the rest wait in the queue and count as pending
+        self._slots = asyncio.Semaphore(self.workers)
+        # Spawned, not forked: forking under a running event loop and executor threads can deadlock
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.analyzer,), mp_context=get_context('spawn'))
+        # Start and warm up every worker now so the first requests don't pay for process start-up
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._executor, _warm_up_worker)
+                               for _ in range(self.workers)])
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, sequences: list) -> list:
+        """Queue sequences for analysis; returns one future per sequence"""
+        if self._pending + len(sequences) > self.max_pending:
+            self.metrics.rejected += 1
+            raise HTTPError(503, f"Too many pending sequences (limit {self.max_pending})")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for sequence in sequences:
+            future = loop.create_future()
+            self._pending += 1
+            future.add_done_callback(self._settled)
+            self._queue.put_nowait((sequence, future))
+            futures.append(future)
+        self.metrics.sequences += len(sequences)
+        return futures
+
+    def _settled(self, future):
+        self._pending -= 1
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Requests whose client went away are dropped before any work is done
+            batch = [(sequence, future) for sequence, future in batch if not future.done()]
+            if not batch:
+                continue
+            await self._slots.acquire()
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        self._running += 1
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _analyze_chunk, [sequence for sequence, _ in batch])
+        except Exception as exc:
+            self.metrics.failed += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            self.metrics.batches += 1
+            self.metrics.batched_sequences += len(batch)
+            for (_, future), result in zip(batch, results):
+                self.analyzer.record_metrics(result)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    def health(self) -> dict:
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'pending_sequences': self._pending,
+            'running_batches': self._running,
+            'max_pending': self.max_pending,
+            'uptime_seconds': time.time() - self.metrics.started
+        }
+
+    async def _read_request(self, reader) -> tuple:
+        request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b''
+        keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+        return method, target.split('?', 1)[0], body, keep_alive
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as exc:
+                    await self._send_json(writer, exc.status, {'error': str(exc)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                started = time.perf_counter()
+                try:
+                    status = await self._dispatch(writer, method, path, body, keep_alive)
+                except HTTPError as exc:
+                    status = exc.status
+                    await self._send_json(writer, status, {'error': str(exc)}, keep_alive)
+                self.metrics.request(path, status, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, writer, method: str, path: str, body: bytes, keep_alive: bool) -> int:
+        if path == '/health':
+            await self._send_json(writer, 200, self.health(), keep_alive)
+            return 200
+        if path == '/metrics':
+            text = self.metrics.render(self._pending, self._running).encode('utf-8')
+            await self._send(writer, 200, text, 'text/plain; version=0.0.4', keep_alive)
+            return 200
+        if path not in ('/analyze', '/export'):
+            raise HTTPError(404, f"No route for {path}")
+        if method != 'POST':
+            raise HTTPError(405, f"Use POST for {path}")
+
+        try:
+            if len(body) > INLINE_JSON_BYTES:
+                payload = await asyncio.to_thread(json.loads, body)
+            else:
+                payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+
+        if path == '/export':
+            await self._stream_export(writer, payload, keep_alive)
+            return 200
+        if isinstance(payload, dict) and isinstance(payload.get('sequence'), str):
+            (future,) = await self.submit([payload['sequence']])
+            await self._send_json(writer, 200, await self._outcome(future), keep_alive)
+            return 200
+        sequences = payload.get('sequences') if isinstance(payload, dict) else None
+        if not isinstance(sequences, list) or not all(isinstance(seq, str) for seq in sequences):
+            raise HTTPError(400, "Expected {\"sequence\": str} or {\"sequences\": [str, ...]}")
+
+        futures = await self.submit(sequences)
+        try:
+            await self._stream_results(writer, futures, keep_alive)
+        finally:
+            for future in futures:
+                future.cancel()
+        return 200
+
+    @staticmethod
+    async def _outcome(future) -> dict:
+        try:
+            return await future
+        except Exception as exc:
+            return {'error': f"Analysis failed: {exc}"}
+
+    async def _stream_results(self, writer, futures: list, keep_alive: bool):
+        """NDJSON with chunked transfer encoding, one line per result as soon as it is ready"""
+        writer.write(self._head(200, 'application/x-ndjson', keep_alive,
+                                [('Transfer-Encoding', 'chunked')]))
+        for future in futures:
+            line = dumps(await self._outcome(future)) + b'\n'
+            writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    def _write_export(self, pipe: ExportPipe, scan, table: str, fmt: str, min_score):
+        from .result_export import iter_scan_batches, write_batches
+
+        try:
+            try:
+                write_batches(iter_scan_batches(self.analyzer, scan, table, min_intron_score=min_score),
+                              pipe, fmt)
+            except BrokenPipeError:
+                raise
+            except Exception as exc:
+                pipe.finish(exc)
+            else:
+                pipe.finish()
+        except BrokenPipeError:
+            # The client went away; nobody is reading the rest
+            pass
+
+    async def _stream_export(self, writer, payload, keep_alive: bool):
+        """One table of a sequence's analysis (see result_export), with chunked transfer encoding
+
+        The export takes a worker slot while it runs. Errors after the
+        headers are sent end the connection without the final chunk, so
+        the client sees a truncated response rather than a short file.
+        """
+        from .result_export import EXPORT_FORMATS, check_export
+        from .sequence_ingest import SequenceValidationError
+
+        if not isinstance(payload, dict) or not isinstance(payload.get('sequence'), str):
+            raise HTTPError(400, "Expected {\"sequence\": str, \"table\": str, \"format\": str}")
+        table, fmt = payload.get('table', 'sites'), payload.get('format', 'csv')
+        min_score = payload.get('min_score')
+        try:
+            check_export(table, fmt)
+            min_score = None if min_score is None else float(min_score)
+        except (TypeError, ValueError) as exc:
+            raise HTTPError(400, str(exc))
+
+        async with self._slots:
+            try:
+                scan = await asyncio.to_thread(self.analyzer.scored_scan, payload['sequence'])
+            except SequenceValidationError as exc:
+                raise HTTPError(400, str(exc))
+            mime, extension = EXPORT_FORMATS[fmt]
+            writer.write(self._head(200, mime, keep_alive, [
+                ('Transfer-Encoding', 'chunked'),
+                ('Content-Disposition', f'attachment; filename="dna_analysis_{table}.{extension}"')]))
+            pipe = ExportPipe()
+            producer = asyncio.create_task(asyncio.to_thread(self._write_export, pipe, scan, table, fmt,
+                                                             min_score))
+            try:
+                while (chunk := await asyncio.to_thread(pipe.next_chunk)) is not None:
+                    writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                    await writer.drain()
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            except ConnectionError:
+                raise
+            except Exception as exc:
+                self.metrics.failed += 1
+                raise ConnectionAbortedError(f"Export failed: {exc}") from exc
+            finally:
+                pipe.abandon()
+                await producer
+
+    @staticmethod
+    def _head(status: int, content_type: str, keep_alive: bool, extra=()) -> bytes:
+        lines = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}',
+                 f'Content-Type: {content_type}',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines += [f'{name}: {value}' for name, value in extra]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, keep_alive: bool):
+        extra = [('Content-Length', len(body))]
+        if status == 503:
+            extra.append(('Retry-After', 1))
+        writer.write(self._head(status, content_type, keep_alive, extra) + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload, keep_alive: bool):
+        await self._send(writer, status, dumps(payload), 'application/json', keep_alive)
+
+
+async def serve(analyzer, **options):
+    service = await AnalysisService(analyzer, **options).start()
+    print(f"Analysis service listening on http://{service.host}:{service.port}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    import argparse
+
+    from .analyzer import AdvancedDNAAnalyzer
+    from .result_cache import ResultCache
+
+    parser = argparse.ArgumentParser(description="Local analysis service with micro-batching")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="loopback address to bind")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="seconds to wait for more requests before running a batch")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help="queued sequences before requests are rejected with 503")
+    parser.add_argument('--cache-dir', help="directory for the on-disk result cache")
+    args = parser.parse_args(argv)
+
+    analyzer = AdvancedDNAAnalyzer(cache=ResultCache(disk_dir=args.cache_dir) if args.cache_dir else None)
+    try:
+        asyncio.run(serve(analyzer, host=args.host, port=args.port, workers=args.workers,
+                          batch_window=args.batch_window, max_batch_size=args.max_batch_size,
+                          max_pending=args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,546 @@
+"""
+Whole-sequence splice junction analysis: sites, introns, ORFs and a class call
+
+GT donors and AG acceptors (optionally AC/CT on the reverse strand) are
+found and scored with position weight matrices, paired into intron
+candidates within the length limits, and reported with six-frame ORFs
+and a rule-based exon/intron/site prediction. A trained k-mer model, if
+present, adds its own probabilities. Long inputs can be analyzed in
+shards, as a batch, incrementally or streamed from a file; results are
+cached by sequence and settings, with per-stage timings.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from . import __version__
+from .analysis_result import AnalysisResult, SiteColumns
+from .batch_analysis import analyze_batch
+from .branch_point import AcceptorScreen
+from .fasta_stream import DEFAULT_CHUNK_SIZE, stream_analyze
+from .incremental_scan import IncrementalState, build_state, update_state
+from .instrumentation import StageTimer
+from .intron_pairing import (
+    DEFAULT_MAX_INTRON_LENGTH, DEFAULT_MIN_INTRON_LENGTH, DEFAULT_MIN_INTRON_SCORE, PairIndex,
+    build_pair_index, pair_introns
+)
+from .kmer_model import (
+    CLASSES, DEFAULT_MODEL_PATH, SpliceSiteClassifier, classifier_fingerprint, load_classifier,
+    load_training_csv, reverse_site_windows, site_windows, synthesize_training_windows,
+    tiled_windows
+)
+from .orf_finder import DEFAULT_MIN_ORF_LENGTH, find_orfs, orf_dicts
+from .result_cache import ResultCache, make_cache_key
+from .sequence_ingest import IngestedSequence, SequenceValidationError, ingest_sequence
+from .sharded_analysis import scan_sharded
+from .splice_scoring import (
+    ReverseComplementModel, default_acceptor_model, default_donor_model, load_model,
+    model_digest, score_scan, site_probability
+)
+from .splice_scanner import (
+    C, G, N, STOP_CODONS, SpliceSiteScan, find_motif, reverse_strand_scan, scan_splice_sites
+)
+from .twobit_store import TwoBitRegion, n_runs
+from .window_tracks import DEFAULT_TRACK_WINDOW, compute_tracks
+
+# Windows fed to the k-mer model for the whole-sequence class probabilities
+MAX_CLASSIFIED_WINDOWS = 2000
+# Analyzed once by warm_up: starts, stops and both site motifs on both strands
+WARM_UP_SEQUENCE = 'ATGGCCAAGGTAAGTCTTCCCTTTTTCCAGGCTGACTTGCACTGA' * 20
+
+class UltraSimpleDNAAnalyzer:
+    """Simple DNA analyzer; scikit-learn is only needed to train the k-mer model"""
+    
+    def __init__(self, min_intron_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                 max_intron_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                 max_introns: int = 5, non_overlapping_introns: bool = True,
+                 donor_model=None, acceptor_model=None,
+                 min_donor_score: float = None, min_acceptor_score: float = None,
+                 model_path=DEFAULT_MODEL_PATH, cache: ResultCache = None,
+                 profile: str = None, metrics_sink=None, both_strands: bool = False,
+                 min_orf_length: int = DEFAULT_MIN_ORF_LENGTH,
+                 min_pyrimidine_fraction: float = None, require_branch_point: bool = False):
+        self.model_path = model_path
+        # Also report reverse-strand sites (AC donors, CT acceptors) in forward coordinates
+        self.both_strands = both_strands
+        self.cache = cache
+        # 'cprofile' or 'tracemalloc' adds a profile report to each result's timings
+        self.profile = profile
+        # Anything with emit(timings), e.g. instrumentation.PrometheusTextfileSink
+        self.metrics_sink = metrics_sink
+        self.min_intron_length = min_intron_length
+        self.max_intron_length = max_intron_length
+        # Shortest six-frame ORF (nt, stop included) reported and counted as coding potential
+        self.min_orf_length = min_orf_length
+        self.max_introns = max_introns
+        self.non_overlapping_introns = non_overlapping_introns
+        # Scoring models may be given as model objects or paths to JSON specs
+        self.donor_model = self._load_scoring_model(donor_model, default_donor_model)
+        self.acceptor_model = self._load_scoring_model(acceptor_model, default_acceptor_model)
+        self.min_donor_score = min_donor_score
+        self.min_acceptor_score = min_acceptor_score
+        # Optional: acceptor candidates need a polypyrimidine tract and/or a branch point to be scored.
+        # Off by default, so acceptor counts stay comparable with donors and with splice_cli
+        self.acceptor_screen = AcceptorScreen(min_pyrimidine_fraction, require_branch_point)
+    
+    def config(self) -> dict:
+        """Every setting that changes the result; part of the cache key"""
+        return {
+            'min_intron_length': self.min_intron_length,
+            'max_intron_length': self.max_intron_length,
+            'max_introns': self.max_introns,
+            'non_overlapping_introns': self.non_overlapping_introns,
+            'both_strands': self.both_strands,
+            'min_orf_length': self.min_orf_length,
+            'min_donor_score': self.min_donor_score,
+            'min_acceptor_score': self.min_acceptor_score,
+            **self.acceptor_screen.config(),
+            'donor_model': model_digest(self.donor_model),
+            'acceptor_model': model_digest(self.acceptor_model),
+            'classifier': classifier_fingerprint(self.model_path)
+        }
+    
+    def _cached(self, normalized, analyze, timer: StageTimer) -> dict:
+        """Look the normalized sequence up in the result cache, analyzing on a miss"""
+        if self.cache is None:
+            return analyze()
+        with timer.stage('cache_lookup'):
+            key = make_cache_key(normalized, self.config(), __version__)
+            result = self.cache.get(key)
+        if result is not None:
+            timer.count('cache_hits')
+            return result
+        result = analyze()
+        self._store(normalized, result, timer, key)
+        return result
+    
+    def _store(self, normalized, result: dict, timer: StageTimer, key: str = None):
+        """Put a freshly computed result in the result cache, if there is one"""
+        if self.cache is None:
+            return
+        with timer.stage('cache_store'):
+            self.cache.put(key or make_cache_key(normalized, self.config(), __version__), result)
+    
+    def _finish(self, result: dict, timer: StageTimer, input_bytes: int) -> dict:
+        """Attach this run's timings and counters to the result and report them"""
+        timer.count('bytes_processed', input_bytes)
+        if 'error' not in result:
+            junctions = result['splice_junctions']
+            timer.count('bases_analyzed', result['length'])
+            timer.count('donor_sites', junctions['total_donors'])
+            timer.count('acceptor_sites', junctions['total_acceptors'])
+            timer.count('intron_candidates', junctions['total_intron_candidates'])
+        result['timings'] = timer.as_dict()
+        self.record_metrics(result)
+        return result
+    
+    def record_metrics(self, result: dict):
+        """Send a result's timings to the metrics sink, if one is configured"""
+        if self.metrics_sink is not None and 'timings' in result:
+            self.metrics_sink.emit(result['timings'])
+    
+    @property
+    def is_trained(self) -> bool:
+        return load_classifier(self.model_path) is not None
+    
+    def warm_up(self) -> float:
+        """Load the classifier and run one small analysis, so the first request starts warm
+        
+        Bypasses the result cache and metrics; returns the seconds taken.
+        """
+        started = time.perf_counter()
+        load_classifier(self.model_path)
+        self._analyze_clean(WARM_UP_SEQUENCE)
+        return time.perf_counter() - started
+    
+    @staticmethod
+    def _load_scoring_model(model, default):
+        if model is None:
+            return default()
+        if isinstance(model, (str, Path)):
+            return load_model(model)
+        return model
+    
+    def analyze_sequence(self, sequence) -> dict:
+        """Analyze DNA sequence with simple rules
+        
+        `sequence` may be text, bytes or a memoryview (normalized by
+        sequence_ingest, keeping N gaps so positions match the input), an
+        IngestedSequence, or a TwoBitRegion of a stored genome, which is
+        decoded straight to codes without building a string.
+        """
+        timer = StageTimer(self.profile)
+        with timer.capture():
+            if isinstance(sequence, TwoBitRegion):
+                with timer.stage('decode'):
+                    codes = sequence.codes()
+                result = self._cached(codes, lambda: self._analyze_codes(codes, timer), timer)
+            else:
+                try:
+                    with timer.stage('normalize'):
+                        ingested = ingest_sequence(sequence)
+                        seq = ingested.as_str()
+                except SequenceValidationError as exc:
+                    result = {'error': str(exc)}
+                else:
+                    result = self._cached(ingested.text, lambda: self._analyze_clean(seq, timer), timer)
+        return self._finish(result, timer, len(sequence))
+    
+    def _analyze_clean(self, seq: str, timer: StageTimer = None) -> dict:
+        """Analysis of an already normalized sequence string (ACGT plus N)"""
+        if len(seq) - seq.count('N') < 50:
+            return {'error': 'Sequence too short (min 50 bp)'}
+        
+        timer = timer or StageTimer()
+        with timer.stage('scan'):
+            scan = scan_splice_sites(seq, self.both_strands)
+        with timer.stage('scoring'):
+            scan = self._score_sites(scan)
+        with timer.stage('codons'):
+            has_start = 'ATG' in seq
+            has_stop = any(stop in seq for stop in STOP_CODONS)
+        return self._summarize(scan, has_start, has_stop, timer)
+    
+    def _analyze_codes(self, codes: np.ndarray, timer: StageTimer = None) -> dict:
+        """Same as analyze_sequence for an encoded sequence"""
+        if np.count_nonzero(codes < N) < 50:
+            return {'error': 'Sequence too short (min 50 bp)'}
+        
+        timer = timer or StageTimer()
+        with timer.stage('scan'):
+            scan = scan_splice_sites(codes, self.both_strands)
+        with timer.stage('scoring'):
+            scan = self._score_sites(scan)
+        with timer.stage('codons'):
+            has_start = len(find_motif(codes, 'ATG')) > 0
+            has_stop = any(len(find_motif(codes, stop)) > 0 for stop in STOP_CODONS)
+        return self._summarize(scan, has_start, has_stop, timer)
+    
+    def analyze_sharded(self, sequence: str, workers: int = None, shard_size: int = None) -> dict:
+        """Analyze one very long sequence in parallel shards; same output as analyze_sequence"""
+        if not sequence:
+            return self.analyze_sequence(sequence)
+        
+        raw = sequence.text if isinstance(sequence, IngestedSequence) else sequence
+        timer = StageTimer(self.profile)
+        with timer.capture():
+            try:
+                with timer.stage('sharded_scan'):
+                    scan, has_start, has_stop = scan_sharded(
+                        raw, self.donor_model, self.acceptor_model, workers, shard_size,
+                        self.acceptor_screen
+                    )
+                    if self.both_strands:
+                        scan.reverse = reverse_strand_scan(scan)
+            except SequenceValidationError as exc:
+                result = {'error': str(exc)}
+            else:
+                if scan.length - scan.base_counts[N] < 50:
+                    result = {'error': 'Sequence too short (min 50 bp)'}
+                else:
+                    with timer.stage('scoring'):
+                        scan = self._score_sites(scan)
+                    result = self._summarize(scan, has_start, has_stop, timer)
+        return self._finish(result, timer, len(sequence))
+    
+    def analyze_incremental(self, sequence, state: IncrementalState = None) -> tuple:
+        """Analyze an edited version of an earlier sequence; returns (result, state)
+        
+        Pass the returned state back with the next version and only the
+        edited span is rescanned. Without a state, or with one made under
+        other settings, the result cache is consulted first and the whole
+        sequence is scanned on a miss. Every computed result is cached.
+        """
+        timer = StageTimer(self.profile)
+        with timer.capture():
+            try:
+                with timer.stage('normalize'):
+                    ingested = ingest_sequence(sequence)
+                    codes = ingested.codes
+            except SequenceValidationError as exc:
+                return self._finish({'error': str(exc)}, timer, len(sequence)), state
+            
+            if state is None or state.config != self.config():
+                built = []
+                
+                def analyze():
+                    with timer.stage('scan'):
+                        built.append(build_state(self, codes))
+                    return self._summarize_state(built[0], timer)
+                
+                # A cache hit leaves no state; the next edit then starts over
+                result = self._cached(ingested.text, analyze, timer)
+                state = built[0] if built else None
+            else:
+                with timer.stage('incremental_scan'):
+                    state = update_state(self, state, codes)
+                timer.count('incremental_updates')
+                result = self._summarize_state(state, timer)
+                self._store(ingested.text, result, timer)
+        return self._finish(result, timer, len(sequence)), state
+    
+    def _summarize_state(self, state: IncrementalState, timer: StageTimer) -> dict:
+        if len(state.codes) - state.scan.base_counts[N] < 50:
+            return {'error': 'Sequence too short (min 50 bp)'}
+        return self._summarize(state.scan, state.has_start, state.has_stop, timer, state.pair_indexes)
+    
+    def _score_sites(self, scan: SpliceSiteScan) -> SpliceSiteScan:
+        """Screen acceptor candidates, score every site and drop those below the configured thresholds
+        
+        Scans scored elsewhere (sharded shards) were screened there.
+        """
+        for strand_scan in self._strands(scan):
+            if strand_scan.acceptor_scores is None:
+                strand_scan.acceptor_positions = self.acceptor_screen.screen(
+                    strand_scan.codes, strand_scan.acceptor_positions, strand_scan.strand)
+        if scan.donor_scores is None:
+            score_scan(scan, self.donor_model, self.acceptor_model)
+        if scan.reverse is not None and scan.reverse.donor_scores is None:
+            score_scan(scan.reverse, ReverseComplementModel(self.donor_model),
+                       ReverseComplementModel(self.acceptor_model))
+        return scan.filter_by_score(self.min_donor_score, self.min_acceptor_score)
+    
+    @staticmethod
+    def _strands(scan: SpliceSiteScan) -> list:
+        return [scan] if scan.reverse is None else [scan, scan.reverse]
+    
+    @staticmethod
+    def _pair_sides(scan: SpliceSiteScan) -> tuple:
+        """(left, right, left_scores, right_scores) in pairing order
+        
+        On the '-' strand the acceptor (CT) lies left of the donor (AC), so
+        the pairing runs acceptor -> donor.
+        """
+        if scan.strand == '-':
+            return scan.acceptor_positions, scan.donor_positions, scan.acceptor_scores, scan.donor_scores
+        return scan.donor_positions, scan.acceptor_positions, scan.donor_scores, scan.acceptor_scores
+    
+    def _pair_index(self, scan: SpliceSiteScan) -> PairIndex:
+        left, right, _, right_scores = self._pair_sides(scan)
+        return build_pair_index(left, right, right_scores, self.min_intron_length, self.max_intron_length)
+    
+    def _pair_strand(self, scan: SpliceSiteScan, index: PairIndex = None) -> tuple:
+        """Top introns of one strand and the number of candidates
+        
+        On the '-' strand the pairing runs acceptor -> donor and the keys
+        are swapped back.
+        """
+        left, right, left_scores, right_scores = self._pair_sides(scan)
+        if index is None:
+            index = self._pair_index(scan)
+        
+        introns = pair_introns(
+            left, right, self.max_introns, left_scores, right_scores,
+            min_length=self.min_intron_length,
+            max_length=self.max_intron_length,
+            non_overlapping=self.non_overlapping_introns,
+            index=index
+        )
+        for intron in introns:
+            if scan.strand == '-':
+                intron['donor'], intron['acceptor'] = intron['acceptor'], intron['donor']
+            intron['strand'] = scan.strand
+        return introns, index.total
+    
+    @staticmethod
+    def _best_first(items: list, position_key: str, limit: int) -> list:
+        return sorted(items, key=lambda item: (-item.get('score', 0.0), item[position_key]))[:limit]
+    
+    def _summarize(self, scan: SpliceSiteScan, has_start: bool, has_stop: bool,
+                   timer: StageTimer = None, pair_indexes: dict = None) -> AnalysisResult:
+        """Build the result from a scan of the cleaned sequence
+        
+        pair_indexes maps strand to a ready PairIndex (incremental analysis).
+        """
+        timer = timer or StageTimer()
+        pair_indexes = pair_indexes or {}
+        length = scan.length
+        strands = self._strands(scan)
+        masked_bases = int(scan.base_counts[N])
+        gc_content = float(scan.base_counts[C] + scan.base_counts[G]) / (length - masked_bases) * 100
+        
+        with timer.stage('pairing'):
+            intron_boundaries, total_introns = self._pair_strand(scan, pair_indexes.get('+'))
+            if scan.reverse is not None:
+                minus_introns, minus_total = self._pair_strand(scan.reverse, pair_indexes.get('-'))
+                intron_boundaries = self._best_first(
+                    intron_boundaries + minus_introns, 'donor', self.max_introns)
+                total_introns += minus_total
+        
+        with timer.stage('orfs'):
+            orfs = find_orfs(scan.codes, self.min_orf_length)
+        with timer.stage('classify'):
+            prediction, confidence, class_probs, model_probs = self._classify(scan, gc_content, orfs)
+        with timer.stage('report'):
+            donor_sites = self._best_first(
+                [site for strand in strands for site in strand.donor_sites(limit=10)], 'position', 10)
+            acceptor_sites = self._best_first(
+                [site for strand in strands for site in strand.acceptor_sites(limit=10)], 'position', 10)
+            self._add_site_probabilities(scan, donor_sites, 'donor_site')
+            self._add_site_probabilities(scan, acceptor_sites, 'acceptor_site')
+            donors = SiteColumns.from_strands([s.donor_positions for s in strands],
+                                              [s.donor_scores for s in strands],
+                                              [s.strand for s in strands])
+            acceptors = SiteColumns.from_strands([s.acceptor_positions for s in strands],
+                                                 [s.acceptor_scores for s in strands],
+                                                 [s.strand for s in strands])
+        
+        result = AnalysisResult(
+            sequence=scan.preview(100),
+            length=length,
+            overall_prediction=prediction,
+            overall_confidence=confidence,
+            class_probabilities=class_probs,
+            gc_content=gc_content,
+            masked_bases=masked_bases,
+            masked_regions=n_runs(scan.codes).tolist() if masked_bases else [],
+            orfs=orf_dicts(orfs, limit=10),
+            orf_count=len(orfs['start']),
+            longest_orf=int(orfs['length'][0]) if len(orfs['length']) else 0,
+            has_start_codon=1 if has_start else 0,
+            has_stop_codon=1 if has_stop else 0,
+            donor_sites=donor_sites,
+            acceptor_sites=acceptor_sites,
+            intron_boundaries=intron_boundaries,
+            total_intron_candidates=total_introns,
+            donors=donors,
+            acceptors=acceptors
+        )
+        if model_probs is not None:
+            result['site_class_probabilities'] = model_probs
+        if scan.reverse is not None:
+            result.strand_counts = {
+                strand.strand: {'donors': strand.total_donors, 'acceptors': strand.total_acceptors}
+                for strand in strands
+            }
+        return result
+    
+    def _classify(self, scan: SpliceSiteScan, gc_content: float, orfs: dict) -> tuple:
+        """Overall prediction, its confidence, the class probabilities and the model's probabilities
+        
+        Coding potential means at least one six-frame ORF of min_orf_length.
+        class_probabilities always follow the rule-based prediction; the
+        k-mer model's mean window probabilities, if a model is loaded, are
+        returned separately (None otherwise) since it scores different
+        evidence.
+        """
+        strands = self._strands(scan)
+        total_donors = sum(s.total_donors for s in strands)
+        total_acceptors = sum(s.total_acceptors for s in strands)
+        if gc_content > 50 and len(orfs['start']):
+            prediction = 'exon'
+            confidence = 85.0
+        elif total_donors > 0 or total_acceptors > 0:
+            if total_donors > total_acceptors:
+                prediction = 'donor_site'
+                best_score = max(s.donor_scores.max() for s in strands if s.total_donors)
+            else:
+                prediction = 'acceptor_site'
+                best_score = max(s.acceptor_scores.max() for s in strands if s.total_acceptors)
+            confidence = site_probability(best_score)
+        elif gc_content < 40:
+            prediction = 'intron'
+            confidence = 70.0
+        else:
+            prediction = 'unknown'
+            confidence = 50.0
+        
+        model_probs = None
+        classifier = load_classifier(self.model_path)
+        if classifier is not None:
+            # Mean class probabilities over windows tiled along the sequence
+            windows = tiled_windows(scan.codes, MAX_CLASSIFIED_WINDOWS)
+            probabilities = classifier.predict_proba(windows).mean(axis=0) * 100
+            model_probs = {label: float(p) for label, p in zip(CLASSES, probabilities)}
+        
+        class_probs = {
+            'exon': 25.0,
+            'intron': 25.0,
+            'donor_site': 25.0,
+            'acceptor_site': 25.0
+        }
+        class_probs[prediction] = confidence
+        return prediction, confidence, class_probs, model_probs
+    
+    def _add_site_probabilities(self, scan: SpliceSiteScan, sites: list, label: str):
+        """Attach the k-mer model's probability for `label` to the reported sites"""
+        classifier = load_classifier(self.model_path)
+        if classifier is None or not sites:
+            return
+        positions = np.array([site['position'] for site in sites])
+        minus = np.array([site.get('strand') == '-' for site in sites])
+        windows = site_windows(scan.codes, positions)
+        if minus.any():
+            windows[minus] = reverse_site_windows(scan.codes, positions[minus])
+        probabilities = classifier.predict_proba(windows)
+        for site, p in zip(sites, probabilities[:, CLASSES.index(label)]):
+            site['probability'] = float(p * 100)
+    
+    def analyze_batch(self, sequences, workers: int = None):
+        """Analyze many sequences across a process pool, yielding results in input order"""
+        return analyze_batch(self, sequences, workers)
+    
+    def analyze_file(self, path, chunk_size: int = DEFAULT_CHUNK_SIZE, per_record: bool = None) -> dict:
+        """Stream a (gzipped) FASTA/FASTQ file and return running aggregates (see stream_analyze)"""
+        return stream_analyze(path, chunk_size, per_record)
+    
+    def scored_scan(self, sequence) -> SpliceSiteScan:
+        """Every site of the sequence, scored and filtered with this analyzer's settings"""
+        return self._score_sites(scan_splice_sites(ingest_sequence(sequence).codes, self.both_strands))
+    
+    def window_tracks(self, sequence, window: int = DEFAULT_TRACK_WINDOW, step: int = None) -> dict:
+        """GC %, site density, CpG ratio and class prediction per sliding window
+        
+        Windows are `window` bases every `step` bases (default window // 2);
+        see window_tracks.compute_tracks for the columns.
+        """
+        return compute_tracks(self.scored_scan(sequence), window, step, self.min_orf_length)
+    
+    def export_table(self, sequence, table: str, fmt: str = 'csv', handle=None,
+                     min_intron_score: float = None):
+        """Write every site, intron candidate or window of a sequence as CSV, Parquet or Arrow
+        
+        See result_export; returns the file object written to.
+        """
+        from .result_export import export_table
+        
+        return export_table(self, sequence, table, fmt, handle, min_intron_score=min_intron_score)
+    
+    def compare_annotation(self, sequence, annotation, record: str = None, offset: int = 0,
+                           tolerance: int = 0,
+                           min_intron_score: float = DEFAULT_MIN_INTRON_SCORE) -> dict:
+        """Sensitivity and precision of this sequence's sites and introns against an annotation
+        
+        `annotation` is a FeatureIndex (annotation_compare.load_gtf); the
+        sequence lies at offset on record, by default its FASTA name.
+        Introns are candidates scoring at least min_intron_score.
+        """
+        from .annotation_compare import compare_scan
+        
+        ingested = ingest_sequence(sequence)
+        record = record or ingested.name
+        if not record:
+            raise ValueError("record is required when the sequence has no name")
+        return compare_scan(self.scored_scan(ingested), annotation, record, offset, tolerance,
+                            self.min_intron_length, self.max_intron_length, min_intron_score)
+    
+    def train_model(self, training_csv=None, per_class: int = 2000, n_estimators: int = 100) -> dict:
+        """Train the k-mer Random Forest and save it to model_path
+        
+        Uses a CSV of labelled windows ('sequence', 'label') when given,
+        otherwise windows sampled from the built-in consensus models.
+        """
+        if training_csv is not None:
+            windows, labels = load_training_csv(training_csv)
+        else:
+            windows, labels = synthesize_training_windows(per_class)
+        
+        classifier = SpliceSiteClassifier(n_estimators=n_estimators)
+        metrics = classifier.train(windows, labels)
+        classifier.save(self.model_path)
+        return metrics
+
+# Alias
+AdvancedDNAAnalyzer = UltraSimpleDNAAnalyzer
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Process-wide registry of analyzers and the read-only models they share
+
+Scoring models are loaded once per process and shared by every analyzer,
+and one analyzer is kept per distinct set of settings, so concurrent
+Streamlit sessions use the same objects. Lookups are plain dict reads;
+the lock is only taken to build something missing. The k-mer classifier
+already has its own process-wide cache (kmer_model.load_classifier).
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from .analyzer import AdvancedDNAAnalyzer
+from .splice_scoring import default_acceptor_model, default_donor_model, load_model
+
+_DEFAULT_MODELS = {'donor': default_donor_model, 'acceptor': default_acceptor_model}
+
+# Reentrant: building an analyzer looks up its models under the same lock
+_lock = threading.RLock()
+_models = {}
+_analyzers = {}
+
+
+def _get_or_create(registry: dict, key, create):
+    value = registry.get(key)
+    if value is None:
+        with _lock:
+            value = registry.get(key)
+            if value is None:
+                value = create()
+                registry[key] = value
+    return value
+
+
+def _model_key(spec, kind: str) -> tuple:
+    """('default', kind) or (resolved path, mtime), so an edited spec file is reloaded"""
+    if spec is None:
+        return ('default', kind)
+    path = Path(spec).resolve()
+    return (str(path), os.path.getmtime(path))
+
+
+def shared_model(spec=None, kind: str = 'donor'):
+    """The scoring model for a JSON spec path, or the built-in 'donor'/'acceptor' one"""
+    if kind not in _DEFAULT_MODELS:
+        raise ValueError(f"Unknown model kind {kind!r}; expected 'donor' or 'acceptor'")
+    create = _DEFAULT_MODELS[kind] if spec is None else lambda: load_model(spec)
+    return _get_or_create(_models, _model_key(spec, kind), create)
+
+
+def get_analyzer(cache=None, metrics_sink=None, donor_model=None, acceptor_model=None,
+                 **settings) -> AdvancedDNAAnalyzer:
+    """The shared analyzer for these settings (AdvancedDNAAnalyzer keyword arguments)
+
+    Models are given as spec paths or None for the defaults. The analyzer
+    is used by other sessions too: never assign its attributes, ask for
+    the analyzer with the changed settings instead.
+    """
+    donor_key = _model_key(donor_model, 'donor')
+    acceptor_key = _model_key(acceptor_model, 'acceptor')
+    key = (cache, metrics_sink, donor_key, acceptor_key, tuple(sorted(settings.items())))
+    return _get_or_create(_analyzers, key, lambda: AdvancedDNAAnalyzer(
+        donor_model=shared_model(donor_model, 'donor'),
+        acceptor_model=shared_model(acceptor_model, 'acceptor'),
+        cache=cache, metrics_sink=metrics_sink, **settings
+    ))
+
+
+def warm_up(**settings) -> float:
+    """Build the shared analyzer for settings and run its warm-up; returns the seconds taken"""
+    return get_analyzer(**settings).warm_up()
+
+
+def clear():
+    """Forget every shared analyzer and model (the next lookups rebuild them)"""
+    with _lock:
+        _analyzers.clear()
+        _models.clear()
@@ -0,0 +1,417 @@
+"""
+Compare predicted splice sites and introns against a reference annotation
+
+    python -m splice_junction.annotation_compare gencode.gtf.gz sites.bed --tolerance 2
+
+Introns come from consecutive exons of each GTF transcript and are kept
+per (record, strand) as arrays sorted by start, next to sorted donor and
+acceptor positions. Exact and near matches are binary searches, and
+overlap queries look back at most the longest intron on that record and
+strand, so queries stay logarithmic in the size of the annotation.
+
+Coordinates follow the scanner: a site is the forward-strand position of
+its dinucleotide (GT/AG on '+', AC/CT on '-') and introns are 0-based
+half-open, so on the '-' strand the donor is the intron's last two bases.
+"""
+
+import sys
+
+import numpy as np
+
+from .intron_pairing import DEFAULT_MAX_INTRON_LENGTH, DEFAULT_MIN_INTRON_LENGTH, _iter_pairs
+from .result_export import iter_intron_batches
+from .splice_cli import DEFAULT_MIN_INTRON_SCORE, Gff3Writer, output_format
+
+FEATURES = ('donor', 'acceptor', 'intron')
+GTF_COLUMNS = ['record', 'source', 'feature', 'start', 'end', 'score', 'strand', 'frame', 'attributes']
+# GTF read per pyarrow block or pandas chunk; only exon rows are kept between them
+GTF_BLOCK_BYTES = 1 << 24
+GTF_CHUNK_ROWS = 1_000_000
+MATCH_BATCH = 1 << 20
+
+
+def _int64(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.int64)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+def _groups(*labels):
+    """(label values, row indices) for each distinct combination of the label columns"""
+    import pandas as pd
+
+    factorized = [pd.factorize(np.asarray(column, dtype=object)) for column in labels]
+    key = np.zeros(len(labels[0]), dtype=np.int64)
+    for codes, values in factorized:
+        key = key * len(values) + codes
+    order = np.argsort(key, kind='stable')
+    if not len(order):
+        return
+    for rows in np.split(order, np.flatnonzero(np.diff(key[order])) + 1):
+        yield tuple(values[codes[rows[0]]] for codes, values in factorized), rows
+
+
+def intron_sites(strand: str, starts: np.ndarray, ends: np.ndarray) -> tuple:
+    """(donor positions, acceptor positions) of introns on one strand"""
+    if strand == '-':
+        return ends - 2, starts
+    return starts, ends - 2
+
+
+class FeatureIndex:
+    """Sorted splice sites and introns per record and strand"""
+
+    def __init__(self):
+        # (record, strand, feature) -> sorted unique positions
+        self._sites = {}
+        # (record, strand) -> (starts, ends) sorted by start, then end
+        self._introns = {}
+        # (record, strand) -> longest intron, how far overlap queries look back
+        self._max_length = {}
+        # Arrays added since the last read, merged into the above once per key
+        self._pending_sites = {}
+        self._pending_introns = {}
+
+    def add_sites(self, record: str, strand: str, feature: str, positions):
+        self._pending_sites.setdefault((record, strand, feature), []).append(_int64(positions))
+
+    def add_introns(self, record: str, strand: str, starts, ends):
+        self._pending_introns.setdefault((record, strand), []).append((_int64(starts), _int64(ends)))
+
+    def _merge(self):
+        for key, parts in self._pending_sites.items():
+            if key in self._sites:
+                parts = [self._sites[key]] + parts
+            self._sites[key] = _sorted_unique(np.concatenate(parts))
+        for key, parts in self._pending_introns.items():
+            if key in self._introns:
+                parts = [self._introns[key]] + parts
+            starts = np.concatenate([part[0] for part in parts])
+            ends = np.concatenate([part[1] for part in parts])
+            order = np.lexsort((ends, starts))
+            starts, ends = starts[order], ends[order]
+            # Introns shared by several transcripts are kept once
+            unique = np.ones(len(starts), dtype=bool)
+            unique[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+            self._introns[key] = (starts[unique], ends[unique])
+            self._max_length[key] = int((ends - starts).max()) if len(starts) else 0
+        self._pending_sites.clear()
+        self._pending_introns.clear()
+
+    @property
+    def sites(self) -> dict:
+        self._merge()
+        return self._sites
+
+    @property
+    def introns(self) -> dict:
+        self._merge()
+        return self._introns
+
+    @property
+    def max_length(self) -> dict:
+        self._merge()
+        return self._max_length
+
+    @property
+    def records(self) -> list:
+        return sorted({key[0] for key in self.sites} | {key[0] for key in self.introns})
+
+    @property
+    def strands(self) -> list:
+        return sorted({key[1] for key in self.sites} | {key[1] for key in self.introns})
+
+    def site_positions(self, record: str, strand: str, feature: str) -> np.ndarray:
+        return self.sites.get((record, strand, feature), np.empty(0, dtype=np.int64))
+
+    def intron_arrays(self, record: str, strand: str) -> tuple:
+        empty = np.empty(0, dtype=np.int64)
+        return self.introns.get((record, strand), (empty, empty))
+
+    def overlapping(self, record: str, strand: str, start: int, end: int) -> tuple:
+        """(starts, ends) of introns overlapping [start, end)"""
+        starts, ends = self.intron_arrays(record, strand)
+        lo = np.searchsorted(starts, start - self.max_length.get((record, strand), 0), side='left')
+        hi = np.searchsorted(starts, end, side='left')
+        hit = ends[lo:hi] > start
+        return starts[lo:hi][hit], ends[lo:hi][hit]
+
+    def matching_introns(self, record: str, strand: str, starts, ends, tolerance: int = 0) -> np.ndarray:
+        """Whether each given intron has an indexed one with both ends within tolerance"""
+        reference = self.intron_arrays(record, strand)
+        return _match_introns(*reference, _int64(starts), _int64(ends), tolerance)[0]
+
+
+def index_from_introns(records, strands, starts, ends) -> FeatureIndex:
+    """FeatureIndex of introns and the splice sites at their ends"""
+    starts, ends = _int64(starts), _int64(ends)
+    index = FeatureIndex()
+    for (record, strand), rows in _groups(records, strands):
+        group_starts, group_ends = starts[rows], ends[rows]
+        index.add_introns(record, strand, group_starts, group_ends)
+        donors, acceptors = intron_sites(strand, group_starts, group_ends)
+        index.add_sites(record, strand, 'donor', donors)
+        index.add_sites(record, strand, 'acceptor', acceptors)
+    return index
+
+
+TRANSCRIPT_ID = r'transcript_id "(?P<transcript>[^"]*)"'
+EXON_COLUMNS = ['record', 'strand', 'transcript', 'start', 'end']
+
+
+def _exon_frame(records, strands, transcripts, starts, ends) -> 'pd.DataFrame':
+    """GTF exons as 0-based half-open rows; exons without a transcript are dropped"""
+    import pandas as pd
+
+    return pd.DataFrame({'record': records, 'strand': strands, 'transcript': transcripts,
+                         'start': np.asarray(starts, dtype=np.int64) - 1,
+                         'end': np.asarray(ends, dtype=np.int64)}).dropna(subset=['transcript'])
+
+
+def _gtf_exons_arrow(source, compression: str) -> 'pd.DataFrame':
+    """Multi-threaded block parsing and regex extraction in pyarrow"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+
+    stream = pa.input_stream(source, compression='detect' if compression == 'infer' else compression)
+    reader = pv.open_csv(
+        stream,
+        read_options=pv.ReadOptions(column_names=GTF_COLUMNS, block_size=GTF_BLOCK_BYTES),
+        # Header and comment lines have too few fields and are skipped
+        parse_options=pv.ParseOptions(delimiter='\t', quote_char=False,
+                                      invalid_row_handler=lambda row: 'skip'),
+        convert_options=pv.ConvertOptions(
+            include_columns=['record', 'feature', 'start', 'end', 'strand', 'attributes'],
+            column_types={'record': pa.string(), 'strand': pa.string(),
+                          'start': pa.int64(), 'end': pa.int64()}))
+    parts = []
+    for batch in reader:
+        exons = batch.filter(pc.equal(batch.column('feature'), 'exon'))
+        transcripts = pc.struct_field(pc.extract_regex(exons.column('attributes'), TRANSCRIPT_ID), [0])
+        parts.append(_exon_frame(exons.column('record').to_numpy(zero_copy_only=False),
+                                 exons.column('strand').to_numpy(zero_copy_only=False),
+                                 transcripts.to_numpy(zero_copy_only=False),
+                                 exons.column('start').to_numpy(), exons.column('end').to_numpy()))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=EXON_COLUMNS)
+
+
+def _gtf_exons_pandas(source, compression: str) -> 'pd.DataFrame':
+    import pandas as pd
+
+    parts = []
+    for chunk in pd.read_csv(source, sep='\t', comment='#', header=None, names=GTF_COLUMNS,
+                             usecols=['record', 'feature', 'start', 'end', 'strand', 'attributes'],
+                             dtype={'record': str, 'feature': str, 'strand': str, 'attributes': str},
+                             compression=compression, chunksize=GTF_CHUNK_ROWS):
+        exons = chunk[chunk['feature'] == 'exon']
+        parts.append(_exon_frame(exons['record'], exons['strand'],
+                                 exons['attributes'].str.extract(TRANSCRIPT_ID, expand=False),
+                                 exons['start'], exons['end']))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=EXON_COLUMNS)
+
+
+def load_gtf(source, compression: str = 'infer') -> FeatureIndex:
+    """Index the introns between consecutive exons of every GTF transcript
+
+    `source` is a path or binary file object; gzipped input is detected
+    from the file name unless compression is given. Parsing uses pyarrow
+    when it is installed and pandas otherwise.
+    """
+    import pandas as pd
+
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        exons = _gtf_exons_pandas(source, compression)
+    else:
+        exons = _gtf_exons_arrow(source, compression)
+    record_codes = pd.factorize(exons['record'])[0]
+    strand_codes = pd.factorize(exons['strand'])[0]
+    transcript_codes = pd.factorize(exons['transcript'])[0]
+    starts, ends = exons['start'].to_numpy(np.int64), exons['end'].to_numpy(np.int64)
+
+    # Transcript IDs may repeat across records (PAR copies), so the record is part of the key
+    order = np.lexsort((starts, strand_codes, record_codes, transcript_codes))
+    keys = np.stack([transcript_codes, record_codes, strand_codes])[:, order]
+    same = (keys[:, 1:] == keys[:, :-1]).all(axis=0)
+    intron_starts, intron_ends = ends[order][:-1][same], starts[order][1:][same]
+    # Touching or overlapping exons leave no intron
+    keep = intron_ends > intron_starts
+    rows = order[:-1][same][keep]
+    return index_from_introns(exons['record'].to_numpy()[rows], exons['strand'].to_numpy()[rows],
+                              intron_starts[keep], intron_ends[keep])
+
+
+def _prediction_table(path, fmt: str) -> 'pd.DataFrame':
+    import pandas as pd
+
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=['record', 'feature', 'start', 'end', 'strand'])
+    if fmt == 'gff3':
+        table = pd.read_csv(path, sep='\t', comment='#', header=None, usecols=[0, 2, 3, 4, 6],
+                            names=['record', 'feature', 'start', 'end', 'strand'], dtype={'record': str})
+        types = {kind: feature for feature, kind in Gff3Writer.SITE_TYPES.items()}
+        table['feature'] = table['feature'].map(types).fillna(table['feature'])
+        table['start'] -= 1
+        return table
+    return pd.read_csv(path, sep='\t', comment='#', header=None, usecols=[0, 1, 2, 3, 5],
+                       names=['record', 'start', 'end', 'feature', 'strand'], dtype={'record': str})
+
+
+def load_predictions(path, fmt: str = None) -> FeatureIndex:
+    """Index the sites and introns written by splice_cli (BED, GFF3 or Parquet)"""
+    table = _prediction_table(path, output_format(str(path), fmt))
+    starts, ends = table['start'].to_numpy(np.int64), table['end'].to_numpy(np.int64)
+    index = FeatureIndex()
+    for (record, strand, feature), rows in _groups(table['record'], table['strand'], table['feature']):
+        if feature == 'intron':
+            index.add_introns(record, strand, starts[rows], ends[rows])
+        elif feature in FEATURES:
+            index.add_sites(record, strand, feature, starts[rows])
+    return index
+
+
+def index_from_scan(scan, record: str, offset: int = 0,
+                    min_intron_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                    max_intron_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                    min_intron_score: float = DEFAULT_MIN_INTRON_SCORE) -> FeatureIndex:
+    """Scored sites of a scan and its intron candidates scoring at least min_intron_score
+
+    Positions are shifted by offset, the scan's start on the record.
+    """
+    index = FeatureIndex()
+    strands = [scan] if scan.reverse is None else [scan, scan.reverse]
+    for strand_scan in strands:
+        index.add_sites(record, strand_scan.strand, 'donor', strand_scan.donor_positions + offset)
+        index.add_sites(record, strand_scan.strand, 'acceptor', strand_scan.acceptor_positions + offset)
+        index.add_introns(record, strand_scan.strand, [], [])
+    for batch in iter_intron_batches(scan, min_intron_length, max_intron_length,
+                                     min_score=min_intron_score):
+        # Each batch comes from one strand
+        if len(batch['start']):
+            index.add_introns(record, batch['strand'][0], batch['start'] + offset, batch['end'] + offset)
+    return index
+
+
+def _near(reference: np.ndarray, positions: np.ndarray, tolerance: int) -> np.ndarray:
+    """Whether each position lies within tolerance of a sorted reference position"""
+    hit = np.zeros(len(positions), dtype=bool)
+    if len(reference):
+        first = np.searchsorted(reference, positions - tolerance, side='left')
+        inside = first < len(reference)
+        hit[inside] = reference[first[inside]] <= positions[inside] + tolerance
+    return hit
+
+
+def _match_introns(reference_starts, reference_ends, starts, ends, tolerance: int,
+                   batch_size: int = MATCH_BATCH) -> tuple:
+    """(given matched, reference matched) flags for introns whose both ends are within tolerance"""
+    lo = np.searchsorted(reference_starts, starts - tolerance, side='left')
+    hi = np.searchsorted(reference_starts, starts + tolerance, side='right')
+    given_hit = np.zeros(len(starts), dtype=bool)
+    reference_hit = np.zeros(len(reference_starts), dtype=bool)
+    for given_index, reference_index in _iter_pairs(np.arange(len(starts)), lo, hi - lo, batch_size):
+        close = np.abs(reference_ends[reference_index] - ends[given_index]) <= tolerance
+        given_hit[given_index[close]] = True
+        reference_hit[reference_index[close]] = True
+    return given_hit, reference_hit
+
+
+def _in_region(starts: np.ndarray, ends: np.ndarray, region) -> np.ndarray:
+    if region is None:
+        return np.ones(len(starts), dtype=bool)
+    return (starts >= region[0]) & (ends <= region[1])
+
+
+def _rates(counts: dict) -> dict:
+    reference, predicted = counts['reference'], counts['predicted']
+    return dict(counts,
+                sensitivity=counts['matched_reference'] / reference if reference else 0.0,
+                precision=counts['matched_predicted'] / predicted if predicted else 0.0)
+
+
+def compare_features(reference: FeatureIndex, predicted: FeatureIndex, tolerance: int = 0,
+                     regions: dict = None, strands=None) -> dict:
+    """Sensitivity and precision of predicted donors, acceptors and introns
+
+    Only records with predictions are compared, on the strands the
+    predictions cover unless `strands` is given. `regions` maps a record
+    to the (start, end) span that was analyzed; features outside it are
+    not counted. Sites match within tolerance bases, introns when both
+    ends do. Returns feature -> counts, sensitivity and precision.
+    """
+    regions = regions or {}
+    strands = predicted.strands if strands is None else strands
+    totals = {feature: dict.fromkeys(('reference', 'predicted', 'matched_reference', 'matched_predicted'), 0)
+              for feature in FEATURES}
+
+    for record in predicted.records:
+        region = regions.get(record)
+        for strand in strands:
+            for feature in ('donor', 'acceptor'):
+                known = reference.site_positions(record, strand, feature)
+                found = predicted.site_positions(record, strand, feature)
+                known = known[_in_region(known, known + 2, region)]
+                found = found[_in_region(found, found + 2, region)]
+                counts = totals[feature]
+                counts['reference'] += len(known)
+                counts['predicted'] += len(found)
+                counts['matched_reference'] += int(_near(found, known, tolerance).sum())
+                counts['matched_predicted'] += int(_near(known, found, tolerance).sum())
+
+            known_starts, known_ends = reference.intron_arrays(record, strand)
+            found_starts, found_ends = predicted.intron_arrays(record, strand)
+            known = _in_region(known_starts, known_ends, region)
+            found = _in_region(found_starts, found_ends, region)
+            found_hit, known_hit = _match_introns(known_starts[known], known_ends[known],
+                                                  found_starts[found], found_ends[found], tolerance)
+            counts = totals['intron']
+            counts['reference'] += int(known.sum())
+            counts['predicted'] += int(found.sum())
+            counts['matched_reference'] += int(known_hit.sum())
+            counts['matched_predicted'] += int(found_hit.sum())
+
+    return {feature: _rates(counts) for feature, counts in totals.items()}
+
+
+def compare_scan(scan, reference: FeatureIndex, record: str, offset: int = 0, tolerance: int = 0,
+                 min_intron_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                 max_intron_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                 min_intron_score: float = DEFAULT_MIN_INTRON_SCORE) -> dict:
+    """compare_features for one scanned sequence lying at offset on record"""
+    predicted = index_from_scan(scan, record, offset, min_intron_length, max_intron_length,
+                                min_intron_score)
+    return compare_features(reference, predicted, tolerance, {record: (offset, offset + scan.length)})
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare splice_cli predictions with a GTF annotation")
+    parser.add_argument('annotation', help="reference GTF (optionally gzipped)")
+    parser.add_argument('predictions', help="splice_cli output (BED, GFF3 or Parquet)")
+    parser.add_argument('-f', '--format', choices=('bed', 'gff3', 'parquet'),
+                        help="predictions format (default: from the extension, else bed)")
+    parser.add_argument('-t', '--tolerance', type=int, default=0, help="allowed distance in bases")
+    parser.add_argument('--strand', choices=('+', '-'), action='append',
+                        help="strand to compare (repeatable; default: strands in the predictions)")
+    args = parser.parse_args(argv)
+
+    report = compare_features(load_gtf(args.annotation), load_predictions(args.predictions, args.format),
+                              args.tolerance, strands=args.strand)
+    print("feature\treference\tpredicted\tmatched_reference\tmatched_predicted\tsensitivity\tprecision")
+    for feature, row in report.items():
+        print(f"{feature}\t{row['reference']}\t{row['predicted']}\t{row['matched_reference']}\t"
+              f"{row['matched_predicted']}\t{row['sensitivity']:.4f}\t{row['precision']:.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Process-pool batch analysis of many sequences
+"""
+
+import os
+from collections import deque
+
+# Short sequences are grouped until a chunk holds about this many bases
+DEFAULT_CHUNK_BASES = 200_000
+MAX_CHUNK_SEQUENCES = 1000
+# Chunks submitted ahead of the one being yielded, per worker
+PREFETCH_PER_WORKER = 4
+
+_worker_analyzer = None
+
+
+def _init_worker(analyzer):
+    global _worker_analyzer
+    # Metrics are reported once, by the parent, as results come back
+    analyzer.metrics_sink = None
+    _worker_analyzer = analyzer
+
+
+def _warm_up_worker() -> float:
+    return _worker_analyzer.warm_up()
+
+
+def _analyze_chunk(sequences: list) -> list:
+    return [_worker_analyzer.analyze_sequence(seq) for seq in sequences]
+
+
+def iter_sequence_groups(sequences, chunk_bases: int = DEFAULT_CHUNK_BASES,
+                         max_sequences: int = MAX_CHUNK_SEQUENCES):
+    """Group consecutive sequences into lists of roughly chunk_bases bases"""
+    group = []
+    group_bases = 0
+    for seq in sequences:
+        group.append(seq)
+        group_bases += len(seq)
+        if group_bases >= chunk_bases or len(group) >= max_sequences:
+            yield group
+            group = []
+            group_bases = 0
+    if group:
+        yield group
+
+
+def analyze_batch(analyzer, sequences, workers: int = None,
+                  chunk_bases: int = DEFAULT_CHUNK_BASES):
+    """Analyze many sequences on a process pool, yielding results in input order
+
+    Only a bounded number of chunks are in flight at once, so the input
+    can be a generator over a very large collection.
+    """
+    workers = workers or os.cpu_count() or 1
+    groups = iter_sequence_groups(sequences, chunk_bases)
+
+    if workers == 1:
+        for group in groups:
+            for seq in group:
+                yield analyzer.analyze_sequence(seq)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    # Spawned, not forked: callers such as the Streamlit app run other threads
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(analyzer,),
+                             mp_context=get_context('spawn')) as executor:
+        pending = deque()
+        for group in groups:
+            pending.append(executor.submit(_analyze_chunk, group))
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                yield from _report(analyzer, pending.popleft().result())
+        while pending:
+            yield from _report(analyzer, pending.popleft().result())
+
+
+def _report(analyzer, results: list):
+    for result in results:
+        analyzer.record_metrics(result)
+        yield result
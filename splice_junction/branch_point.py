@@ -0,0 +1,120 @@
+"""
+Polypyrimidine tract and branch point evidence upstream of acceptor candidates
+
+A real acceptor AG follows a pyrimidine-rich tract and, 18-40 nt
+upstream, a yUnAy branch point. Both are read from prefix sums over the
+sequence: the tract as the pyrimidine count in the bases before the AG,
+the branch point as the number of motif matches whose A lies in the
+distance range. Candidates are processed in blocks of sorted positions,
+each needing prefix sums over its own span only, so memory stays bounded
+on whole chromosomes and there is no Python loop per candidate.
+
+On the '-' strand the same checks run mirrored on the forward array:
+the tract lies after the CT and is counted as purines, and the branch
+point is matched as its reverse complement.
+"""
+
+import numpy as np
+
+from .splice_scanner import A, C, G, T, iupac_complement, iupac_hits
+from .window_tracks import prefix_sums
+
+# Bases immediately upstream of the AG read as the polypyrimidine tract
+TRACT_LENGTH = 20
+DEFAULT_MIN_PYRIMIDINE_FRACTION = 0.6
+BRANCH_POINT_MOTIF = 'YTNAY'
+# Index of the branch point A in the motif
+BRANCH_POINT_OFFSET = 3
+# Distance from the branch point A to the acceptor's A
+BRANCH_POINT_MIN_DISTANCE = 18
+BRANCH_POINT_MAX_DISTANCE = 40
+# Candidates handled per block of prefix sums
+SCREEN_BLOCK = 1 << 18
+
+
+def _window_sums(prefix: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> tuple:
+    """Sums over [lo, hi) clipped to the prefix's span, and the clipped lengths"""
+    lo = np.clip(lo, 0, len(prefix) - 1)
+    hi = np.clip(hi, lo, len(prefix) - 1)
+    return prefix[hi] - prefix[lo], hi - lo
+
+
+class AcceptorScreen:
+    """Keeps acceptor candidates with a polypyrimidine tract and an upstream branch point
+
+    min_pyrimidine_fraction=None skips the tract check and
+    require_branch_point=False the branch point check.
+    """
+
+    def __init__(self, min_pyrimidine_fraction: float = DEFAULT_MIN_PYRIMIDINE_FRACTION,
+                 require_branch_point: bool = True):
+        self.min_pyrimidine_fraction = min_pyrimidine_fraction
+        self.require_branch_point = require_branch_point
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_pyrimidine_fraction is not None or self.require_branch_point
+
+    @property
+    def reach(self) -> int:
+        """Bases either side of a candidate that can change its evidence"""
+        return max(TRACT_LENGTH, BRANCH_POINT_MAX_DISTANCE + len(BRANCH_POINT_MOTIF)) + 2
+
+    def config(self) -> dict:
+        return {'min_pyrimidine_fraction': self.min_pyrimidine_fraction,
+                'require_branch_point': self.require_branch_point}
+
+    def evidence(self, codes: np.ndarray, positions: np.ndarray, strand: str = '+') -> tuple:
+        """(pyrimidine fraction of the tract, branch points in range) per candidate
+
+        positions are sorted forward coordinates of the AG (or CT on '-').
+        Tracts cut short by the sequence end are scored on the bases present.
+        """
+        fractions = np.zeros(len(positions), dtype=np.float32)
+        branch_points = np.zeros(len(positions), dtype=np.int32)
+        motif_length = len(BRANCH_POINT_MOTIF)
+        if strand == '+':
+            tract_bases, motif = (C, T), BRANCH_POINT_MOTIF
+            # Motif starts whose A is min..max distance before the AG's A
+            first_offset = -BRANCH_POINT_MAX_DISTANCE - BRANCH_POINT_OFFSET
+            last_offset = -BRANCH_POINT_MIN_DISTANCE - BRANCH_POINT_OFFSET
+            tract_offset = -TRACT_LENGTH
+        else:
+            tract_bases, motif = (A, G), iupac_complement(BRANCH_POINT_MOTIF)
+            # The reverse-strand A of a CT at p is p + 1; the motif's A is its (length - 1 - offset)-th base
+            mirrored = motif_length - 1 - BRANCH_POINT_OFFSET
+            first_offset = 1 + BRANCH_POINT_MIN_DISTANCE - mirrored
+            last_offset = 1 + BRANCH_POINT_MAX_DISTANCE - mirrored
+            tract_offset = 2
+
+        reach = self.reach
+        for block in range(0, len(positions), SCREEN_BLOCK):
+            chunk = positions[block:block + SCREEN_BLOCK]
+            start = max(int(chunk[0]) - reach, 0)
+            span = codes[start:min(int(chunk[-1]) + reach, len(codes))]
+            local = chunk - start
+
+            tract = prefix_sums((span == tract_bases[0]) | (span == tract_bases[1]))
+            counts, lengths = _window_sums(tract, local + tract_offset, local + tract_offset + TRACT_LENGTH)
+            fractions[block:block + len(chunk)] = counts / np.maximum(lengths, 1)
+
+            hits = prefix_sums(iupac_hits(span, motif))
+            found, _ = _window_sums(hits, local + first_offset, local + last_offset + 1)
+            branch_points[block:block + len(chunk)] = found
+        return fractions, branch_points
+
+    def keep(self, codes: np.ndarray, positions: np.ndarray, strand: str = '+') -> np.ndarray:
+        """Boolean mask of the candidates that pass"""
+        if not self.enabled or not len(positions):
+            return np.ones(len(positions), dtype=bool)
+        fractions, branch_points = self.evidence(codes, positions, strand)
+        passed = np.ones(len(positions), dtype=bool)
+        if self.min_pyrimidine_fraction is not None:
+            passed &= fractions >= self.min_pyrimidine_fraction
+        if self.require_branch_point:
+            passed &= branch_points > 0
+        return passed
+
+    def screen(self, codes: np.ndarray, positions: np.ndarray, strand: str = '+') -> np.ndarray:
+        """The candidate positions that pass"""
+        return positions[self.keep(codes, positions, strand)]
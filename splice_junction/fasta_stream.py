@@ -0,0 +1,257 @@
+"""
+Streaming FASTA / multi-FASTA / FASTQ reader with chunk-boundary-safe scanning
+
+Bases are classified as in sequence_ingest (ACGT, IUPAC codes as N), but a
+file is not rejected for other characters: they are read as N and counted
+per chunk, so a stray byte deep in a genome does not abort the scan.
+"""
+
+import gzip
+
+import numpy as np
+
+from .splice_scanner import (
+    ACCEPTOR_MOTIF, C, DONOR_MOTIF, G, N, base_counts, find_dinucleotide
+)
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+READ_BLOCK_SIZE = 1 << 20
+# Dinucleotide motifs need one base carried over to catch sites split by a chunk edge
+DEFAULT_OVERLAP = 1
+
+_WHITESPACE = b' \t\r\n\v\f'
+
+
+def open_sequence_file(path):
+    """Open a plain or gzipped sequence file in binary mode"""
+    with open(path, 'rb') as handle:
+        magic = handle.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _record_name(header: bytes) -> str:
+    fields = header.strip().split()
+    return fields[0].decode('ascii', 'replace') if fields else ''
+
+
+def _iter_fasta_pieces(handle, block_size: int):
+    """Yield (name, None) at each header and (None, bases) for sequence data"""
+    leftover = b''
+    in_header = False
+    while True:
+        block = handle.read(block_size)
+        if not block:
+            break
+        data = leftover + block
+        leftover = b''
+        pos = 0
+        while pos < len(data):
+            if in_header:
+                newline = data.find(b'\n', pos)
+                if newline == -1:
+                    leftover = data[pos:]
+                    break
+                yield _record_name(data[pos:newline]), None
+                pos = newline + 1
+                in_header = False
+                continue
+            marker = data.find(b'>', pos)
+            end = len(data) if marker == -1 else marker
+            piece = data[pos:end].translate(None, _WHITESPACE)
+            if piece:
+                yield None, piece
+            if marker == -1:
+                break
+            pos = marker + 1
+            in_header = True
+    if in_header and leftover:
+        yield _record_name(leftover), None
+
+
+def _iter_fastq_pieces(handle):
+    """Yield (name, None) at each read header and (None, bases) for the read"""
+    lines = iter(handle)
+    for line in lines:
+        if not line.strip():
+            continue
+        yield _record_name(line[1:]), None
+        seq_length = 0
+        for line in lines:
+            if line.startswith(b'+'):
+                break
+            piece = line.translate(None, _WHITESPACE)
+            seq_length += len(piece)
+            yield None, piece
+        qual_length = 0
+        while qual_length < seq_length:
+            quality = next(lines, None)
+            if quality is None:
+                break
+            qual_length += len(quality.strip())
+
+
+def iter_records_pieces(handle, block_size: int = READ_BLOCK_SIZE):
+    """Dispatch to the FASTA or FASTQ piece reader based on the first byte"""
+    first = handle.peek(1)[:1] if hasattr(handle, 'peek') else b''
+    if first == b'@':
+        return _iter_fastq_pieces(handle)
+    return _iter_fasta_pieces(handle, block_size)
+
+
+class SequenceChunk:
+    """One fixed-size slice of a record plus the bases carried over from the previous slice"""
+
+    def __init__(self, name: str, start: int, codes: np.ndarray, overlap: int, is_last: bool,
+                 invalid: int = 0):
+        self.name = name
+        self.start = start
+        self.codes = codes
+        self.overlap = overlap
+        self.is_last = is_last
+        # Characters in the new codes that were neither a base nor an IUPAC code, read as N
+        self.invalid = invalid
+
+    @property
+    def new_codes(self) -> np.ndarray:
+        """Codes that were not already part of the previous chunk"""
+        return self.codes[self.overlap:]
+
+
+def iter_sequence_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         overlap: int = DEFAULT_OVERLAP):
+    """Yield SequenceChunks of every record in order, holding at most one chunk in memory"""
+    # Deferred: sequence_ingest imports twobit_store, which imports this module
+    from .sequence_ingest import CODE_TABLE, SKIP_CODE
+
+    with open_sequence_file(path) as handle:
+        name = None
+        buffer = bytearray()
+        tail = np.empty(0, dtype=np.uint8)
+        offset = 0
+
+        def emit(data, is_last):
+            nonlocal tail, offset
+            new_codes = CODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+            invalid = new_codes >= SKIP_CODE
+            invalid_count = int(np.count_nonzero(invalid))
+            if invalid_count:
+                new_codes[invalid] = N
+            codes = np.concatenate([tail, new_codes])
+            chunk = SequenceChunk(name, offset - len(tail), codes, len(tail), is_last, invalid_count)
+            offset += len(data)
+            tail = codes[-overlap:].copy() if overlap else codes[:0]
+            return chunk
+
+        for header, piece in iter_records_pieces(handle):
+            if header is not None:
+                if name is not None:
+                    yield emit(buffer, True)
+                name = header
+                buffer = bytearray()
+                tail = np.empty(0, dtype=np.uint8)
+                offset = 0
+                continue
+            if name is None:
+                name = ''
+            buffer += piece
+            while len(buffer) > chunk_size:
+                yield emit(buffer[:chunk_size], False)
+                del buffer[:chunk_size]
+        if name is not None:
+            yield emit(buffer, True)
+
+
+def scan_chunk(chunk: SequenceChunk, motif: tuple) -> np.ndarray:
+    """Record coordinates of motif hits in a chunk that were not reported by the previous one"""
+    positions = find_dinucleotide(chunk.codes, *motif)
+    positions = positions[positions + len(motif) > chunk.overlap]
+    return positions + chunk.start
+
+
+class StreamingAggregate:
+    """Running totals for one record (or a whole file) fed chunk by chunk"""
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.counts = np.zeros(5, dtype=np.int64)
+        self.total_donors = 0
+        self.total_acceptors = 0
+        self.invalid = 0
+
+    def update(self, chunk: SequenceChunk, donors: np.ndarray, acceptors: np.ndarray):
+        self.counts += base_counts(chunk.new_codes)
+        self.total_donors += len(donors)
+        self.total_acceptors += len(acceptors)
+        self.invalid += chunk.invalid
+
+    def merge(self, other: 'StreamingAggregate'):
+        self.counts += other.counts
+        self.total_donors += other.total_donors
+        self.total_acceptors += other.total_acceptors
+        self.invalid += other.invalid
+
+    @property
+    def length(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def gc_content(self) -> float:
+        called = int(self.counts[:N].sum())
+        if called == 0:
+            return 0.0
+        return float(self.counts[C] + self.counts[G]) / called * 100
+
+    def as_dict(self) -> dict:
+        summary = {
+            'length': self.length,
+            'n_count': int(self.counts[N]),
+            'invalid_count': self.invalid,
+            'gc_content': self.gc_content,
+            'total_donors': self.total_donors,
+            'total_acceptors': self.total_acceptors
+        }
+        if self.name is not None:
+            summary['name'] = self.name
+        return summary
+
+
+def iter_chunk_scans(path, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield (chunk, donor_positions, acceptor_positions) for each chunk of a file"""
+    for chunk in iter_sequence_chunks(path, chunk_size, DEFAULT_OVERLAP):
+        yield chunk, scan_chunk(chunk, DONOR_MOTIF), scan_chunk(chunk, ACCEPTOR_MOTIF)
+
+
+def stream_analyze(path, chunk_size: int = DEFAULT_CHUNK_SIZE, per_record: bool = None) -> dict:
+    """Scan a sequence file chunk by chunk and return running aggregates
+
+    Positions are never accumulated, so memory depends on chunk_size, plus
+    one small summary dict per record when per_record is set. per_record
+    defaults to True for FASTA and False for FASTQ, whose millions of reads
+    would make that list grow without bound. invalid_count is the number
+    of characters read as N that were neither a base nor an IUPAC code.
+    """
+    if per_record is None:
+        with open_sequence_file(path) as handle:
+            per_record = handle.read(1) != b'@'
+    total = StreamingAggregate()
+    records = []
+    current = None
+    record_count = 0
+    for chunk, donors, acceptors in iter_chunk_scans(path, chunk_size):
+        if current is None:
+            current = StreamingAggregate(chunk.name)
+        current.update(chunk, donors, acceptors)
+        if chunk.is_last:
+            total.merge(current)
+            record_count += 1
+            if per_record:
+                records.append(current.as_dict())
+            current = None
+
+    summary = total.as_dict()
+    summary['record_count'] = record_count
+    if per_record:
+        summary['records'] = records
+    return summary
@@ -0,0 +1,160 @@
+"""
+Incremental re-analysis of an edited sequence
+
+The state keeps the encoded sequence, its scored site index, the intron
+pair index and codon counts. A new version is diffed against it and only
+the edited span plus one scoring window on each side is rescanned; sites
+downstream of the edit are shifted, pair ranges are rebuilt only for
+sites within one maximum intron length of the edit, and base and codon
+counts are updated by delta.
+"""
+
+import numpy as np
+
+from .intron_pairing import PairIndex, build_pair_index
+from .splice_scanner import STOP_CODONS, SpliceSiteScan, base_counts, find_motif, scan_splice_sites
+
+CODONS = ('ATG',) + STOP_CODONS
+
+
+def edit_span(old: np.ndarray, new: np.ndarray) -> tuple:
+    """(start, old_end, new_end) such that old[start:old_end] was replaced by new[start:new_end]"""
+    shortest = min(len(old), len(new))
+    mismatch = np.flatnonzero(old[:shortest] != new[:shortest])
+    start = int(mismatch[0]) if len(mismatch) else shortest
+
+    # The common suffix may not reach back into the common prefix
+    tail = shortest - start
+    suffix = 0
+    if tail:
+        mismatch = np.flatnonzero(old[len(old) - tail:][::-1] != new[len(new) - tail:][::-1])
+        suffix = int(mismatch[0]) if len(mismatch) else tail
+    return start, len(old) - suffix, len(new) - suffix
+
+
+def codon_counts(codes: np.ndarray) -> dict:
+    return {codon: len(find_motif(codes, codon)) for codon in CODONS}
+
+
+class IncrementalState:
+    """Encoded sequence, scored (and filtered) sites, pair indexes and codon counts of one analysis"""
+
+    def __init__(self, codes: np.ndarray, scan: SpliceSiteScan, pair_indexes: dict,
+                 codons: dict, config: dict):
+        self.codes = codes
+        self.scan = scan
+        # strand -> PairIndex of that strand's sites
+        self.pair_indexes = pair_indexes
+        self.codons = codons
+        # Analyzer settings the sites were scored with; other settings need a full scan
+        self.config = config
+
+    @property
+    def has_start(self) -> bool:
+        return self.codons['ATG'] > 0
+
+    @property
+    def has_stop(self) -> bool:
+        return any(self.codons[codon] for codon in STOP_CODONS)
+
+
+def _strands(scan: SpliceSiteScan) -> list:
+    return [scan] if scan.reverse is None else [scan, scan.reverse]
+
+
+def build_state(analyzer, codes: np.ndarray) -> IncrementalState:
+    scan = analyzer._score_sites(scan_splice_sites(codes, analyzer.both_strands))
+    pair_indexes = {strand.strand: analyzer._pair_index(strand) for strand in _strands(scan)}
+    return IncrementalState(codes, scan, pair_indexes, codon_counts(codes), analyzer.config())
+
+
+def scan_margin(analyzer) -> int:
+    """Sites further than this from an edit keep their score and acceptor screening"""
+    return max(analyzer.donor_model.window, analyzer.acceptor_model.window,
+               analyzer.acceptor_screen.reach) + 2
+
+
+def _splice_sites(old_positions, old_scores, mid_positions, mid_scores, lo, old_hi, delta):
+    """Old sites left of lo, the rescanned ones, then old sites from old_hi on shifted by delta"""
+    left = np.searchsorted(old_positions, lo, side='left')
+    right = np.searchsorted(old_positions, old_hi, side='left')
+    positions = np.concatenate([old_positions[:left], mid_positions, old_positions[right:] + delta])
+    scores = np.concatenate([old_scores[:left], mid_scores, old_scores[right:]])
+    return positions, scores
+
+
+def _updated_strand(old: SpliceSiteScan, mid: SpliceSiteScan, codes, counts, lo, old_hi, delta):
+    donors, donor_scores = _splice_sites(old.donor_positions, old.donor_scores, mid.donor_positions,
+                                         mid.donor_scores, lo, old_hi, delta)
+    acceptors, acceptor_scores = _splice_sites(old.acceptor_positions, old.acceptor_scores,
+                                               mid.acceptor_positions, mid.acceptor_scores,
+                                               lo, old_hi, delta)
+    scan = SpliceSiteScan(codes, donors, acceptors, counts, codes, old.strand)
+    scan.donor_scores, scan.acceptor_scores = donor_scores, acceptor_scores
+    return scan
+
+
+def _updated_pair_index(analyzer, index: PairIndex, old: SpliceSiteScan, new: SpliceSiteScan,
+                        lo: int, old_hi: int, delta: int) -> PairIndex:
+    """Rebuild pair ranges only for left sites whose partner window can reach [lo, old_hi)"""
+    old_left, old_right = analyzer._pair_sides(old)[:2]
+    new_left, new_right, _, new_right_scores = analyzer._pair_sides(new)
+    # Left sites before this only pair with right sites before lo
+    before = lo - (analyzer.max_intron_length - 2)
+    # Left sites from here on only pair with right sites from old_hi on
+    after = old_hi + max(2 - analyzer.min_intron_length, 0)
+
+    first = int(np.searchsorted(old_left, before, side='left'))
+    old_last = int(np.searchsorted(old_left, after, side='left'))
+    new_last = int(np.searchsorted(new_left, after + delta, side='left'))
+    shift = (int(np.searchsorted(new_right, old_hi + delta, side='left'))
+             - int(np.searchsorted(old_right, old_hi, side='left')))
+
+    mid = build_pair_index(new_left[first:new_last], new_right, new_right_scores,
+                           analyzer.min_intron_length, analyzer.max_intron_length)
+    return PairIndex(
+        np.concatenate([index.lo[:first], mid.lo, index.lo[old_last:] + shift]),
+        np.concatenate([index.counts[:first], mid.counts, index.counts[old_last:]]),
+        np.concatenate([index.best_acceptor[:first], mid.best_acceptor, index.best_acceptor[old_last:]])
+    )
+
+
+def update_state(analyzer, state: IncrementalState, codes: np.ndarray) -> IncrementalState:
+    """State for an edited version of state's sequence, rescanning only the changed span"""
+    start, old_end, new_end = edit_span(state.codes, codes)
+    if start == old_end == new_end:
+        return state
+    delta = new_end - old_end
+    margin = scan_margin(analyzer)
+    # Rescan sites starting in [lo, hi) of the new sequence; old sites from old_hi on only move
+    lo = max(start - margin, 0)
+    hi = min(new_end + margin, len(codes))
+    old_hi = old_end + margin
+
+    counts = (state.scan.base_counts - base_counts(state.codes[start:old_end])
+              + base_counts(codes[start:new_end]))
+
+    region = scan_splice_sites(codes[lo:hi + 1], analyzer.both_strands)
+    mid = SpliceSiteScan(codes, region.donor_positions + lo, region.acceptor_positions + lo,
+                         counts, codes)
+    if region.reverse is not None:
+        mid.reverse = SpliceSiteScan(codes, region.reverse.donor_positions + lo,
+                                     region.reverse.acceptor_positions + lo, counts, codes, strand='-')
+    mid = analyzer._score_sites(mid)
+
+    scan = _updated_strand(state.scan, mid, codes, counts, lo, old_hi, delta)
+    if mid.reverse is not None:
+        scan.reverse = _updated_strand(state.scan.reverse, mid.reverse, codes, counts, lo, old_hi, delta)
+    pair_indexes = {
+        new.strand: _updated_pair_index(analyzer, state.pair_indexes[new.strand], old, new,
+                                        lo, old_hi, delta)
+        for old, new in zip(_strands(state.scan), _strands(scan))
+    }
+
+    # Codons overlapping the edit start within two bases before it
+    first = max(start - 2, 0)
+    codons = {codon: count
+              - len(find_motif(state.codes[first:old_end + 2], codon))
+              + len(find_motif(codes[first:new_end + 2], codon))
+              for codon, count in state.codons.items()}
+    return IncrementalState(codes, scan, pair_indexes, codons, state.config)
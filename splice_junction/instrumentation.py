@@ -0,0 +1,153 @@
+"""
+Per-stage timers, counters, optional profiling and metric sinks for the analyzer
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+PROFILE_TOP = 25
+
+
+class StageTimer:
+    """Accumulates wall time per named stage and integer counters for one run"""
+
+    def __init__(self, profile: str = None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile!r}; expected one of {PROFILE_MODES}")
+        self.profile = profile
+        self.stages = {}
+        self.counters = {}
+        self.profile_report = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    @contextmanager
+    def capture(self):
+        """Run the block under cProfile or tracemalloc when profiling is enabled"""
+        # Profilers are imported only when asked for, keeping the package import light
+        if self.profile == 'cprofile':
+            import cProfile
+            import pstats
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+                self.profile_report = out.getvalue()
+        elif self.profile == 'tracemalloc':
+            import tracemalloc
+
+            already_tracing = tracemalloc.is_tracing()
+            if not already_tracing:
+                tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            try:
+                yield
+            finally:
+                _, peak = tracemalloc.get_traced_memory()
+                stats = tracemalloc.take_snapshot().compare_to(before, 'lineno')[:PROFILE_TOP]
+                if not already_tracing:
+                    tracemalloc.stop()
+                lines = [f"Peak traced memory: {peak / (1024 * 1024):.2f} MB"]
+                lines += [str(stat) for stat in stats]
+                self.profile_report = '\n'.join(lines)
+        else:
+            yield
+
+    def as_dict(self) -> dict:
+        timings = {
+            'stages': dict(self.stages),
+            'counters': dict(self.counters),
+            'total_seconds': time.perf_counter() - self._started
+        }
+        if self.profile_report is not None:
+            timings['profile'] = {'mode': self.profile, 'report': self.profile_report}
+        return timings
+
+
+class PrometheusTextfileSink:
+    """Writes cumulative run metrics in Prometheus text format
+
+    Point node_exporter's textfile collector at the file. Totals survive
+    only for the life of the process; the file is replaced atomically.
+    """
+
+    def __init__(self, path, prefix: str = 'splice_analyzer'):
+        self.path = Path(path)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._stage_seconds = {}
+        self._counters = {}
+        self._last = {}
+
+    def __getstate__(self):
+        # Only the destination travels to worker processes, not the running totals
+        return {'path': self.path, 'prefix': self.prefix}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['prefix'])
+
+    def emit(self, timings: dict):
+        with self._lock:
+            self._runs += 1
+            for name, seconds in timings.get('stages', {}).items():
+                self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + seconds
+            for name, value in timings.get('counters', {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            self._last = dict(timings.get('stages', {}))
+            self._write(self.render())
+
+    def render(self) -> str:
+        p = self.prefix
+        lines = [
+            f'# HELP {p}_runs_total Analyses completed.',
+            f'# TYPE {p}_runs_total counter',
+            f'{p}_runs_total {self._runs}',
+            f'# HELP {p}_stage_seconds_total Wall time spent per analysis stage.',
+            f'# TYPE {p}_stage_seconds_total counter'
+        ]
+        lines += [f'{p}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(self._stage_seconds.items())]
+        lines += [f'# HELP {p}_last_stage_seconds Wall time per stage of the latest analysis.',
+                  f'# TYPE {p}_last_stage_seconds gauge']
+        lines += [f'{p}_last_stage_seconds{{stage="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(self._last.items())]
+        for name, value in sorted(self._counters.items()):
+            lines += [f'# TYPE {p}_{name}_total counter', f'{p}_{name}_total {value}']
+        return '\n'.join(lines) + '\n'
+
+    def _write(self, text: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as handle:
+                handle.write(text)
+            os.replace(tmp, self.path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
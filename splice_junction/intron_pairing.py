@@ -0,0 +1,292 @@
+"""
+GT-AG intron pairing over sorted site arrays
+
+A candidate intron runs from the G of a donor GT to the G of an acceptor
+AG, so its length is acceptor + 2 - donor.
+"""
+
+import bisect
+
+import numpy as np
+
+DEFAULT_MIN_INTRON_LENGTH = 60
+DEFAULT_MAX_INTRON_LENGTH = 10_000
+# Donor + acceptor score an intron candidate needs to be reported
+DEFAULT_MIN_INTRON_SCORE = 20.0
+DEFAULT_BATCH_SIZE = 1 << 20
+# Top-scoring candidates considered when picking a non-overlapping set
+NON_OVERLAP_POOL = 1000
+
+
+def intron_length(donors: np.ndarray, acceptors: np.ndarray) -> np.ndarray:
+    return acceptors + 2 - donors
+
+
+def _acceptor_ranges(donors, acceptors, min_length, max_length):
+    """For each donor, the slice of sorted acceptors that give an allowed intron length"""
+    lo = np.searchsorted(acceptors, donors + (min_length - 2), side='left')
+    hi = np.searchsorted(acceptors, donors + (max_length - 2), side='right')
+    return lo, np.maximum(hi - lo, 0)
+
+
+def count_intron_candidates(donors: np.ndarray, acceptors: np.ndarray,
+                            min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                            max_length: int = DEFAULT_MAX_INTRON_LENGTH) -> int:
+    """Number of donor->acceptor pairs within the length limits, without enumerating them"""
+    _, counts = _acceptor_ranges(donors, acceptors, min_length, max_length)
+    return int(counts.sum())
+
+
+def _iter_pairs(donor_ids, lo, counts, batch_size):
+    """Expand per-donor acceptor ranges into index pairs, a bounded batch at a time"""
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(donor_ids):
+        base = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, base + batch_size, side='right')), start + 1)
+        batch_counts = counts[start:stop]
+        total = int(batch_counts.sum())
+        if total:
+            donor_index = np.repeat(donor_ids[start:stop], batch_counts)
+            first = np.repeat(ends[start:stop] - batch_counts - base, batch_counts)
+            acceptor_index = np.repeat(lo[start:stop], batch_counts) + (np.arange(total) - first)
+            yield donor_index, acceptor_index
+        start = stop
+
+
+def iter_intron_candidates(donors: np.ndarray, acceptors: np.ndarray,
+                           min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                           max_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                           batch_size: int = DEFAULT_BATCH_SIZE):
+    """Yield (donor_index, acceptor_index) arrays of candidate introns in bounded batches
+
+    Both site arrays must be sorted. Indices point into the given arrays so
+    callers can look up positions and scores. A batch only exceeds
+    batch_size when a single donor has more partners than that.
+    """
+    lo, counts = _acceptor_ranges(donors, acceptors, min_length, max_length)
+    return _iter_pairs(np.arange(len(donors)), lo, counts, batch_size)
+
+
+def _range_max(values: np.ndarray, lo: np.ndarray, hi: np.ndarray, block: int = 64) -> np.ndarray:
+    """max(values[lo:hi]) for many non-empty ranges at once
+
+    Uses per-block prefix/suffix maxima plus a sparse table over block
+    maxima, so extra memory is about two copies of values.
+    """
+    size = -(-len(values) // block) * block
+    padded = np.full(size, -np.inf)
+    padded[:len(values)] = values
+    blocks = padded.reshape(-1, block)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    table = [blocks.max(axis=1)]
+    while 2 ** len(table) <= len(table[0]):
+        prev, step = table[-1], 2 ** (len(table) - 1)
+        table.append(np.maximum(prev[:-step], prev[step:]))
+
+    last = hi - 1
+    first_block, last_block = lo // block, last // block
+    result = np.full(len(lo), -np.inf)
+
+    same = first_block == last_block
+    same_lo, same_hi = lo[same], last[same]
+    same_result = np.full(len(same_lo), -np.inf)
+    for offset in range(block):
+        idx = same_lo + offset
+        inside = idx <= same_hi
+        if not inside.any():
+            break
+        same_result = np.where(inside, np.maximum(same_result, padded[np.minimum(idx, size - 1)]), same_result)
+    result[same] = same_result
+
+    spans = ~same
+    edges = np.maximum(suffix[lo[spans]], prefix[last[spans]])
+    inner_lo, inner_hi = first_block[spans] + 1, last_block[spans] - 1
+    has_inner = inner_hi >= inner_lo
+    if has_inner.any():
+        a, b = inner_lo[has_inner], inner_hi[has_inner]
+        level = np.floor(np.log2(b - a + 1)).astype(np.int64)
+        inner = np.empty(len(a))
+        for k in np.unique(level):
+            rows = level == k
+            inner[rows] = np.maximum(table[k][a[rows]], table[k][b[rows] - 2 ** k + 1])
+        edges[has_inner] = np.maximum(edges[has_inner], inner)
+    result[spans] = edges
+    return result
+
+
+class PairIndex:
+    """For each donor: its slice of allowed acceptors and the best acceptor score in it
+
+    Shared by counting and top-n selection, and patched in place of a
+    rebuild when an edit only moves part of the sequence.
+    """
+
+    __slots__ = ('lo', 'counts', 'best_acceptor')
+
+    def __init__(self, lo: np.ndarray, counts: np.ndarray, best_acceptor: np.ndarray):
+        self.lo = lo
+        self.counts = counts
+        # -inf for donors without partners, 0 everywhere for unscored acceptors
+        self.best_acceptor = best_acceptor
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+
+def build_pair_index(donors: np.ndarray, acceptors: np.ndarray, acceptor_scores: np.ndarray = None,
+                     min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                     max_length: int = DEFAULT_MAX_INTRON_LENGTH) -> PairIndex:
+    """PairIndex of the given donors (any sorted subset) against all acceptors"""
+    lo, counts = _acceptor_ranges(donors, acceptors, min_length, max_length)
+    best = np.full(len(donors), -np.inf)
+    paired = np.flatnonzero(counts)
+    if acceptor_scores is None:
+        best[paired] = 0.0
+    elif len(paired):
+        # Only the span of acceptors these donors can reach is needed
+        first = int(lo[paired[0]])
+        last = int(lo[paired[-1]] + counts[paired[-1]])
+        best[paired] = _range_max(acceptor_scores[first:last], lo[paired] - first,
+                                  lo[paired] + counts[paired] - first)
+    return PairIndex(lo, counts, best)
+
+
+def iter_scored_intron_candidates(donors: np.ndarray, acceptors: np.ndarray,
+                                  donor_scores: np.ndarray, acceptor_scores: np.ndarray,
+                                  min_score: float,
+                                  min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                                  max_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                                  batch_size: int = DEFAULT_BATCH_SIZE):
+    """Yield (donor_index, acceptor_index, score) of candidates scoring at least min_score
+
+    Acceptors too weak for even the best donor are dropped first, then each
+    donor's best possible pair (as in top_intron_candidates) decides whether
+    its range is expanded at all, so low-scoring pairs are mostly never
+    enumerated. Unscored sides count as 0.
+    """
+    if donor_scores is None:
+        donor_scores = np.zeros(len(donors))
+    if acceptor_scores is None:
+        acceptor_scores = np.zeros(len(acceptors))
+    if not len(donors) or not len(acceptors):
+        return
+    strong = np.flatnonzero(acceptor_scores >= min_score - donor_scores.max())
+    index = build_pair_index(donors, acceptors[strong], acceptor_scores[strong], min_length, max_length)
+    candidates = np.flatnonzero(donor_scores + index.best_acceptor >= min_score)
+    for donor_index, acceptor_index in _iter_pairs(candidates, index.lo[candidates],
+                                                   index.counts[candidates], batch_size):
+        acceptor_index = strong[acceptor_index]
+        scores = donor_scores[donor_index] + acceptor_scores[acceptor_index]
+        keep = scores >= min_score
+        if keep.any():
+            yield donor_index[keep], acceptor_index[keep], scores[keep]
+
+
+def _pair_scores(donor_index, acceptor_index, donor_scores, acceptor_scores):
+    scores = np.zeros(len(donor_index), dtype=np.float64)
+    if donor_scores is not None:
+        scores += donor_scores[donor_index]
+    if acceptor_scores is not None:
+        scores += acceptor_scores[acceptor_index]
+    return scores
+
+
+def _rank(scores, donor_positions, lengths):
+    """Order by score (high first), then donor position, then shorter introns"""
+    return np.lexsort((lengths, donor_positions, -scores))
+
+
+def top_intron_candidates(donors: np.ndarray, acceptors: np.ndarray, n: int,
+                          donor_scores: np.ndarray = None, acceptor_scores: np.ndarray = None,
+                          min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                          max_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                          batch_size: int = DEFAULT_BATCH_SIZE, index: PairIndex = None) -> tuple:
+    """Best n candidates by donor + acceptor score as (donor_index, acceptor_index, score)
+
+    Each donor's best possible pair score bounds what it can contribute, so
+    only donors whose bound reaches the n-th best bound are expanded.
+    Memory stays bounded by batch_size + n however many candidates exist.
+    """
+    if index is None:
+        index = build_pair_index(donors, acceptors, acceptor_scores, min_length, max_length)
+    lo, counts = index.lo, index.counts
+    cutoff = -np.inf
+    if donor_scores is None and acceptor_scores is None:
+        # All scores tie, so the ranking is by donor position: the first donors win
+        stop = int(np.searchsorted(np.cumsum(counts), n, side='left')) + 1
+        candidates = np.arange(min(stop, len(donors)))
+    else:
+        candidates = np.flatnonzero(counts)
+        if len(candidates) > n:
+            bound = index.best_acceptor[candidates].copy()
+            if donor_scores is not None:
+                bound += donor_scores[candidates]
+            cutoff = np.partition(bound, len(bound) - n)[len(bound) - n]
+            candidates = candidates[bound >= cutoff]
+
+    best_donor = np.empty(0, dtype=np.int64)
+    best_acceptor = np.empty(0, dtype=np.int64)
+    best_score = np.empty(0, dtype=np.float64)
+    for donor_index, acceptor_index in _iter_pairs(candidates, lo[candidates], counts[candidates],
+                                                   batch_size):
+        scores = _pair_scores(donor_index, acceptor_index, donor_scores, acceptor_scores)
+        keep = scores >= cutoff
+        best_donor = np.concatenate([best_donor, donor_index[keep]])
+        best_acceptor = np.concatenate([best_acceptor, acceptor_index[keep]])
+        best_score = np.concatenate([best_score, scores[keep]])
+        order = _rank(best_score, donors[best_donor],
+                      intron_length(donors[best_donor], acceptors[best_acceptor]))[:n]
+        best_donor, best_acceptor, best_score = best_donor[order], best_acceptor[order], best_score[order]
+    return best_donor, best_acceptor, best_score
+
+
+def select_non_overlapping(donor_positions: np.ndarray, acceptor_positions: np.ndarray,
+                           scores: np.ndarray, n: int = None) -> np.ndarray:
+    """Greedy highest-score-first selection of introns that do not overlap
+
+    Returns indices into the given arrays, in selection order.
+    """
+    order = _rank(scores, donor_positions, intron_length(donor_positions, acceptor_positions))
+    starts, ends, chosen = [], [], []
+    for i in order:
+        start, end = int(donor_positions[i]), int(acceptor_positions[i]) + 2
+        slot = bisect.bisect_left(starts, start)
+        if slot > 0 and ends[slot - 1] > start:
+            continue
+        if slot < len(starts) and starts[slot] < end:
+            continue
+        starts.insert(slot, start)
+        ends.insert(slot, end)
+        chosen.append(i)
+        if n is not None and len(chosen) >= n:
+            break
+    return np.array(chosen, dtype=np.int64)
+
+
+def pair_introns(donors: np.ndarray, acceptors: np.ndarray, n: int,
+                 donor_scores: np.ndarray = None, acceptor_scores: np.ndarray = None,
+                 min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                 max_length: int = DEFAULT_MAX_INTRON_LENGTH,
+                 non_overlapping: bool = False, index: PairIndex = None) -> list:
+    """Top n introns as dicts, optionally restricted to a non-overlapping set"""
+    pool = max(n, NON_OVERLAP_POOL) if non_overlapping else n
+    donor_index, acceptor_index, scores = top_intron_candidates(
+        donors, acceptors, pool, donor_scores, acceptor_scores, min_length, max_length,
+        index=index)
+    donor_positions = donors[donor_index]
+    acceptor_positions = acceptors[acceptor_index]
+    if non_overlapping:
+        keep = select_non_overlapping(donor_positions, acceptor_positions, scores, n)
+        donor_positions, acceptor_positions, scores = (
+            donor_positions[keep], acceptor_positions[keep], scores[keep])
+
+    return [{
+        'donor': int(donor),
+        'acceptor': int(acceptor),
+        'distance': int(acceptor - donor),
+        'length': int(acceptor + 2 - donor),
+        'score': float(score)
+    } for donor, acceptor, score in zip(donor_positions, acceptor_positions, scores)]
@@ -0,0 +1,239 @@
+"""
+Trainable k-mer splice-site classifier (Random Forest on k-mer and positional features)
+
+Windows are fixed-length code arrays with the site dinucleotide starting
+at WINDOW_CENTER. k-mer counts come from a rolling base-4 hash over the
+encoded windows rather than substring slicing.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .splice_scanner import N, complement_codes, encode_sequence
+from .splice_scoring import (
+    ACCEPTOR_FREQUENCIES, ACCEPTOR_MOTIF_OFFSET, DONOR_FREQUENCIES, DONOR_MOTIF_OFFSET
+)
+
+CLASSES = ('donor_site', 'acceptor_site', 'non_junction')
+WINDOW_LENGTH = 40
+WINDOW_CENTER = 20
+DEFAULT_K = 3
+PREDICT_BATCH_SIZE = 10_000
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / 'models' / 'splice_kmer_rf.joblib'
+
+_LABEL_ALIASES = {
+    'donor': 'donor_site', 'donor_site': 'donor_site', 'ei': 'donor_site',
+    'acceptor': 'acceptor_site', 'acceptor_site': 'acceptor_site', 'ie': 'acceptor_site',
+    'non-junction': 'non_junction', 'non_junction': 'non_junction', 'none': 'non_junction',
+    'n': 'non_junction'
+}
+
+
+def kmer_hashes(windows: np.ndarray, k: int) -> tuple:
+    """Rolling base-4 hash of every k-mer in each window, plus a mask of k-mers free of N"""
+    span = windows.shape[1] - k + 1
+    hashes = np.zeros((len(windows), span), dtype=np.int64)
+    valid = np.ones((len(windows), span), dtype=bool)
+    for offset in range(k):
+        column = windows[:, offset:offset + span]
+        hashes = hashes * 4 + np.where(column == N, 0, column)
+        valid &= column != N
+    return hashes, valid
+
+
+def kmer_frequencies(windows: np.ndarray, k: int = DEFAULT_K) -> np.ndarray:
+    """(windows, 4**k) k-mer frequency matrix"""
+    hashes, valid = kmer_hashes(windows, k)
+    size = 4 ** k
+    rows = np.broadcast_to(np.arange(len(windows))[:, None], hashes.shape)
+    flat = (rows * size + hashes)[valid]
+    counts = np.bincount(flat, minlength=len(windows) * size).reshape(len(windows), size)
+    totals = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+    return counts / totals
+
+
+def positional_features(windows: np.ndarray) -> np.ndarray:
+    """One-hot encoding of every window position (N is all zeros)"""
+    return (windows[:, :, None] == np.arange(4)).reshape(len(windows), -1).astype(np.float32)
+
+
+def extract_features(windows: np.ndarray, k: int = DEFAULT_K) -> np.ndarray:
+    return np.hstack([kmer_frequencies(windows, k), positional_features(windows)])
+
+
+def site_windows(codes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Fixed-length windows centred on each site, padded with N past the sequence ends"""
+    offsets = np.asarray(positions, dtype=np.int64)[:, None] - WINDOW_CENTER + np.arange(WINDOW_LENGTH)
+    inside = (offsets >= 0) & (offsets < len(codes))
+    windows = np.full(offsets.shape, N, dtype=np.uint8)
+    windows[inside] = codes[offsets[inside]]
+    return windows
+
+
+def reverse_site_windows(codes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Windows for reverse-strand sites, as read on the reverse strand
+
+    positions are forward coordinates of the site's first base (AC/CT);
+    the forward window is chosen so that reversing it puts the site's
+    dinucleotide at WINDOW_CENTER.
+    """
+    shifted = np.asarray(positions, dtype=np.int64) + 2 + 2 * WINDOW_CENTER - WINDOW_LENGTH
+    return complement_codes(site_windows(codes, shifted)[:, ::-1])
+
+
+def tiled_windows(codes: np.ndarray, max_windows: int) -> np.ndarray:
+    """Evenly spaced windows covering the sequence, at most max_windows of them"""
+    if len(codes) < WINDOW_LENGTH:
+        return site_windows(codes, np.array([WINDOW_CENTER]))
+    starts = np.arange(0, len(codes) - WINDOW_LENGTH + 1, WINDOW_LENGTH)
+    if len(starts) > max_windows:
+        starts = starts[np.linspace(0, len(starts) - 1, max_windows).astype(np.int64)]
+    return site_windows(codes, starts + WINDOW_CENTER)
+
+
+def _fit_window(codes: np.ndarray) -> np.ndarray:
+    """Centre-crop or N-pad an encoded sequence to WINDOW_LENGTH"""
+    if len(codes) >= WINDOW_LENGTH:
+        start = (len(codes) - WINDOW_LENGTH) // 2
+        return codes[start:start + WINDOW_LENGTH]
+    window = np.full(WINDOW_LENGTH, N, dtype=np.uint8)
+    start = (WINDOW_LENGTH - len(codes)) // 2
+    window[start:start + len(codes)] = codes
+    return window
+
+
+def load_training_csv(path) -> tuple:
+    """Labelled windows from a CSV with 'sequence' and 'label' columns"""
+    import pandas as pd
+
+    frame = pd.read_csv(path)
+    labels = frame['label'].astype(str).str.strip().str.lower().map(_LABEL_ALIASES)
+    if labels.isna().any():
+        unknown = sorted(frame.loc[labels.isna(), 'label'].astype(str).unique())
+        raise ValueError(f"Unknown labels in {path}: {unknown}")
+    windows = np.stack([_fit_window(encode_sequence(seq)) for seq in frame['sequence'].astype(str)])
+    return windows, labels.to_numpy()
+
+
+def _sample_motif(rng, frequencies, count) -> np.ndarray:
+    freqs = np.asarray(frequencies, dtype=np.float64)
+    cumulative = np.cumsum(freqs / freqs.sum(axis=1, keepdims=True), axis=1)
+    draws = rng.random((count, len(freqs), 1))
+    return np.minimum((draws > cumulative[None, :, :]).sum(axis=2), 3).astype(np.uint8)
+
+
+def synthesize_training_windows(per_class: int = 2000, seed: int = 0) -> tuple:
+    """Labelled windows sampled from the built-in consensus models
+
+    Real sites embed a sampled donor/acceptor motif; non-junction windows
+    are background with a bare GT or AG at the centre, so the classifier
+    has to learn the context rather than the dinucleotide.
+    """
+    rng = np.random.default_rng(seed)
+
+    def background(count):
+        return rng.integers(0, 4, size=(count, WINDOW_LENGTH), dtype=np.uint8)
+
+    donors = background(per_class)
+    start = WINDOW_CENTER - DONOR_MOTIF_OFFSET
+    donors[:, start:start + len(DONOR_FREQUENCIES)] = _sample_motif(rng, DONOR_FREQUENCIES, per_class)
+
+    acceptors = background(per_class)
+    start = WINDOW_CENTER - ACCEPTOR_MOTIF_OFFSET
+    acceptors[:, start:start + len(ACCEPTOR_FREQUENCIES)] = _sample_motif(
+        rng, ACCEPTOR_FREQUENCIES, per_class)
+
+    decoys = background(per_class)
+    decoys[:, WINDOW_CENTER:WINDOW_CENTER + 2] = np.where(
+        rng.random((per_class, 1)) < 0.5, [[2, 3]], [[0, 2]])
+
+    windows = np.vstack([donors, acceptors, decoys])
+    labels = np.repeat(np.array(CLASSES), per_class)
+    return windows, labels
+
+
+class SpliceSiteClassifier:
+    """Random Forest over k-mer frequencies and positional one-hot features"""
+
+    def __init__(self, k: int = DEFAULT_K, n_estimators: int = 100, random_state: int = 42):
+        self.k = k
+        self.n_estimators = n_estimators
+        self.random_state = random_state
+        self.model = None
+
+    def train(self, windows: np.ndarray, labels: np.ndarray, test_size: float = 0.2) -> dict:
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+
+        features = extract_features(windows, self.k)
+        x_train, x_test, y_train, y_test = train_test_split(
+            features, labels, test_size=test_size, random_state=self.random_state, stratify=labels)
+        self.model = RandomForestClassifier(
+            n_estimators=self.n_estimators, random_state=self.random_state, n_jobs=-1)
+        self.model.fit(x_train, y_train)
+        # Prediction batches are small; thread fan-out would cost more than it saves
+        self.model.set_params(n_jobs=1)
+        return {
+            'train_accuracy': float(self.model.score(x_train, y_train)),
+            'test_accuracy': float(self.model.score(x_test, y_test)),
+            'feature_count': int(features.shape[1]),
+            'training_windows': int(len(windows)),
+            'status': 'ready'
+        }
+
+    def predict_proba(self, windows: np.ndarray) -> np.ndarray:
+        """(windows, len(CLASSES)) probabilities, predicted in bounded batches"""
+        probabilities = np.zeros((len(windows), len(CLASSES)))
+        columns = [CLASSES.index(label) for label in self.model.classes_]
+        for begin in range(0, len(windows), PREDICT_BATCH_SIZE):
+            batch = windows[begin:begin + PREDICT_BATCH_SIZE]
+            probabilities[begin:begin + len(batch), columns] = self.model.predict_proba(
+                extract_features(batch, self.k))
+        return probabilities
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        import joblib
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Uncompressed so the tree arrays can be memory-mapped on load
+        joblib.dump(self, path, compress=0)
+        return path
+
+
+_classifier_cache = {}
+_classifier_lock = threading.Lock()
+
+
+def load_classifier(path=DEFAULT_MODEL_PATH):
+    """Load a saved classifier once per process (reloaded if the file changes); None if absent"""
+    path = Path(path).resolve()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    key = (str(path), mtime)
+    classifier = _classifier_cache.get(key)
+    if classifier is None:
+        with _classifier_lock:
+            classifier = _classifier_cache.get(key)
+            if classifier is None:
+                import joblib
+
+                classifier = joblib.load(path, mmap_mode='r')
+                for stale in [cached for cached in _classifier_cache if cached[0] == key[0]]:
+                    del _classifier_cache[stale]
+                _classifier_cache[key] = classifier
+    return classifier
+
+
+def classifier_fingerprint(path=DEFAULT_MODEL_PATH):
+    """Identifies the saved model version (path and mtime), None when there is none"""
+    path = Path(path).resolve()
+    try:
+        return f'{path}:{os.path.getmtime(path)}'
+    except OSError:
+        return None
@@ -0,0 +1,336 @@
+"""
+Suffix-array motif index over a collection of sequences
+
+    python -m splice_junction.motif_index build assemblies/*.fa.gz -o collection.sjsa
+    python -m splice_junction.motif_index query collection.sjsa CAGGTRAGT YTNAY --both-strands
+
+Records are encoded, joined with a separator and their suffixes sorted
+once by prefix doubling in numpy. A query narrows the sorted range one
+pattern position at a time with binary searches, branching over the
+bases each IUPAC code allows, so a lookup costs O(pattern length x
+log(collection)) per live branch plus the hits, independent of how much
+sequence is indexed. As in splice_scanner.iupac_hits, N in a pattern
+also matches masked bases; hits never span two records.
+
+File layout (little-endian), memory-mapped on load:
+    header    magic 'SJSA', version u32, record count u32, suffix width u32,
+              text length u64, index offset u64
+    text      codes u8, records separated by SEPARATOR, padded to 8 bytes
+    suffixes  suffix array, int32 or int64 (the suffix width)
+    index     per record: name length u16, name, start u64, length u64
+"""
+
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from .fasta_stream import DEFAULT_CHUNK_SIZE, iter_sequence_chunks
+from .splice_scanner import BASES, IUPAC_BASES, N, decode_sequence, iupac_complement
+from .sequence_ingest import iter_fasta_records
+
+MAGIC = b'SJSA'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIIQQ')
+_INDEX_ENTRY = struct.Struct('<QQ')
+# Code between records; no pattern base matches it
+SEPARATOR = N + 1
+# Leading symbols packed into the first sort key (7 ** 21 < 2 ** 63)
+_INITIAL_PREFIX = 21
+DEFAULT_HIT_LIMIT = 10_000
+
+
+def _pattern_codes(pattern: str) -> list:
+    """Sorted codes each pattern position may match"""
+    if not pattern:
+        raise ValueError("pattern must not be empty")
+    allowed = []
+    for code in pattern.upper():
+        if code not in IUPAC_BASES:
+            raise ValueError(f"Unknown IUPAC code {code!r} in pattern {pattern!r}")
+        allowed.append(sorted(BASES.index(base) if base != 'N' else N for base in IUPAC_BASES[code]))
+    return allowed
+
+
+def _dense_ranks(changes: np.ndarray, order: np.ndarray, dtype) -> np.ndarray:
+    """Rank of each suffix in text order, given where the sorted keys change"""
+    steps = np.zeros(len(order), dtype=dtype)
+    np.cumsum(changes, out=steps[1:])
+    ranks = np.empty(len(order), dtype=dtype)
+    ranks[order] = steps
+    return ranks
+
+
+def _changes(sorted_key: np.ndarray) -> np.ndarray:
+    return sorted_key[1:] != sorted_key[:-1]
+
+
+def suffix_array(text: np.ndarray) -> np.ndarray:
+    """Start positions of all suffixes of text (codes 0..SEPARATOR) in lexicographic order
+
+    The first _INITIAL_PREFIX symbols are packed into one key, then
+    ranks are doubled until every suffix has its own, so sequences
+    without long repeats finish after the first sort. Positions and ranks
+    are int32 below 2 ** 31 symbols; only the packed key is int64, and
+    doubling rounds lexsort two int32 arrays instead of packing them into
+    one. The build peaks at about 25 bytes per symbol.
+    """
+    n = len(text)
+    dtype = np.int32 if n < 2 ** 31 else np.int64
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    # Symbols shifted by one so that 0 marks the end of the text and sorts first
+    key = np.zeros(n, dtype=np.int64)
+    for offset in range(_INITIAL_PREFIX):
+        key *= SEPARATOR + 2
+        if offset < n:
+            key[:n - offset] += text[offset:]
+            key[:n - offset] += 1
+    order = np.argsort(key, kind='stable').astype(dtype)
+    key = key[order]
+    ranks = _dense_ranks(_changes(key), order, dtype)
+    del key
+
+    span = _INITIAL_PREFIX
+    while ranks[order[-1]] < n - 1 and span < n:
+        following = np.zeros(n, dtype=dtype)
+        following[:n - span] = ranks[span:] + 1
+        order = np.lexsort((following, ranks)).astype(dtype)
+        changes = _changes(ranks[order])
+        changes |= _changes(following[order])
+        del following
+        ranks = _dense_ranks(changes, order, dtype)
+        span *= 2
+    return order
+
+
+class MotifIndex:
+    """Exact and IUPAC motif lookups over indexed records"""
+
+    def __init__(self, text: np.ndarray, suffixes: np.ndarray, names: list, starts: np.ndarray,
+                 lengths: np.ndarray):
+        self.text = text
+        self.suffixes = suffixes
+        self.names = names
+        self.starts = starts
+        self.lengths = lengths
+        self._mmap = None
+        self._file = None
+
+    @classmethod
+    def build(cls, records) -> 'MotifIndex':
+        """Index (name, codes) pairs; codes as returned by splice_scanner.encode_sequence"""
+        names, parts, starts, lengths = [], [], [], []
+        position = 0
+        for name, codes in records:
+            names.append(name or f'seq{len(names) + 1}')
+            starts.append(position)
+            lengths.append(len(codes))
+            parts += [np.asarray(codes, dtype=np.uint8), np.array([SEPARATOR], dtype=np.uint8)]
+            position += len(codes) + 1
+        text = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint8)
+        return cls(text, suffix_array(text), names, np.array(starts, dtype=np.int64),
+                   np.array(lengths, dtype=np.int64))
+
+    @classmethod
+    def from_text(cls, data) -> 'MotifIndex':
+        """Index every record of FASTA text or bytes (headerless input is one record)"""
+        return cls.build((record.name, record.codes) for record in iter_fasta_records(data))
+
+    @classmethod
+    def from_files(cls, paths, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'MotifIndex':
+        """Index every record of (gzipped) FASTA/FASTQ files"""
+        return cls.build(_file_records(paths, chunk_size))
+
+    def __len__(self) -> int:
+        """Number of indexed bases, separators excluded"""
+        return int(self.lengths.sum())
+
+    @property
+    def nbytes(self) -> int:
+        return self.text.nbytes + self.suffixes.nbytes
+
+    def _symbol(self, rank: int, depth: int) -> int:
+        position = int(self.suffixes[rank]) + depth
+        return int(self.text[position]) if position < len(self.text) else -1
+
+    def _bound(self, lo: int, hi: int, depth: int, symbol: int, upper: bool) -> int:
+        """First rank in [lo, hi) whose symbol at depth is >= symbol (> symbol when upper)"""
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._symbol(mid, depth)
+            if value < symbol or (upper and value == symbol):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _ranges(self, pattern: str) -> list:
+        """Suffix array ranges [lo, hi) whose suffixes start with the pattern"""
+        ranges = [(0, len(self.suffixes))]
+        for depth, symbols in enumerate(_pattern_codes(pattern)):
+            narrowed = []
+            for lo, hi in ranges:
+                for symbol in symbols:
+                    first = self._bound(lo, hi, depth, symbol, upper=False)
+                    last = self._bound(first, hi, depth, symbol, upper=True)
+                    if last > first:
+                        narrowed.append((first, last))
+                    lo = last
+            ranges = narrowed
+            if not ranges:
+                break
+        return ranges
+
+    def count(self, pattern: str, both_strands: bool = False) -> int:
+        """Number of hits, without listing them"""
+        patterns = self._strand_patterns(pattern, both_strands)
+        return sum(hi - lo for query, _ in patterns for lo, hi in self._ranges(query))
+
+    @staticmethod
+    def _strand_patterns(pattern: str, both_strands: bool) -> list:
+        patterns = [(pattern, '+')]
+        reverse = iupac_complement(pattern)
+        # A palindromic pattern's '-' hits are its '+' hits
+        if both_strands and reverse != pattern.upper():
+            patterns.append((reverse, '-'))
+        return patterns
+
+    def find(self, pattern: str, both_strands: bool = False, limit: int = DEFAULT_HIT_LIMIT) -> dict:
+        """Hits as arrays record, position (0-based in the record), strand; sorted by record and position
+
+        '-' hits match the pattern's reverse complement at that forward
+        position. At most limit hits are listed (None for all); use count
+        for the total.
+        """
+        found = []
+        for query, strand in self._strand_patterns(pattern, both_strands):
+            for lo, hi in self._ranges(query):
+                found.append((np.asarray(self.suffixes[lo:hi], dtype=np.int64), strand))
+        offsets = np.concatenate([hits for hits, _ in found]) if found else np.empty(0, dtype=np.int64)
+        strands = np.concatenate([np.repeat(strand, len(hits)) for hits, strand in found]
+                                 ).astype(object) if found else np.empty(0, dtype=object)
+
+        order = np.lexsort((strands == '-', offsets))
+        if limit is not None:
+            order = order[:limit]
+        offsets, strands = offsets[order], strands[order]
+        record = np.searchsorted(self.starts, offsets, side='right') - 1
+        return {
+            'record': np.array(self.names, dtype=object)[record] if len(record) else np.empty(0, dtype=object),
+            'position': offsets - self.starts[record],
+            'strand': strands
+        }
+
+    def fetch(self, record: str, start: int, end: int) -> str:
+        """Bases [start, end) of an indexed record, clipped to it"""
+        index = self.names.index(record)
+        start, end = max(start, 0), min(end, int(self.lengths[index]))
+        offset = int(self.starts[index])
+        return decode_sequence(np.asarray(self.text[offset + start:offset + max(end, start)]))
+
+    def save(self, path):
+        """Write the index to one file (see the module docstring for the layout)"""
+        width = self.suffixes.dtype.itemsize
+        with open(path, 'wb') as handle:
+            handle.write(_HEADER.pack(MAGIC, VERSION, len(self.names), width, len(self.text), 0))
+            handle.write(np.ascontiguousarray(self.text).tobytes())
+            handle.write(b'\0' * (-len(self.text) % 8))
+            handle.write(np.ascontiguousarray(self.suffixes, dtype=f'<i{width}').tobytes())
+            index_offset = handle.tell()
+            for name, start, length in zip(self.names, self.starts, self.lengths):
+                raw_name = name.encode('utf-8')
+                handle.write(struct.pack('<H', len(raw_name)) + raw_name)
+                handle.write(_INDEX_ENTRY.pack(int(start), int(length)))
+            handle.seek(0)
+            handle.write(_HEADER.pack(MAGIC, VERSION, len(self.names), width, len(self.text), index_offset))
+
+    @classmethod
+    def load(cls, path) -> 'MotifIndex':
+        """Open a saved index; text and suffixes are zero-copy views of an mmap"""
+        handle = open(path, 'rb')
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, width, length, index_offset = _HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            handle.close()
+            raise ValueError(f"{path} is not a motif index")
+
+        text = np.frombuffer(mapped, dtype=np.uint8, count=length, offset=_HEADER.size)
+        suffixes_offset = _HEADER.size + length + (-length % 8)
+        suffixes = np.frombuffer(mapped, dtype=f'<i{width}', count=length, offset=suffixes_offset)
+        names, starts, lengths = [], [], []
+        pos = index_offset
+        for _ in range(count):
+            (name_length,) = struct.unpack_from('<H', mapped, pos)
+            names.append(mapped[pos + 2:pos + 2 + name_length].decode('utf-8'))
+            pos += 2 + name_length
+            start, record_length = _INDEX_ENTRY.unpack_from(mapped, pos)
+            starts.append(start)
+            lengths.append(record_length)
+            pos += _INDEX_ENTRY.size
+
+        index = cls(text, suffixes, names, np.array(starts, dtype=np.int64),
+                    np.array(lengths, dtype=np.int64))
+        index._file, index._mmap = handle, mapped
+        return index
+
+    def close(self):
+        if self._mmap is not None:
+            # Drop the views before closing the map they point into
+            self.text = self.suffixes = None
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _file_records(paths, chunk_size: int):
+    for path in paths:
+        name, parts = None, []
+        for chunk in iter_sequence_chunks(path, chunk_size, overlap=0):
+            name = chunk.name
+            parts.append(chunk.codes)
+            if chunk.is_last:
+                yield name, np.concatenate(parts)
+                parts = []
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query a suffix-array motif index")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index FASTA/FASTQ files (optionally gzipped)")
+    build.add_argument('inputs', nargs='+')
+    build.add_argument('-o', '--output', required=True, help="index file to write")
+    query = commands.add_parser('query', help="print the hits of IUPAC patterns as BED")
+    query.add_argument('index')
+    query.add_argument('patterns', nargs='+')
+    query.add_argument('--both-strands', action='store_true', help="also match reverse complements")
+    query.add_argument('--limit', type=int, default=DEFAULT_HIT_LIMIT, help="hits listed per pattern")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        index = MotifIndex.from_files(args.inputs)
+        index.save(args.output)
+        print(f"Indexed {len(index.names)} records, {len(index):,} bases -> {args.output}", file=sys.stderr)
+        return 0
+
+    with MotifIndex.load(args.index) as index:
+        for pattern in args.patterns:
+            hits = index.find(pattern, args.both_strands, args.limit)
+            print(f"# {pattern}: {index.count(pattern, args.both_strands)} hits", file=sys.stderr)
+            for record, position, strand in zip(hits['record'], hits['position'], hits['strand']):
+                sys.stdout.write(f"{record}\t{position}\t{position + len(pattern)}\t{pattern}\t0\t{strand}\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
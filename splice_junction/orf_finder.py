@@ -0,0 +1,159 @@
+"""
+Vectorized six-frame open reading frame detection
+
+Codons are read as one integer per position from the encoded array. In
+each frame every start is matched to the next in-frame stop with a
+binary search, and the first start before each stop gives that stop's
+(longest) ORF. Starts separated from their stop by an N are skipped, so
+a start before a masked gap never hides the ORF after it. Reverse-strand
+ORFs are found on the forward array by looking for reverse-complemented
+codons and pairing towards lower coordinates; the reverse complement is
+never built.
+"""
+
+import numpy as np
+
+from .splice_scanner import N, STOP_CODONS, encode_sequence
+
+# ORF length in nucleotides, start and stop codon included
+DEFAULT_MIN_ORF_LENGTH = 300
+
+
+def _codon_value(codon: str) -> int:
+    a, b, c = encode_sequence(codon).tolist()
+    return a * 25 + b * 5 + c
+
+
+def _reverse_complement(codon: str) -> str:
+    return codon[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+
+
+START_VALUE = _codon_value('ATG')
+STOP_VALUES = [_codon_value(stop) for stop in STOP_CODONS]
+# The same codons read on the reverse strand, as they appear on the forward strand
+MINUS_START_VALUE = _codon_value(_reverse_complement('ATG'))
+MINUS_STOP_VALUES = [_codon_value(_reverse_complement(stop)) for stop in STOP_CODONS]
+
+
+def codon_values(codes: np.ndarray) -> np.ndarray:
+    """Codon starting at each position as a*25 + b*5 + c (N included)"""
+    if len(codes) < 3:
+        return np.empty(0, dtype=np.int16)
+    codes = codes.astype(np.int16)
+    return codes[:-2] * 25 + codes[1:-1] * 5 + codes[2:]
+
+
+def _any_equal(values: np.ndarray, targets) -> np.ndarray:
+    found = values == targets[0]
+    for target in targets[1:]:
+        found |= values == target
+    return found
+
+
+def _next_masked(masked: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """First masked position at or after each position (past the end when there is none)"""
+    following = np.searchsorted(masked, positions)
+    return np.append(masked, np.iinfo(np.int64).max)[following]
+
+
+def _plus_orfs(starts: np.ndarray, stops: np.ndarray, masked: np.ndarray) -> tuple:
+    """(begin, end) of the ORF from the first start after each in-frame stop to the next stop
+
+    Starts with an N before their stop are skipped, so a stop pairs with
+    the first start after the last N in front of it.
+    """
+    if not len(starts) or not len(stops):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    following = np.searchsorted(stops, starts, side='left')
+    closed = following < len(stops)
+    starts, following = starts[closed], following[closed]
+    unmasked = _next_masked(masked, starts) >= stops[following] + 3
+    # starts are sorted, so the first start per following stop is the longest ORF
+    stop_index, first = np.unique(following[unmasked], return_index=True)
+    begin = starts[unmasked][first]
+    return begin, stops[stop_index] + 3
+
+
+def _minus_orfs(starts: np.ndarray, stops: np.ndarray, masked: np.ndarray) -> tuple:
+    """Reverse-strand ORFs: from the last start before each stop down to the previous stop"""
+    if not len(starts) or not len(stops):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    preceding = np.searchsorted(stops, starts, side='left') - 1
+    closed = preceding >= 0
+    starts, preceding = starts[closed], preceding[closed]
+    unmasked = _next_masked(masked, stops[preceding]) >= starts + 3
+    starts, preceding = starts[unmasked], preceding[unmasked]
+    # Walking down from a stop, the furthest start gives the longest ORF
+    stop_index, last = np.unique(preceding[::-1], return_index=True)
+    begin = starts[::-1][last]
+    return stops[stop_index], begin + 3
+
+
+def find_orfs(codes: np.ndarray, min_length: int = DEFAULT_MIN_ORF_LENGTH,
+              both_strands: bool = True) -> dict:
+    """ORFs of at least min_length nt as arrays start, end, length, strand, frame
+
+    Coordinates are forward-strand and half-open, stop codon included.
+    ORFs never span masked (N) bases; ORFs without a stop are dropped.
+    Frames are +1..+3 by start % 3 and -1..-3 by (length - end) % 3.
+    Sorted longest first, then by start.
+    """
+    codes = encode_sequence(codes)
+    values = codon_values(codes)
+    masked = np.flatnonzero(codes == N)
+    plus_starts = np.flatnonzero(values == START_VALUE)
+    plus_stops = np.flatnonzero(_any_equal(values, STOP_VALUES))
+    if both_strands:
+        minus_starts = np.flatnonzero(values == MINUS_START_VALUE)
+        minus_stops = np.flatnonzero(_any_equal(values, MINUS_STOP_VALUES))
+
+    found = []
+    for frame in range(3):
+        begin, end = _plus_orfs(plus_starts[plus_starts % 3 == frame], plus_stops[plus_stops % 3 == frame],
+                                masked)
+        found.append((begin, end, '+'))
+        if both_strands:
+            begin, end = _minus_orfs(minus_starts[minus_starts % 3 == frame],
+                                     minus_stops[minus_stops % 3 == frame], masked)
+            found.append((begin, end, '-'))
+
+    starts = np.concatenate([begin for begin, _, _ in found])
+    ends = np.concatenate([end for _, end, _ in found])
+    strands = np.concatenate([np.repeat(strand, len(begin)) for begin, _, strand in found]).astype(object)
+
+    keep = ends - starts >= min_length
+    starts, ends, strands = starts[keep], ends[keep], strands[keep]
+
+    plus = strands == '+'
+    frames = np.where(plus, starts % 3 + 1, -((len(codes) - ends) % 3 + 1))
+    order = np.lexsort((starts, -(ends - starts)))
+    return {
+        'start': starts[order],
+        'end': ends[order],
+        'length': (ends - starts)[order],
+        'strand': strands[order],
+        'frame': frames[order]
+    }
+
+
+def orf_coverage(orfs: dict, length: int) -> np.ndarray:
+    """Prefix sums of bases covered by at least one ORF (length + 1 entries)"""
+    delta = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(delta, orfs['start'], 1)
+    np.add.at(delta, orfs['end'], -1)
+    covered = np.cumsum(delta[:-1]) > 0
+    prefix = np.zeros(length + 1, dtype=np.int64)
+    np.cumsum(covered, out=prefix[1:])
+    return prefix
+
+
+def orf_dicts(orfs: dict, limit: int = None) -> list:
+    count = len(orfs['start']) if limit is None else min(limit, len(orfs['start']))
+    return [{
+        'start': int(orfs['start'][i]),
+        'end': int(orfs['end'][i]),
+        'length': int(orfs['length'][i]),
+        'codons': int(orfs['length'][i]) // 3,
+        'strand': orfs['strand'][i],
+        'frame': int(orfs['frame'][i])
+    } for i in range(count)]
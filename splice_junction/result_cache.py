@@ -0,0 +1,141 @@
+"""
+Content-addressed analysis result cache: bounded in-memory LRU plus optional disk tier
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def make_cache_key(sequence, config: dict, version: str) -> str:
+    """sha256 over the normalized sequence, the analyzer configuration and version"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'config': config, 'version': version}, sort_keys=True,
+                             default=str).encode('utf-8'))
+    digest.update(b'\0')
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', 'replace')
+    digest.update(memoryview(sequence))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Thread-safe result cache
+
+    The memory tier keeps pickled results (so callers never share mutable
+    dicts) and evicts least-recently-used entries past max_entries or
+    max_bytes. With disk_dir set, results are also written there and
+    survive restarts; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._init_state()
+
+    def _init_state(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Worker processes get the limits and disk tier, not the in-memory entries
+        return {'max_entries': self.max_entries, 'max_bytes': self.max_bytes,
+                'disk_dir': self.disk_dir}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f'{key}.pkl'
+
+    def _remember(self, key: str, blob: bytes):
+        """Insert into the memory tier; caller holds the lock"""
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        if len(blob) > self.max_bytes:
+            return
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def get(self, key: str):
+        """Cached result for key, or None"""
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(blob)
+
+        if self.disk_dir:
+            try:
+                blob = self._disk_path(key).read_bytes()
+            except OSError:
+                blob = None
+            if blob is not None:
+                with self._lock:
+                    self._remember(key, blob)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return pickle.loads(blob)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result):
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, blob)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial entry
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as handle:
+                    handle.write(blob)
+                os.replace(tmp, path)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.disk_dir:
+            for path in self.disk_dir.glob('*/*.pkl'):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups * 100 if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
@@ -0,0 +1,189 @@
+"""
+Chunked export of every scored site, intron candidate and window track
+
+Tables are produced as bounded column batches and written straight to a
+file object, so exporting millions of rows never builds one big frame or
+string. CSV needs only pandas; Parquet and Arrow IPC require pyarrow.
+"""
+
+import tempfile
+
+import numpy as np
+
+from .intron_pairing import intron_length, iter_intron_candidates, iter_scored_intron_candidates
+from .orf_finder import DEFAULT_MIN_ORF_LENGTH
+from .window_tracks import compute_tracks
+
+EXPORT_TABLES = ('sites', 'introns', 'windows')
+# format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+}
+EXPORT_BATCH_ROWS = 1 << 18
+DEFAULT_WINDOW_SIZE = 100
+# Exports larger than this spill from memory to a temporary file
+SPOOL_BYTES = 32 * 1024 * 1024
+
+
+def _batches(columns: dict, batch_rows: int):
+    """Slice equal-length column arrays into batches; always at least one"""
+    total = len(next(iter(columns.values())))
+    for start in range(0, max(total, 1), batch_rows):
+        yield {name: values[start:start + batch_rows] for name, values in columns.items()}
+
+
+def _strands(scan) -> list:
+    return [scan] if scan.reverse is None else [scan, scan.reverse]
+
+
+def iter_site_batches(scan, batch_rows: int = EXPORT_BATCH_ROWS):
+    """Columns feature, strand, start, end, score; 0-based half-open dinucleotides
+
+    Each (feature, strand) part is sliced on its own, so no column is ever
+    built for all sites at once.
+    """
+    emitted = False
+    for strand_scan in _strands(scan):
+        for feature, positions, scores in (
+                ('donor', strand_scan.donor_positions, strand_scan.donor_scores),
+                ('acceptor', strand_scan.acceptor_positions, strand_scan.acceptor_scores)):
+            for start in range(0, len(positions), batch_rows):
+                starts = positions[start:start + batch_rows].astype(np.int64)
+                emitted = True
+                yield {
+                    'feature': np.full(len(starts), feature, dtype=object),
+                    'strand': np.full(len(starts), strand_scan.strand, dtype=object),
+                    'start': starts,
+                    'end': starts + 2,
+                    'score': scores[start:start + batch_rows].astype(np.float64)
+                }
+    if not emitted:
+        empty = np.zeros(0, dtype=np.int64)
+        yield {'feature': np.zeros(0, dtype=object), 'strand': np.zeros(0, dtype=object),
+               'start': empty, 'end': empty, 'score': np.zeros(0)}
+
+
+def iter_intron_batches(scan, min_length: int, max_length: int, batch_rows: int = EXPORT_BATCH_ROWS,
+                        min_score: float = None):
+    """Every donor -> acceptor pair within the length limits (scoring at least min_score, if given)
+
+    Columns strand, donor, acceptor, start, end, length, score. On the '-'
+    strand the acceptor lies left of the donor, as in the analyzer's pairing.
+    With min_score, pairs that cannot reach it are skipped while pairing.
+    """
+    emitted = False
+    for strand_scan in _strands(scan):
+        left, right = strand_scan.donor_positions, strand_scan.acceptor_positions
+        left_scores, right_scores = strand_scan.donor_scores, strand_scan.acceptor_scores
+        if strand_scan.strand == '-':
+            left, right = right, left
+            left_scores, right_scores = right_scores, left_scores
+
+        if min_score is None:
+            pairs = ((left_index, right_index, left_scores[left_index] + right_scores[right_index])
+                     for left_index, right_index in iter_intron_candidates(left, right, min_length, max_length,
+                                                                           batch_size=batch_rows))
+        else:
+            pairs = iter_scored_intron_candidates(left, right, left_scores, right_scores, min_score,
+                                                  min_length, max_length, batch_size=batch_rows)
+        for left_index, right_index, scores in pairs:
+            starts, ends = left[left_index], right[right_index]
+            donors, acceptors = (starts, ends) if strand_scan.strand == '+' else (ends, starts)
+            emitted = True
+            yield {
+                'strand': np.repeat(strand_scan.strand, len(starts)).astype(object),
+                'donor': donors.astype(np.int64),
+                'acceptor': acceptors.astype(np.int64),
+                'start': starts.astype(np.int64),
+                'end': ends.astype(np.int64) + 2,
+                'length': intron_length(starts, ends).astype(np.int64),
+                'score': scores.astype(np.float64)
+            }
+    if not emitted:
+        empty = np.zeros(0, dtype=np.int64)
+        yield {'strand': np.zeros(0, dtype=object), 'donor': empty, 'acceptor': empty,
+               'start': empty, 'end': empty, 'length': empty, 'score': np.zeros(0)}
+
+
+def iter_window_batches(scan, window_size: int = DEFAULT_WINDOW_SIZE,
+                        batch_rows: int = EXPORT_BATCH_ROWS,
+                        min_orf_length: int = DEFAULT_MIN_ORF_LENGTH):
+    """Non-overlapping window tracks (see window_tracks.compute_tracks)"""
+    yield from _batches(compute_tracks(scan, window_size, window_size, min_orf_length), batch_rows)
+
+
+def check_export(table: str, fmt: str = 'csv'):
+    """Raise ValueError for an unknown table or format, before any work is done"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table {table!r}; expected one of {EXPORT_TABLES}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {tuple(EXPORT_FORMATS)}")
+
+
+def iter_scan_batches(analyzer, scan, table: str, batch_rows: int = EXPORT_BATCH_ROWS,
+                      window_size: int = DEFAULT_WINDOW_SIZE, min_intron_score: float = None):
+    """Batches of one table of an already scored scan (analyzer.scored_scan)"""
+    check_export(table)
+    if table == 'sites':
+        return iter_site_batches(scan, batch_rows)
+    if table == 'introns':
+        return iter_intron_batches(scan, analyzer.min_intron_length, analyzer.max_intron_length,
+                                   batch_rows, min_intron_score)
+    return iter_window_batches(scan, window_size, batch_rows, analyzer.min_orf_length)
+
+
+def iter_table_batches(analyzer, sequence, table: str, batch_rows: int = EXPORT_BATCH_ROWS,
+                       window_size: int = DEFAULT_WINDOW_SIZE, min_intron_score: float = None):
+    check_export(table)
+    return iter_scan_batches(analyzer, analyzer.scored_scan(sequence), table, batch_rows,
+                             window_size, min_intron_score)
+
+
+def write_batches(batches, handle, fmt: str = 'csv') -> int:
+    """Write column batches to a binary file object; returns the number of rows"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {tuple(EXPORT_FORMATS)}")
+    rows = 0
+    if fmt == 'csv':
+        import pandas as pd
+
+        for i, batch in enumerate(batches):
+            pd.DataFrame(batch).to_csv(handle, header=(i == 0), index=False, float_format='%.6g')
+            rows += len(batch['start'])
+        return rows
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for batch in batches:
+            table = pa.table(batch)
+            if writer is None:
+                writer = (pq.ParquetWriter(handle, table.schema) if fmt == 'parquet'
+                          else pa.ipc.new_file(handle, table.schema))
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_table(analyzer, sequence, table: str, fmt: str = 'csv', handle=None,
+                 batch_rows: int = EXPORT_BATCH_ROWS, window_size: int = DEFAULT_WINDOW_SIZE,
+                 min_intron_score: float = None):
+    """Export one table of the sequence's analysis
+
+    Writes to handle if given, else to a spooled temporary file that is
+    returned rewound for reading. min_intron_score limits the introns
+    table, which otherwise lists every pair in the length limits.
+    """
+    output = handle if handle is not None else tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    write_batches(iter_table_batches(analyzer, sequence, table, batch_rows, window_size, min_intron_score),
+                  output, fmt)
+    if handle is None:
+        output.seek(0)
+    return output
@@ -0,0 +1,126 @@
+"""
+Shared sequence ingestion: one table lookup per byte, N gaps kept in place
+
+Whitespace is dropped, ACGT (any case) is upper-cased, IUPAC ambiguity
+codes become N, and anything else is rejected. N bases stay in the
+sequence so every reported position is a position in the input.
+"""
+
+import numpy as np
+
+from .splice_scanner import encode_sequence
+from .twobit_store import n_runs
+
+BASES = b'ACGT'
+# IUPAC ambiguity codes; all are read as N
+AMBIGUOUS = b'NRYKMSWBDHV'
+WHITESPACE = b' \t\r\n\v\f'
+_INVALID = b'!'
+
+_TEXT_TABLE = bytearray(_INVALID * 256)
+for _byte in BASES + AMBIGUOUS:
+    _normalized = _byte if _byte in BASES else ord('N')
+    _TEXT_TABLE[_byte] = _normalized
+    _TEXT_TABLE[ord(chr(_byte).lower())] = _normalized
+_TEXT_TABLE = bytes(_TEXT_TABLE)
+_ACCEPTED = bytes(byte for byte in range(256) if _TEXT_TABLE[byte] != _INVALID[0]) + WHITESPACE
+
+# The same classification as codes, for array-based callers
+SKIP_CODE = 0xFE
+INVALID_CODE = 0xFF
+CODE_TABLE = np.full(256, INVALID_CODE, dtype=np.uint8)
+CODE_TABLE[np.frombuffer(_ACCEPTED, dtype=np.uint8)] = encode_sequence(
+    bytes(_TEXT_TABLE[byte] for byte in _ACCEPTED))
+CODE_TABLE[np.frombuffer(WHITESPACE, dtype=np.uint8)] = SKIP_CODE
+
+
+class SequenceValidationError(ValueError):
+    pass
+
+
+def to_bytes(data) -> bytes:
+    """str/bytes/bytearray/memoryview as bytes; non-ASCII text is rejected"""
+    if isinstance(data, str):
+        try:
+            return data.encode('ascii')
+        except UnicodeEncodeError as exc:
+            raise SequenceValidationError(invalid_character_message(data[exc.start], exc.start))
+    if isinstance(data, bytes):
+        return data
+    return bytes(data)
+
+
+def invalid_character_message(char, position: int) -> str:
+    if isinstance(char, int):
+        char = chr(char)
+    return f"Invalid character {char!r} at position {position}. Use A, C, G, T or IUPAC codes (N)."
+
+
+def normalize_bytes(data) -> bytes:
+    """Validate and normalize in one translate pass; raises SequenceValidationError"""
+    raw = to_bytes(data)
+    text = raw.translate(_TEXT_TABLE, WHITESPACE)
+    if _INVALID in text:
+        # Only on failure: find the offending byte in the original input
+        bad = raw.translate(None, _ACCEPTED)[0]
+        raise SequenceValidationError(invalid_character_message(bad, raw.find(bytes([bad]))))
+    return text
+
+
+class IngestedSequence:
+    """Normalized sequence text (ACGTN bytes) with its N-run intervals"""
+
+    def __init__(self, text: bytes, name: str = None):
+        self.text = text
+        self.name = name
+        self._codes = None
+        self._masked = None
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @property
+    def codes(self) -> np.ndarray:
+        if self._codes is None:
+            self._codes = encode_sequence(self.text)
+        return self._codes
+
+    @property
+    def masked(self) -> np.ndarray:
+        """(start, end) intervals of N runs"""
+        if self._masked is None:
+            self._masked = n_runs(self.codes)
+        return self._masked
+
+    @property
+    def masked_bases(self) -> int:
+        return self.text.count(b'N')
+
+    @property
+    def valid_bases(self) -> int:
+        return len(self.text) - self.masked_bases
+
+    def as_str(self) -> str:
+        return self.text.decode('ascii')
+
+
+def ingest_sequence(data, name: str = None) -> IngestedSequence:
+    """Normalize raw sequence text or bytes (no FASTA header)"""
+    if isinstance(data, IngestedSequence):
+        return data
+    return IngestedSequence(normalize_bytes(data), name)
+
+
+def iter_fasta_records(data):
+    """IngestedSequences for each record of FASTA text or bytes (headerless input is one record)"""
+    raw = to_bytes(data)
+    start = len(raw) - len(raw.lstrip())
+    if not raw.startswith(b'>', start):
+        yield ingest_sequence(raw)
+        return
+
+    for record in raw[start + 1:].split(b'\n>'):
+        header, _, body = record.partition(b'\n')
+        name = header.decode('utf-8', 'replace').strip().split(' ')[0] or None
+        yield ingest_sequence(body, name)
+
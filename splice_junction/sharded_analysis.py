@@ -0,0 +1,174 @@
+"""
+Sharded whole-chromosome analysis across worker processes
+"""
+
+import os
+
+import numpy as np
+
+from .sequence_ingest import (
+    CODE_TABLE, INVALID_CODE, SKIP_CODE, SequenceValidationError, invalid_character_message, to_bytes
+)
+from .splice_scanner import (
+    ACCEPTOR_MOTIF, DONOR_MOTIF, STOP_CODONS, SpliceSiteScan, base_counts, find_dinucleotide,
+    find_motif
+)
+from .splice_scoring import score_positions
+
+MIN_SHARD_SIZE = 1 << 20
+SHARDS_PER_WORKER = 4
+# Bases read past the end of a shard so motifs crossing the edge are seen (codons are 3 bp)
+HALO = 2
+
+def _attach(name: str, size: int, dtype=np.uint8):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((size,), dtype=dtype, buffer=shm.buf)
+
+
+def _count_valid(raw_name: str, raw_size: int, start: int, end: int) -> tuple:
+    """Bases kept in a raw shard, and the position of its first invalid byte (-1 if none)"""
+    shm, raw = _attach(raw_name, raw_size)
+    try:
+        mapped = CODE_TABLE[raw[start:end]]
+        invalid = np.flatnonzero(mapped == INVALID_CODE)
+        first_invalid = start + int(invalid[0]) if len(invalid) else -1
+        return int(np.count_nonzero(mapped < SKIP_CODE)), first_invalid
+    finally:
+        del raw
+        shm.close()
+
+
+def _compact_shard(raw_name: str, raw_size: int, start: int, end: int,
+                   codes_name: str, codes_size: int, offset: int):
+    raw_shm, raw = _attach(raw_name, raw_size)
+    codes_shm, codes = _attach(codes_name, codes_size)
+    try:
+        shard = CODE_TABLE[raw[start:end]]
+        shard = shard[shard < SKIP_CODE]
+        codes[offset:offset + len(shard)] = shard
+    finally:
+        del raw, codes
+        raw_shm.close()
+        codes_shm.close()
+
+
+def _scan_shard(codes_name: str, codes_size: int, start: int, end: int,
+                donor_model, acceptor_model, acceptor_screen=None) -> tuple:
+    shm, codes = _attach(codes_name, codes_size)
+    try:
+        # Scoring windows and the acceptor screen also need context on both sides of a site
+        screen_reach = acceptor_screen.reach if acceptor_screen is not None else 0
+        left = max(donor_model.motif_offset, acceptor_model.motif_offset, screen_reach)
+        right = max(HALO, donor_model.window - donor_model.motif_offset,
+                    acceptor_model.window - acceptor_model.motif_offset, screen_reach)
+        first = max(start - left, 0)
+        window = codes[first:min(end + right, codes_size)]
+        core_start, core_end = start - first, end - first
+
+        def owned(positions):
+            return positions[(positions >= core_start) & (positions < core_end)]
+
+        donors = owned(find_dinucleotide(window, *DONOR_MOTIF))
+        acceptors = owned(find_dinucleotide(window, *ACCEPTOR_MOTIF))
+        if acceptor_screen is not None:
+            acceptors = acceptor_screen.screen(window, acceptors)
+        donor_scores = score_positions(window, donors, donor_model)
+        acceptor_scores = score_positions(window, acceptors, acceptor_model)
+        has_start = len(owned(find_motif(window, 'ATG'))) > 0
+        has_stop = any(len(owned(find_motif(window, stop))) > 0 for stop in STOP_CODONS)
+        counts = base_counts(window[core_start:core_end])
+        return (donors + first, acceptors + first, donor_scores, acceptor_scores,
+                counts, has_start, has_stop)
+    finally:
+        del codes
+        shm.close()
+
+
+def _shard_bounds(length: int, shard_size: int) -> list:
+    return [(start, min(start + shard_size, length)) for start in range(0, length, shard_size)]
+
+
+def _map(executor, fn, arg_tuples: list) -> list:
+    if not arg_tuples:
+        return []
+    return list(executor.map(fn, *zip(*arg_tuples)))
+
+
+def scan_sharded(sequence: str, donor_model, acceptor_model,
+                 workers: int = None, shard_size: int = None, acceptor_screen=None) -> tuple:
+    """Clean, scan and score one long sequence in parallel shards
+
+    Returns (scan, has_start, has_stop) for the cleaned sequence, exactly as
+    a single-process scan would see it. Cleaning follows sequence_ingest:
+    whitespace is dropped, ambiguity codes become N, and any other
+    character raises SequenceValidationError. With an acceptor_screen
+    (branch_point.AcceptorScreen), acceptors failing it are dropped in
+    the shards before they are scored.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context, shared_memory
+
+    workers = workers or os.cpu_count() or 1
+    raw_bytes = to_bytes(sequence)
+    raw_length = len(raw_bytes)
+    raw_size = max(raw_length, 1)
+    if shard_size is None:
+        shard_size = max(MIN_SHARD_SIZE, -(-raw_length // (workers * SHARDS_PER_WORKER)))
+
+    raw_shm = shared_memory.SharedMemory(create=True, size=raw_size)
+    codes_shm = None
+    try:
+        raw_shm.buf[:raw_length] = raw_bytes
+        del raw_bytes
+        raw_bounds = _shard_bounds(raw_length, shard_size)
+
+        # Spawned, not forked: callers such as the Streamlit app run other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as executor:
+            # Pass 1: valid bases per raw shard give each shard its offset in the cleaned sequence
+            counted = _map(executor, _count_valid, [
+                (raw_shm.name, raw_size, start, end) for start, end in raw_bounds
+            ])
+            invalid = [first for _, first in counted if first >= 0]
+            if invalid:
+                raise SequenceValidationError(
+                    invalid_character_message(raw_shm.buf[min(invalid)], min(invalid)))
+            valid = [kept for kept, _ in counted]
+            offsets = np.concatenate([[0], np.cumsum(valid, dtype=np.int64)])
+            codes_size = int(offsets[-1])
+
+            codes_shm = shared_memory.SharedMemory(create=True, size=max(codes_size, 1))
+            # Pass 2: every shard writes its cleaned codes at its own offset
+            _map(executor, _compact_shard, [
+                (raw_shm.name, raw_size, start, end, codes_shm.name, codes_size, int(offset))
+                for (start, end), offset in zip(raw_bounds, offsets[:-1])
+            ])
+
+            # Pass 3: scan cleaned shards with a halo, keeping only sites that start in the shard
+            code_bounds = _shard_bounds(codes_size, shard_size)
+            parts = _map(executor, _scan_shard, [
+                (codes_shm.name, codes_size, start, end, donor_model, acceptor_model, acceptor_screen)
+                for start, end in code_bounds
+            ])
+
+        codes = np.ndarray((codes_size,), dtype=np.uint8, buffer=codes_shm.buf).copy()
+    finally:
+        raw_shm.close()
+        raw_shm.unlink()
+        if codes_shm is not None:
+            codes_shm.close()
+            codes_shm.unlink()
+
+    def merged(field, dtype):
+        if not parts:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([part[field] for part in parts])
+
+    counts = np.sum([part[4] for part in parts], axis=0) if parts else np.zeros(5, dtype=np.int64)
+    scan = SpliceSiteScan(codes, merged(0, np.int64), merged(1, np.int64), counts, codes)
+    scan.donor_scores = merged(2, np.float64)
+    scan.acceptor_scores = merged(3, np.float64)
+    has_start = any(part[5] for part in parts)
+    has_stop = any(part[6] for part in parts)
+    return scan, has_start, has_stop
@@ -0,0 +1,396 @@
+"""
+Headless batch runner: scan FASTA files for splice sites and intron candidates
+
+    python -m splice_junction.splice_cli genomes/ extra.fa.gz -o sites.bed --workers 8
+    python -m splice_junction.splice_cli assembly.fa -o sites.parquet --min-intron-score 25
+
+Records are read chunk by chunk and scored on a process pool; sites and
+introns are written as each chunk comes back, in genome coordinates
+(N bases are kept, as in the interactive analyzer).
+"""
+
+import os
+import sys
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from .fasta_stream import DEFAULT_CHUNK_SIZE, iter_sequence_chunks
+from .intron_pairing import (
+    DEFAULT_MAX_INTRON_LENGTH, DEFAULT_MIN_INTRON_LENGTH, DEFAULT_MIN_INTRON_SCORE, iter_intron_candidates
+)
+from .splice_scanner import ACCEPTOR_MOTIF, DONOR_MOTIF, find_dinucleotide
+from .splice_scoring import (
+    default_acceptor_model, default_donor_model, load_model, score_positions
+)
+
+FASTA_SUFFIXES = ('.fa', '.fasta', '.fna', '.fas', '.ffn', '.frn', '.fq', '.fastq')
+# Chunks in flight per worker
+PREFETCH_PER_WORKER = 4
+DEFAULT_MIN_SITE_SCORE = 5.0
+SOURCE = 'splice-junction'
+
+
+def iter_input_files(paths):
+    """FASTA/FASTQ files given directly or found (recursively, sorted) under directories"""
+    for path in map(Path, paths):
+        if path.is_dir():
+            for found in sorted(path.rglob('*')):
+                name = found.name.lower()
+                if name.endswith('.gz'):
+                    name = name[:-3]
+                if found.is_file() and name.endswith(FASTA_SUFFIXES):
+                    yield found
+        else:
+            yield path
+
+
+class SiteScanner:
+    """Scores the sites a chunk owns; shared by the parent and pool workers
+
+    A chunk carries `overlap` bases of the previous one. Sites are owned by
+    the chunk whose window fits entirely inside it, so every site is
+    reported exactly once with the same score as in a single pass.
+    """
+
+    def __init__(self, donor_model, acceptor_model, min_donor_score: float = None,
+                 min_acceptor_score: float = None):
+        self.donor_model = donor_model
+        self.acceptor_model = acceptor_model
+        self.min_donor_score = min_donor_score
+        self.min_acceptor_score = min_acceptor_score
+        models = (donor_model, acceptor_model)
+        self.left_context = max(model.motif_offset for model in models)
+        self.right_context = max(max(model.window - model.motif_offset for model in models), 2)
+
+    @property
+    def overlap(self) -> int:
+        return self.left_context + self.right_context
+
+    def owned_range(self, start: int, overlap: int, length: int, is_last: bool) -> tuple:
+        own_lo = max(start + overlap - self.right_context, 0) if overlap else start
+        own_hi = start + length if is_last else start + length - self.right_context
+        return own_lo, own_hi
+
+    def _sites(self, codes, start, own_lo, own_hi, motif, model, min_score):
+        local = find_dinucleotide(codes, *motif)
+        positions = local + start
+        keep = (positions >= own_lo) & (positions < own_hi)
+        local, positions = local[keep], positions[keep]
+        scores = score_positions(codes, local, model)
+        if min_score is not None:
+            keep = scores >= min_score
+            positions, scores = positions[keep], scores[keep]
+        return positions, scores
+
+    def scan(self, codes: np.ndarray, start: int, overlap: int, is_last: bool) -> tuple:
+        """(donor positions, donor scores, acceptor positions, acceptor scores) in record coordinates"""
+        own_lo, own_hi = self.owned_range(start, overlap, len(codes), is_last)
+        donors, donor_scores = self._sites(codes, start, own_lo, own_hi, DONOR_MOTIF,
+                                           self.donor_model, self.min_donor_score)
+        acceptors, acceptor_scores = self._sites(codes, start, own_lo, own_hi, ACCEPTOR_MOTIF,
+                                                 self.acceptor_model, self.min_acceptor_score)
+        return donors, donor_scores, acceptors, acceptor_scores
+
+
+_worker_scanner = None
+
+
+def _init_worker(scanner):
+    global _worker_scanner
+    _worker_scanner = scanner
+
+
+def _scan_task(codes, start, overlap, is_last):
+    return _worker_scanner.scan(codes, start, overlap, is_last)
+
+
+class IntronPairer:
+    """Pairs each chunk's acceptors with donors seen so far in the same record
+
+    Only donors that can still reach a later acceptor (within max_length)
+    are kept between chunks.
+    """
+
+    def __init__(self, min_length: int = DEFAULT_MIN_INTRON_LENGTH,
+                 max_length: int = DEFAULT_MAX_INTRON_LENGTH, min_score: float = None):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_score = min_score
+        self.reset()
+
+    def reset(self):
+        self.donors = np.empty(0, dtype=np.int64)
+        self.donor_scores = np.empty(0, dtype=np.float64)
+
+    def add(self, donors, donor_scores, acceptors, acceptor_scores, next_start: int = None):
+        """Yield (donors, acceptors, scores) batches for this chunk's acceptors"""
+        self.donors = np.concatenate([self.donors, donors])
+        self.donor_scores = np.concatenate([self.donor_scores, donor_scores])
+        for donor_index, acceptor_index in iter_intron_candidates(
+                self.donors, acceptors, self.min_length, self.max_length):
+            scores = self.donor_scores[donor_index] + acceptor_scores[acceptor_index]
+            if self.min_score is not None:
+                keep = scores >= self.min_score
+                donor_index, acceptor_index, scores = donor_index[keep], acceptor_index[keep], scores[keep]
+            if len(scores):
+                yield self.donors[donor_index], acceptors[acceptor_index], scores
+
+        if next_start is not None:
+            # Later acceptors sit at or after next_start
+            keep = self.donors >= next_start + 2 - self.max_length
+            self.donors, self.donor_scores = self.donors[keep], self.donor_scores[keep]
+
+
+def _probability_score(scores: np.ndarray) -> list:
+    """BED scores (0-1000) from log2-odds scores, as site_probability x10"""
+    scores = np.clip(scores, -60.0, 60.0)
+    return np.rint(1000.0 / (1.0 + np.exp2(-scores))).astype(np.int64).tolist()
+
+
+class BedWriter:
+    """BED6: name is the feature type, score the site probability x10, strand +"""
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def write_sites(self, record: str, feature: str, positions, scores):
+        self.handle.writelines(
+            f"{record}\t{p}\t{p + 2}\t{feature}\t{s}\t+\n"
+            for p, s in zip(positions.tolist(), _probability_score(scores)))
+
+    def write_introns(self, record: str, donors, acceptors, scores):
+        self.handle.writelines(
+            f"{record}\t{d}\t{a + 2}\tintron\t{s}\t+\n"
+            for d, a, s in zip(donors.tolist(), acceptors.tolist(), _probability_score(scores)))
+
+    def close(self):
+        self.handle.flush()
+
+
+class Gff3Writer:
+    """GFF3 with Sequence Ontology feature types and the raw log2-odds score"""
+
+    SITE_TYPES = {'donor': 'five_prime_cis_splice_site', 'acceptor': 'three_prime_cis_splice_site'}
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.handle.write('##gff-version 3\n')
+
+    def write_sites(self, record: str, feature: str, positions, scores):
+        kind = self.SITE_TYPES[feature]
+        self.handle.writelines(
+            f"{record}\t{SOURCE}\t{kind}\t{p + 1}\t{p + 2}\t{s:.3f}\t+\t.\tName={feature}\n"
+            for p, s in zip(positions.tolist(), scores.tolist()))
+
+    def write_introns(self, record: str, donors, acceptors, scores):
+        self.handle.writelines(
+            f"{record}\t{SOURCE}\tintron\t{d + 1}\t{a + 2}\t{s:.3f}\t+\t.\tName=intron\n"
+            for d, a, s in zip(donors.tolist(), acceptors.tolist(), scores.tolist()))
+
+    def close(self):
+        self.handle.flush()
+
+
+class ParquetWriter:
+    """One row group per written batch; columns record, feature, start, end, score, strand
+
+    Coordinates are 0-based half-open as in BED. Requires pyarrow.
+    """
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([
+            ('record', pa.string()), ('feature', pa.string()), ('start', pa.int64()),
+            ('end', pa.int64()), ('score', pa.float64()), ('strand', pa.string())
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def _write(self, record, feature, starts, ends, scores):
+        if not len(starts):
+            return
+        pa = self._pa
+        count = len(starts)
+        table = pa.table({
+            'record': pa.repeat(record, count).cast(pa.string()),
+            'feature': pa.repeat(feature, count).cast(pa.string()),
+            'start': pa.array(starts, pa.int64()),
+            'end': pa.array(ends, pa.int64()),
+            'score': pa.array(scores, pa.float64()),
+            'strand': pa.repeat('+', count).cast(pa.string())
+        }, schema=self.schema)
+        self.writer.write_table(table)
+
+    def write_sites(self, record: str, feature: str, positions, scores):
+        self._write(record, feature, positions, positions + 2, scores)
+
+    def write_introns(self, record: str, donors, acceptors, scores):
+        self._write(record, 'intron', donors, acceptors + 2, scores)
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'bed': BedWriter, 'gff3': Gff3Writer, 'parquet': ParquetWriter}
+
+
+def output_format(path: str, requested: str = None) -> str:
+    if requested:
+        return requested
+    suffix = Path(path).suffix.lower()
+    return {'.gff': 'gff3', '.gff3': 'gff3', '.parquet': 'parquet', '.pq': 'parquet'}.get(suffix, 'bed')
+
+
+class ChunkInfo:
+    """What the writer needs to know about a chunk once its codes are gone"""
+
+    __slots__ = ('name', 'start', 'length', 'is_last', 'invalid')
+
+    def __init__(self, chunk):
+        self.name = chunk.name
+        self.start = chunk.start
+        self.length = len(chunk.codes)
+        self.is_last = chunk.is_last
+        self.invalid = chunk.invalid
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length
+
+
+def iter_chunk_results(files, scanner: SiteScanner, workers: int = 1,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield (path, chunk, site arrays) for every chunk of every file, in input order
+
+    At most workers * PREFETCH_PER_WORKER chunks are in flight, so memory
+    does not grow with the input.
+    """
+    chunks = ((path, chunk) for path in files
+              for chunk in iter_sequence_chunks(path, chunk_size, scanner.overlap))
+
+    if workers == 1:
+        for path, chunk in chunks:
+            yield path, ChunkInfo(chunk), scanner.scan(chunk.codes, chunk.start, chunk.overlap,
+                                                       chunk.is_last)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(scanner,)) as executor:
+        pending = deque()
+        for path, chunk in chunks:
+            future = executor.submit(_scan_task, chunk.codes, chunk.start, chunk.overlap, chunk.is_last)
+            # Only the metadata is kept here; the codes travel to the worker
+            pending.append((path, ChunkInfo(chunk), future))
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                path, info, future = pending.popleft()
+                yield path, info, future.result()
+        while pending:
+            path, info, future = pending.popleft()
+            yield path, info, future.result()
+
+
+def run(paths, output, fmt: str = None, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+        donor_model=None, acceptor_model=None,
+        min_donor_score: float = DEFAULT_MIN_SITE_SCORE,
+        min_acceptor_score: float = DEFAULT_MIN_SITE_SCORE,
+        min_intron_score: float = DEFAULT_MIN_INTRON_SCORE,
+        min_intron_length: int = DEFAULT_MIN_INTRON_LENGTH,
+        max_intron_length: int = DEFAULT_MAX_INTRON_LENGTH,
+        sites: bool = True, introns: bool = True, log=None) -> dict:
+    """Scan every input and stream features to output ('-' for stdout); returns totals"""
+    scanner = SiteScanner(
+        load_model(donor_model) if donor_model else default_donor_model(),
+        load_model(acceptor_model) if acceptor_model else default_acceptor_model(),
+        min_donor_score, min_acceptor_score)
+    pairer = IntronPairer(min_intron_length, max_intron_length, min_intron_score)
+    fmt = output_format(output, fmt)
+    workers = workers or os.cpu_count() or 1
+
+    if fmt == 'parquet':
+        if output == '-':
+            raise ValueError("Parquet output needs a file path")
+        writer = ParquetWriter(output)
+        handle = None
+    else:
+        handle = sys.stdout if output == '-' else open(output, 'w')
+        writer = WRITERS[fmt](handle)
+
+    totals = {'files': 0, 'records': 0, 'bases': 0, 'donors': 0, 'acceptors': 0, 'introns': 0,
+              'invalid': 0}
+    current_path = None
+    try:
+        for path, chunk, (donors, donor_scores, acceptors, acceptor_scores) in iter_chunk_results(
+                iter_input_files(paths), scanner, workers, chunk_size):
+            if path != current_path:
+                current_path = path
+                totals['files'] += 1
+            record = chunk.name
+            if sites:
+                writer.write_sites(record, 'donor', donors, donor_scores)
+                writer.write_sites(record, 'acceptor', acceptors, acceptor_scores)
+            if introns:
+                next_start = None if chunk.is_last else chunk.end - scanner.right_context
+                for batch in pairer.add(donors, donor_scores, acceptors, acceptor_scores, next_start):
+                    writer.write_introns(record, *batch)
+                    totals['introns'] += len(batch[2])
+            totals['donors'] += len(donors)
+            totals['acceptors'] += len(acceptors)
+            totals['invalid'] += chunk.invalid
+            if chunk.is_last:
+                pairer.reset()
+                totals['records'] += 1
+                totals['bases'] += chunk.end
+                if log:
+                    log(f"{path}: {record} ({chunk.end:,} bp)")
+    finally:
+        writer.close()
+        if handle is not None and handle is not sys.stdout:
+            handle.close()
+    return totals
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scan FASTA files for splice sites and intron candidates")
+    parser.add_argument('inputs', nargs='+', help="FASTA/FASTQ files (optionally gzipped) or directories")
+    parser.add_argument('-o', '--output', default='-', help="output path, '-' for stdout (default)")
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS),
+                        help="output format (default: from the output extension, else bed)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="bases per chunk")
+    parser.add_argument('--donor-model', help="JSON scoring model for donor sites")
+    parser.add_argument('--acceptor-model', help="JSON scoring model for acceptor sites")
+    parser.add_argument('--min-donor-score', type=float, default=DEFAULT_MIN_SITE_SCORE)
+    parser.add_argument('--min-acceptor-score', type=float, default=DEFAULT_MIN_SITE_SCORE)
+    parser.add_argument('--min-intron-score', type=float, default=DEFAULT_MIN_INTRON_SCORE,
+                        help="minimum donor + acceptor score of reported introns")
+    parser.add_argument('--min-intron-length', type=int, default=DEFAULT_MIN_INTRON_LENGTH)
+    parser.add_argument('--max-intron-length', type=int, default=DEFAULT_MAX_INTRON_LENGTH)
+    parser.add_argument('--no-sites', action='store_true', help="only write intron candidates")
+    parser.add_argument('--no-introns', action='store_true', help="only write splice sites")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no per-record progress on stderr")
+    args = parser.parse_args(argv)
+
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr))
+    totals = run(args.inputs, args.output, args.format, args.workers, args.chunk_size,
+                 args.donor_model, args.acceptor_model,
+                 args.min_donor_score, args.min_acceptor_score, args.min_intron_score,
+                 args.min_intron_length, args.max_intron_length,
+                 sites=not args.no_sites, introns=not args.no_introns, log=log)
+    if log:
+        log(f"Done: {totals['files']} files, {totals['records']} records, {totals['bases']:,} bp, "
+            f"{totals['donors']:,} donors, {totals['acceptors']:,} acceptors, {totals['introns']:,} introns")
+        if totals['invalid']:
+            log(f"Warning: {totals['invalid']:,} characters that are not bases or IUPAC codes were read as N")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
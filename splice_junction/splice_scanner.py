@@ -0,0 +1,245 @@
+"""
+Vectorized splice-site scanner working on a uint8-encoded sequence
+"""
+
+import numpy as np
+
+# Base codes used by every array-based stage
+A, C, G, T, N = 0, 1, 2, 3, 4
+BASES = 'ACGT'
+
+_ENCODE_TABLE = np.full(256, N, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _ENCODE_TABLE[ord(_base)] = _code
+    _ENCODE_TABLE[ord(_base.lower())] = _code
+
+_DECODE_TABLE = np.frombuffer(b'ACGTN', dtype=np.uint8)
+
+_COMPLEMENT_TABLE = np.array([T, G, C, A, N], dtype=np.uint8)
+
+# Bases each IUPAC code stands for; N in a motif also matches masked bases
+IUPAC_BASES = {
+    'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T',
+    'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT', 'M': 'AC',
+    'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGTN'
+}
+
+DONOR_MOTIF = (G, T)
+ACCEPTOR_MOTIF = (A, G)
+# The same motifs on the reverse strand, as read on the forward strand
+MINUS_DONOR_MOTIF = (A, C)
+MINUS_ACCEPTOR_MOTIF = (C, T)
+STOP_CODONS = ('TAA', 'TAG', 'TGA')
+
+
+def encode_sequence(sequence) -> np.ndarray:
+    """Encode a DNA string (or bytes) into a uint8 code array, non-ACGT -> N
+
+    Arrays are returned as-is and stored regions (anything with a codes()
+    method, such as a TwoBitRegion) are decoded straight to codes.
+    """
+    if isinstance(sequence, np.ndarray):
+        return sequence
+    if hasattr(sequence, 'codes'):
+        return sequence.codes()
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', 'replace')
+    return _ENCODE_TABLE[np.frombuffer(sequence, dtype=np.uint8)]
+
+
+def decode_sequence(codes: np.ndarray) -> str:
+    """Decode a code array back into a DNA string"""
+    return _DECODE_TABLE[codes].tobytes().decode('ascii')
+
+
+def complement_codes(codes: np.ndarray) -> np.ndarray:
+    """Base-wise complement of a code array (N stays N)"""
+    return _COMPLEMENT_TABLE[codes]
+
+
+def base_counts(codes: np.ndarray) -> np.ndarray:
+    """Counts of A, C, G, T, N in the encoded sequence"""
+    return np.bincount(codes, minlength=5)[:5]
+
+
+def find_dinucleotide(codes: np.ndarray, first: int, second: int) -> np.ndarray:
+    """Start positions of every occurrence of a dinucleotide"""
+    if len(codes) < 2:
+        return np.empty(0, dtype=np.int64)
+    hits = (codes[:-1] == first) & (codes[1:] == second)
+    return np.flatnonzero(hits)
+
+
+def find_dinucleotides(codes: np.ndarray, motifs) -> list:
+    """Start positions of each of several dinucleotides, from one pass over the sequence"""
+    if len(codes) < 2:
+        return [np.empty(0, dtype=np.int64) for _ in motifs]
+    # Every adjacent pair as a single code 0..24
+    pairs = codes[:-1] * 5 + codes[1:]
+    return [np.flatnonzero(pairs == first * 5 + second) for first, second in motifs]
+
+
+def find_motif(codes: np.ndarray, motif) -> np.ndarray:
+    """Start positions of every occurrence of a short motif (string or codes)"""
+    motif = encode_sequence(motif)
+    span = len(codes) - len(motif) + 1
+    if span <= 0:
+        return np.empty(0, dtype=np.int64)
+    hits = codes[:span] == motif[0]
+    for offset in range(1, len(motif)):
+        hits &= codes[offset:offset + span] == motif[offset]
+    return np.flatnonzero(hits)
+
+
+def _iupac_table(code: str) -> np.ndarray:
+    """Boolean lookup by base code: which codes the IUPAC letter matches"""
+    try:
+        bases = IUPAC_BASES[code.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown IUPAC code {code!r}") from None
+    table = np.zeros(5, dtype=bool)
+    table[[BASES.index(base) if base != 'N' else N for base in bases]] = True
+    return table
+
+
+def iupac_complement(motif: str) -> str:
+    """Reverse complement of an IUPAC motif"""
+    return motif.upper()[::-1].translate(str.maketrans('ACGTURYSWKMBDHVN', 'TGCAAYRSWMKVHDBN'))
+
+
+def iupac_hits(codes: np.ndarray, motif: str) -> np.ndarray:
+    """Boolean per start position (len(codes) - len(motif) + 1 of them): does the IUPAC motif match there"""
+    span = len(codes) - len(motif) + 1
+    if span <= 0:
+        return np.zeros(0, dtype=bool)
+    hits = np.ones(span, dtype=bool)
+    for offset, code in enumerate(motif):
+        if code.upper() != 'N':
+            hits &= _iupac_table(code)[codes[offset:offset + span]]
+    return hits
+
+
+class SpliceSiteScan:
+    """Donor (GT) and acceptor (AG) positions found in one sequence
+
+    Positions are kept as integer arrays; context windows are only
+    built when asked for. Scores are filled in by the scoring stage.
+
+    A '-' strand scan holds reverse-strand sites (AC donors, CT acceptors)
+    at the forward position of their first base. A both-strand scan keeps
+    the '-' strand scan in `reverse`.
+    """
+
+    def __init__(self, sequence, donor_positions: np.ndarray,
+                 acceptor_positions: np.ndarray, counts: np.ndarray,
+                 codes: np.ndarray = None, strand: str = '+'):
+        self.sequence = sequence
+        self.codes = encode_sequence(sequence) if codes is None else codes
+        self.donor_positions = donor_positions
+        self.acceptor_positions = acceptor_positions
+        self.base_counts = counts
+        self.strand = strand
+        self.reverse = None
+        self.donor_scores = None
+        self.acceptor_scores = None
+
+    @property
+    def length(self) -> int:
+        return len(self.sequence)
+
+    @property
+    def total_donors(self) -> int:
+        return len(self.donor_positions)
+
+    @property
+    def total_acceptors(self) -> int:
+        return len(self.acceptor_positions)
+
+    def context(self, position: int, flank: int = 3) -> str:
+        """Sequence around a dinucleotide starting at position"""
+        window = self.sequence[max(0, position - flank):min(self.length, position + 2 + flank)]
+        if isinstance(window, np.ndarray):
+            return decode_sequence(window)
+        return window
+
+    def preview(self, size: int) -> str:
+        """First size bases, with an ellipsis when the sequence is longer"""
+        head = self.sequence[:size]
+        if isinstance(head, np.ndarray):
+            head = decode_sequence(head)
+        return head + '...' if self.length > size else head
+
+    def filter_by_score(self, min_donor_score: float = None,
+                        min_acceptor_score: float = None) -> 'SpliceSiteScan':
+        """New scan keeping only sites at or above the score thresholds"""
+        filtered = SpliceSiteScan(self.sequence, self.donor_positions, self.acceptor_positions,
+                                  self.base_counts, self.codes, self.strand)
+        if self.reverse is not None:
+            filtered.reverse = self.reverse.filter_by_score(min_donor_score, min_acceptor_score)
+        filtered.donor_scores = self.donor_scores
+        filtered.acceptor_scores = self.acceptor_scores
+        if min_donor_score is not None and self.donor_scores is not None:
+            keep = self.donor_scores >= min_donor_score
+            filtered.donor_positions = self.donor_positions[keep]
+            filtered.donor_scores = self.donor_scores[keep]
+        if min_acceptor_score is not None and self.acceptor_scores is not None:
+            keep = self.acceptor_scores >= min_acceptor_score
+            filtered.acceptor_positions = self.acceptor_positions[keep]
+            filtered.acceptor_scores = self.acceptor_scores[keep]
+        return filtered
+
+    def _site_dicts(self, positions: np.ndarray, scores: np.ndarray, limit) -> list:
+        if scores is None:
+            selected = np.arange(len(positions))
+        elif limit is not None and len(scores) > limit:
+            # Only sites scoring at least the limit-th best can make the cut
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates = np.flatnonzero(scores >= kth)
+            selected = candidates[np.lexsort((positions[candidates], -scores[candidates]))]
+        else:
+            # Best-scoring sites first, ties in position order
+            selected = np.lexsort((positions, -scores))
+        if limit is not None:
+            selected = selected[:limit]
+
+        sites = []
+        for i in selected:
+            site = {'position': int(positions[i]), 'context': self.context(int(positions[i])),
+                    'strand': self.strand}
+            if scores is not None:
+                site['score'] = float(scores[i])
+            sites.append(site)
+        return sites
+
+    def donor_sites(self, limit: int = None) -> list:
+        """Donor sites as position/context(/score) dicts"""
+        return self._site_dicts(self.donor_positions, self.donor_scores, limit)
+
+    def acceptor_sites(self, limit: int = None) -> list:
+        """Acceptor sites as position/context(/score) dicts"""
+        return self._site_dicts(self.acceptor_positions, self.acceptor_scores, limit)
+
+
+def scan_splice_sites(sequence, both_strands: bool = False) -> SpliceSiteScan:
+    """Find all GT donor and AG acceptor dinucleotides in one vectorized pass
+
+    With both_strands, reverse-strand sites (AC, CT) come from the same
+    pass and are returned in the scan's `reverse` attribute.
+    """
+    codes = encode_sequence(sequence)
+    motifs = [DONOR_MOTIF, ACCEPTOR_MOTIF]
+    if both_strands:
+        motifs += [MINUS_DONOR_MOTIF, MINUS_ACCEPTOR_MOTIF]
+    found = find_dinucleotides(codes, motifs)
+    source = sequence if isinstance(sequence, str) else codes
+    counts = base_counts(codes)
+    scan = SpliceSiteScan(source, found[0], found[1], counts, codes)
+    if both_strands:
+        scan.reverse = SpliceSiteScan(source, found[2], found[3], counts, codes, strand='-')
+    return scan
+
+
+def reverse_strand_scan(scan: SpliceSiteScan) -> SpliceSiteScan:
+    """'-' strand sites for a sequence that was scanned forward only"""
+    donors, acceptors = find_dinucleotides(scan.codes, [MINUS_DONOR_MOTIF, MINUS_ACCEPTOR_MOTIF])
+    return SpliceSiteScan(scan.sequence, donors, acceptors, scan.base_counts, scan.codes, strand='-')
@@ -0,0 +1,251 @@
+"""
+Position weight matrix and maximum-entropy style splice-site scoring
+
+Windows are taken straight from a strided view over the encoded sequence
+and scored column by column, so there is no Python loop per site. Scores
+are log2 odds against a uniform background; N contributes nothing.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .splice_scanner import N, complement_codes
+
+# Sites scored per batch; bounds the (batch, window) gather buffer
+SCORE_BATCH_SIZE = 1 << 20
+BACKGROUND = 0.25
+PSEUDOCOUNT = 0.001
+
+# Approximate human consensus frequencies (A, C, G, T).
+# Donor 9-mer: 3 exon bases, GT, 4 intron bases (MAG|GTRAGT).
+DONOR_FREQUENCIES = [
+    [0.33, 0.37, 0.18, 0.12],
+    [0.60, 0.13, 0.14, 0.13],
+    [0.09, 0.03, 0.80, 0.08],
+    [0.00, 0.00, 1.00, 0.00],
+    [0.00, 0.00, 0.00, 1.00],
+    [0.60, 0.03, 0.34, 0.03],
+    [0.70, 0.08, 0.12, 0.10],
+    [0.07, 0.05, 0.80, 0.08],
+    [0.16, 0.15, 0.19, 0.50],
+]
+DONOR_MOTIF_OFFSET = 3
+
+# Acceptor 23-mer: 20 intron bases ending in AG, then 3 exon bases ((Y)nNCAG|G).
+ACCEPTOR_FREQUENCIES = (
+    [[0.12, 0.30, 0.12, 0.46]] * 8
+    + [[0.09, 0.33, 0.07, 0.51]] * 8
+    + [
+        [0.24, 0.28, 0.22, 0.26],
+        [0.05, 0.65, 0.01, 0.29],
+        [1.00, 0.00, 0.00, 0.00],
+        [0.00, 0.00, 1.00, 0.00],
+        [0.24, 0.14, 0.50, 0.12],
+        [0.26, 0.20, 0.24, 0.30],
+        [0.26, 0.22, 0.26, 0.26],
+    ]
+)
+ACCEPTOR_MOTIF_OFFSET = 18
+
+
+class PositionWeightMatrix:
+    """Log-odds matrix over a fixed window around the splice dinucleotide"""
+
+    def __init__(self, log_odds, motif_offset: int, name: str = 'pwm'):
+        log_odds = np.asarray(log_odds, dtype=np.float64)
+        self.name = name
+        self.motif_offset = motif_offset
+        # Extra N column scores 0 so a partial window is judged on the bases it has
+        self.table = np.hstack([log_odds, np.zeros((len(log_odds), 1))])
+
+    @classmethod
+    def from_frequencies(cls, frequencies, motif_offset: int, name: str = 'pwm',
+                         background: float = BACKGROUND, pseudocount: float = PSEUDOCOUNT):
+        freqs = np.asarray(frequencies, dtype=np.float64) + pseudocount
+        freqs /= freqs.sum(axis=1, keepdims=True)
+        return cls(np.log2(freqs / background), motif_offset, name)
+
+    @property
+    def window(self) -> int:
+        return len(self.table)
+
+    def score_windows(self, windows: np.ndarray) -> np.ndarray:
+        scores = np.zeros(len(windows), dtype=np.float64)
+        for column in range(self.window):
+            scores += self.table[column][windows[:, column]]
+        return scores
+
+    def to_dict(self) -> dict:
+        return {'type': 'pwm', 'name': self.name, 'motif_offset': self.motif_offset,
+                'log_odds': self.table[:, :N].tolist()}
+
+
+class MaxEntModel:
+    """Maximum-entropy style model: one lookup table over selected window positions
+
+    The bases at `index_positions` form a base-4 index into `table`
+    (log2 scores), as in MaxEntScan's score5 donor model. Optional
+    `consensus` rows add independent log-odds for the remaining positions.
+    """
+
+    def __init__(self, window: int, motif_offset: int, index_positions, table,
+                 consensus: dict = None, name: str = 'maxent'):
+        self.name = name
+        self._window = window
+        self.motif_offset = motif_offset
+        self.index_positions = list(index_positions)
+        self.table = np.asarray(table, dtype=np.float64)
+        if len(self.table) != 4 ** len(self.index_positions):
+            raise ValueError("MaxEnt table size must be 4 ** len(index_positions)")
+        self.consensus = {int(pos): np.append(np.asarray(row, dtype=np.float64), 0.0)
+                          for pos, row in (consensus or {}).items()}
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @classmethod
+    def from_table_file(cls, path, window: int, motif_offset: int, index_positions,
+                        consensus: dict = None, log_scale: bool = False, name: str = None):
+        """Load a MaxEntScan-style table (one value per line, in index order)
+
+        MaxEntScan ships probability ratios, so values are log2-transformed
+        unless log_scale says they already are scores.
+        """
+        values = np.loadtxt(path, dtype=np.float64, usecols=-1, ndmin=1)
+        table = values if log_scale else np.log2(np.maximum(values, 1e-300))
+        return cls(window, motif_offset, index_positions, table, consensus, name or Path(path).stem)
+
+    def score_windows(self, windows: np.ndarray) -> np.ndarray:
+        index = np.zeros(len(windows), dtype=np.int64)
+        has_n = np.zeros(len(windows), dtype=bool)
+        for pos in self.index_positions:
+            column = windows[:, pos]
+            has_n |= column == N
+            index = index * 4 + np.where(column == N, 0, column)
+        scores = self.table[index]
+        # No table entry covers N, so such windows get the table's average
+        scores[has_n] = self.table.mean()
+        for pos, row in self.consensus.items():
+            scores += row[windows[:, pos]]
+        return scores
+
+    def to_dict(self) -> dict:
+        return {'type': 'maxent', 'name': self.name, 'window': self.window,
+                'motif_offset': self.motif_offset, 'index_positions': self.index_positions,
+                'table': self.table.tolist(),
+                'consensus': {pos: row[:N].tolist() for pos, row in self.consensus.items()}}
+
+
+class ReverseComplementModel:
+    """Scores reverse-strand sites of `model` on forward-strand windows
+
+    Positions are the forward coordinate of the site's first base (the
+    reverse-complemented dinucleotide), so the window is mirrored around
+    it. Each scored batch is flipped and complemented; the sequence itself
+    never is.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.name = f'{model.name}_rc'
+
+    @property
+    def window(self) -> int:
+        return self.model.window
+
+    @property
+    def motif_offset(self) -> int:
+        return self.model.window - self.model.motif_offset - 2
+
+    def score_windows(self, windows: np.ndarray) -> np.ndarray:
+        return self.model.score_windows(complement_codes(windows[:, ::-1]))
+
+
+def default_donor_model() -> PositionWeightMatrix:
+    return PositionWeightMatrix.from_frequencies(DONOR_FREQUENCIES, DONOR_MOTIF_OFFSET, 'donor_pwm')
+
+
+def default_acceptor_model() -> PositionWeightMatrix:
+    return PositionWeightMatrix.from_frequencies(ACCEPTOR_FREQUENCIES, ACCEPTOR_MOTIF_OFFSET,
+                                                 'acceptor_pwm')
+
+
+def load_model(path):
+    """Load a scoring model from JSON
+
+    PWM:    {"type": "pwm", "motif_offset": 3, "frequencies": [[A, C, G, T], ...]}
+            (or "log_odds" instead of "frequencies")
+    MaxEnt: {"type": "maxent", "window": 9, "motif_offset": 3,
+             "index_positions": [0, 1, 2, 5, 6, 7, 8],
+             "table": [...] or "table_file": "me2x5", "consensus": {"3": [...]}}
+    """
+    path = Path(path)
+    spec = json.loads(path.read_text())
+    name = spec.get('name', path.stem)
+    if spec.get('type', 'pwm') == 'pwm':
+        if 'frequencies' in spec:
+            return PositionWeightMatrix.from_frequencies(spec['frequencies'], spec['motif_offset'], name)
+        return PositionWeightMatrix(spec['log_odds'], spec['motif_offset'], name)
+    if spec['type'] == 'maxent':
+        if 'table_file' in spec:
+            return MaxEntModel.from_table_file(
+                path.parent / spec['table_file'], spec['window'], spec['motif_offset'],
+                spec['index_positions'], spec.get('consensus'), spec.get('log_scale', False), name)
+        return MaxEntModel(spec['window'], spec['motif_offset'], spec['index_positions'],
+                           spec['table'], spec.get('consensus'), name)
+    raise ValueError(f"Unknown scoring model type: {spec['type']}")
+
+
+def model_digest(model) -> str:
+    """Short content hash of a scoring model, for cache keys"""
+    digest = hashlib.sha256(np.ascontiguousarray(model.table).tobytes())
+    digest.update(json.dumps([type(model).__name__, model.window, model.motif_offset,
+                              getattr(model, 'index_positions', None)]).encode('utf-8'))
+    for pos, row in sorted(getattr(model, 'consensus', {}).items()):
+        digest.update(str(pos).encode('utf-8') + row.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def score_positions(codes: np.ndarray, positions: np.ndarray, model) -> np.ndarray:
+    """Score every site in bulk; positions are the first base of the dinucleotide
+
+    Windows that run off either end of the sequence are padded with N.
+    """
+    window = model.window
+    starts = np.asarray(positions, dtype=np.int64) - model.motif_offset
+    scores = np.empty(len(starts), dtype=np.float64)
+    inside = (starts >= 0) & (starts + window <= len(codes))
+
+    if len(codes) >= window:
+        views = sliding_window_view(codes, window)
+        inner = np.flatnonzero(inside)
+        for begin in range(0, len(inner), SCORE_BATCH_SIZE):
+            batch = inner[begin:begin + SCORE_BATCH_SIZE]
+            scores[batch] = model.score_windows(views[starts[batch]])
+
+    edge = np.flatnonzero(~inside)
+    if len(edge):
+        padded = np.full((len(edge), window), N, dtype=np.uint8)
+        offsets = starts[edge][:, None] + np.arange(window)
+        valid = (offsets >= 0) & (offsets < len(codes))
+        padded[valid] = codes[offsets[valid]]
+        scores[edge] = model.score_windows(padded)
+    return scores
+
+
+def score_scan(scan, donor_model, acceptor_model):
+    """Attach donor and acceptor scores to a SpliceSiteScan in place"""
+    scan.donor_scores = score_positions(scan.codes, scan.donor_positions, donor_model)
+    scan.acceptor_scores = score_positions(scan.codes, scan.acceptor_positions, acceptor_model)
+    return scan
+
+
+def site_probability(score: float) -> float:
+    """Posterior probability (%) of a real site for a log2-odds score, equal priors"""
+    score = min(max(float(score), -60.0), 60.0)
+    return 100.0 / (1.0 + 2.0 ** -score)
@@ -0,0 +1,224 @@
+"""
+2-bit packed, memory-mapped sequence store with a separate N-mask
+
+File layout (little-endian):
+    header   magic 'SJ2B', version u32, record count u32, index offset u64
+    records  packed bases (4 per byte, first base in the high bits),
+             then N-run intervals as int64 (start, end) pairs
+    index    per record: name length u16, name, length u64,
+             packed offset u64, N-run count u64, N-run offset u64
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+from .fasta_stream import DEFAULT_CHUNK_SIZE, iter_sequence_chunks
+from .splice_scanner import N, decode_sequence
+
+MAGIC = b'SJ2B'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIQ')
+_INDEX_ENTRY = struct.Struct('<QQQQ')
+_SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+
+def pack_codes(codes: np.ndarray) -> bytes:
+    """Pack codes (length a multiple of 4 unless last) into 2-bit bytes, N stored as A"""
+    bases = np.where(codes < N, codes, 0).astype(np.uint8)
+    padded = np.zeros(-(-len(bases) // 4) * 4, dtype=np.uint8)
+    padded[:len(bases)] = bases
+    quads = padded.reshape(-1, 4) << _SHIFTS
+    return np.bitwise_or.reduce(quads, axis=1).astype(np.uint8).tobytes()
+
+
+def unpack_codes(packed: np.ndarray, first: int, count: int) -> np.ndarray:
+    """Unpack count bases starting at base `first` of the packed array"""
+    codes = ((packed[:, None] >> _SHIFTS) & 3).reshape(-1)
+    return codes[first:first + count]
+
+
+def n_runs(codes: np.ndarray, offset: int = 0) -> np.ndarray:
+    """(start, end) intervals of N runs, shifted by offset"""
+    is_n = np.concatenate([[False], codes == N, [False]])
+    edges = np.flatnonzero(is_n[1:] != is_n[:-1])
+    return edges.reshape(-1, 2).astype(np.int64) + offset
+
+
+class TwoBitWriter:
+    """Streaming writer; each record is written chunk by chunk between begin and end"""
+
+    def __init__(self, path):
+        self.handle = open(path, 'wb')
+        self.handle.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.index = []
+        self._record = None
+
+    @property
+    def in_record(self) -> bool:
+        return self._record is not None
+
+    def begin_record(self, name: str):
+        self._record = {
+            'name': name,
+            'offset': self.handle.tell(),
+            'length': 0,
+            'carry': np.empty(0, dtype=np.uint8),
+            'runs': []
+        }
+
+    def write_codes(self, codes: np.ndarray):
+        record = self._record
+        if len(codes) == 0:
+            return
+        runs = record['runs']
+        chunk_runs = n_runs(codes, record['length'])
+        # An N run that spans a chunk edge is merged into one interval
+        if runs and len(chunk_runs) and runs[-1][-1, 1] == chunk_runs[0, 0]:
+            runs[-1][-1, 1] = chunk_runs[0, 1]
+            chunk_runs = chunk_runs[1:]
+        if len(chunk_runs):
+            runs.append(chunk_runs)
+        record['length'] += len(codes)
+
+        codes = np.concatenate([record['carry'], codes])
+        whole = len(codes) // 4 * 4
+        self.handle.write(pack_codes(codes[:whole]))
+        record['carry'] = codes[whole:]
+
+    def end_record(self):
+        record = self._record
+        self.handle.write(pack_codes(record['carry']))
+        runs = np.concatenate(record['runs']) if record['runs'] else np.empty((0, 2), dtype=np.int64)
+        runs_offset = self.handle.tell()
+        self.handle.write(runs.astype('<i8').tobytes())
+        self.index.append((record['name'], record['length'], record['offset'], len(runs), runs_offset))
+        self._record = None
+
+    def add_record(self, name: str, chunks):
+        """Append one record given an iterable of code arrays"""
+        self.begin_record(name)
+        for codes in chunks:
+            self.write_codes(codes)
+        self.end_record()
+
+    def close(self):
+        index_offset = self.handle.tell()
+        for name, length, packed_offset, run_count, runs_offset in self.index:
+            raw_name = name.encode('utf-8')
+            self.handle.write(struct.pack('<H', len(raw_name)) + raw_name)
+            self.handle.write(_INDEX_ENTRY.pack(length, packed_offset, run_count, runs_offset))
+        self.handle.seek(0)
+        self.handle.write(_HEADER.pack(MAGIC, VERSION, len(self.index), index_offset))
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pack_fasta(fasta_path, out_path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Convert a (gzipped) FASTA/FASTQ file into the 2-bit store; returns record count"""
+    with TwoBitWriter(out_path) as writer:
+        for chunk in iter_sequence_chunks(fasta_path, chunk_size, overlap=0):
+            if not writer.in_record:
+                writer.begin_record(chunk.name)
+            writer.write_codes(chunk.codes)
+            if chunk.is_last:
+                writer.end_record()
+        return len(writer.index)
+
+
+class TwoBitRegion:
+    """Half-open [start, end) region of a stored record, decoded on demand"""
+
+    def __init__(self, reader: 'TwoBitReader', name: str, start: int, end: int):
+        self.reader = reader
+        self.name = name
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def codes(self) -> np.ndarray:
+        return self.reader.fetch_codes(self.name, self.start, self.end)
+
+
+class TwoBitReader:
+    """Random-access reader over an mmap of a 2-bit store"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a 2-bit sequence store")
+
+        self.records = {}
+        pos = index_offset
+        for _ in range(count):
+            (name_length,) = struct.unpack_from('<H', self._mmap, pos)
+            name = self._mmap[pos + 2:pos + 2 + name_length].decode('utf-8')
+            pos += 2 + name_length
+            self.records[name] = _INDEX_ENTRY.unpack_from(self._mmap, pos)
+            pos += _INDEX_ENTRY.size
+
+    def length(self, name: str) -> int:
+        return self.records[name][0]
+
+    def region(self, name: str, start: int = 0, end: int = None) -> TwoBitRegion:
+        length = self.length(name)
+        end = length if end is None else min(end, length)
+        return TwoBitRegion(self, name, max(0, start), end)
+
+    def _run_view(self, name: str) -> np.ndarray:
+        # Zero-copy, so it must not outlive the call: close() fails while a view is alive
+        _, _, run_count, runs_offset = self.records[name]
+        runs = np.frombuffer(self._mmap, dtype='<i8', count=run_count * 2, offset=runs_offset)
+        return runs.reshape(-1, 2)
+
+    def n_runs(self, name: str) -> np.ndarray:
+        """The record's N-run intervals, copied out of the mapping"""
+        return self._run_view(name).copy()
+
+    def fetch_codes(self, name: str, start: int, end: int) -> np.ndarray:
+        """Decode only the packed bytes covering [start, end)"""
+        length, packed_offset, _, _ = self.records[name]
+        start, end = max(0, start), min(end, length)
+        if end <= start:
+            return np.empty(0, dtype=np.uint8)
+
+        first_byte = start // 4
+        last_byte = (end + 3) // 4
+        packed = np.frombuffer(self._mmap, dtype=np.uint8, count=last_byte - first_byte,
+                               offset=packed_offset + first_byte)
+        codes = unpack_codes(packed, start - first_byte * 4, end - start)
+
+        runs = self._run_view(name)
+        lo = np.searchsorted(runs[:, 1], start, side='right')
+        hi = np.searchsorted(runs[:, 0], end, side='left')
+        if hi > lo:
+            overlapping = np.clip(runs[lo:hi], start, end) - start
+            edges = np.zeros(len(codes) + 1, dtype=np.int32)
+            np.add.at(edges, overlapping[:, 0], 1)
+            np.add.at(edges, overlapping[:, 1], -1)
+            codes[np.cumsum(edges[:-1]) > 0] = N
+        return codes
+
+    def fetch(self, name: str, start: int = 0, end: int = None) -> str:
+        end = self.length(name) if end is None else end
+        return decode_sequence(self.fetch_codes(name, start, end))
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,159 @@
+"""
+Sliding-window feature tracks along a scanned sequence
+
+Every track comes from prefix sums (bases, ORF coverage) or binary
+search (sites) over the whole sequence, so the cost is linear in its
+length and independent of how much windows overlap.
+"""
+
+import numpy as np
+
+from .intron_pairing import _range_max
+from .orf_finder import DEFAULT_MIN_ORF_LENGTH, find_orfs, orf_coverage
+from .splice_scanner import C, G, N
+
+DEFAULT_TRACK_WINDOW = 1000
+# Share of a window inside six-frame ORFs for it to count as coding
+CODING_COVERAGE = 0.5
+# Points per plotted line; longer tracks are reduced to a min/max envelope
+MAX_PLOT_POINTS = 2000
+
+
+def prefix_sums(indicator: np.ndarray) -> np.ndarray:
+    """prefix[i] = indicator[:i].sum(), with prefix[0] = 0"""
+    dtype = np.int32 if len(indicator) < 2 ** 31 else np.int64
+    prefix = np.zeros(len(indicator) + 1, dtype=dtype)
+    np.cumsum(indicator, dtype=dtype, out=prefix[1:])
+    return prefix
+
+
+def window_bounds(length: int, window: int, step: int = None) -> tuple:
+    """Starts and ends of windows tiled every step bases (default half a window)
+
+    A last, shorter window covers any tail the full windows miss.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    step = step or max(window // 2, 1)
+    if step < 1:
+        raise ValueError("step must be at least 1")
+    starts = np.arange(0, max(length - window, 0) + 1, step, dtype=np.int64)
+    if starts[-1] + window < length:
+        starts = np.append(starts, starts[-1] + step)
+    return starts, np.minimum(starts + window, length)
+
+
+def _in_window(positions: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Number of sorted positions in each [start, end)"""
+    return np.searchsorted(positions, ends, side='left') - np.searchsorted(positions, starts, side='left')
+
+
+def _best_in_window(positions: np.ndarray, scores: np.ndarray, starts, ends) -> np.ndarray:
+    """Highest score among sites in each window, -inf where there are none"""
+    lo = np.searchsorted(positions, starts, side='left')
+    hi = np.searchsorted(positions, ends, side='left')
+    best = np.full(len(starts), -np.inf)
+    has = hi > lo
+    if has.any():
+        best[has] = _range_max(scores, lo[has], hi[has])
+    return best
+
+
+def _merged_sites(strands: list, kind: str) -> tuple:
+    """Positions (sorted) and scores of one site type over all strands"""
+    positions = np.concatenate([getattr(s, f'{kind}_positions') for s in strands])
+    scores = np.concatenate([getattr(s, f'{kind}_scores') for s in strands]).astype(np.float64)
+    order = np.argsort(positions, kind='stable')
+    return positions[order], scores[order]
+
+
+def _site_probability(scores: np.ndarray) -> np.ndarray:
+    return 100.0 / (1.0 + np.exp2(-np.clip(scores, -60.0, 60.0)))
+
+
+def compute_tracks(scan, window: int = DEFAULT_TRACK_WINDOW, step: int = None,
+                   min_orf_length: int = DEFAULT_MIN_ORF_LENGTH) -> dict:
+    """Per-window GC %, masked %, site densities (per kb), CpG observed/expected,
+    ORF coverage and class prediction
+
+    `scan` is a scored SpliceSiteScan; both strands are counted when it
+    has a reverse scan. Predictions follow the analyzer's whole-sequence
+    rules, with a window coding when CODING_COVERAGE of it lies in ORFs.
+    Returns equal-length numpy arrays.
+    """
+    codes = scan.codes
+    starts, ends = window_bounds(len(codes), window, step)
+    sizes = ends - starts
+
+    prefix_c = prefix_sums(codes == C)
+    prefix_g = prefix_sums(codes == G)
+    prefix_n = prefix_sums(codes == N)
+    prefix_cpg = prefix_sums((codes[:-1] == C) & (codes[1:] == G))
+
+    c = (prefix_c[ends] - prefix_c[starts]).astype(np.float64)
+    g = (prefix_g[ends] - prefix_g[starts]).astype(np.float64)
+    unmasked = sizes - (prefix_n[ends] - prefix_n[starts])
+    # A CpG starting at the window's last base ends outside it
+    cpg_ends = np.maximum(ends - 1, starts)
+    cpg = (prefix_cpg[cpg_ends] - prefix_cpg[starts]).astype(np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gc_percent = np.where(unmasked > 0, (c + g) / unmasked * 100, np.nan)
+        cpg_ratio = np.where(c * g > 0, cpg * unmasked / (c * g), 0.0)
+
+    strands = [scan] if scan.reverse is None else [scan, scan.reverse]
+    donors, donor_scores = _merged_sites(strands, 'donor')
+    acceptors, acceptor_scores = _merged_sites(strands, 'acceptor')
+    donor_count = _in_window(donors, starts, ends)
+    acceptor_count = _in_window(acceptors, starts, ends)
+    kb = np.maximum(sizes, 1) / 1000.0
+
+    coverage = orf_coverage(find_orfs(codes, min_orf_length), len(codes))
+    orf_fraction = (coverage[ends] - coverage[starts]) / np.maximum(sizes, 1)
+
+    exon = (gc_percent > 50) & (orf_fraction >= CODING_COVERAGE)
+    site = ~exon & ((donor_count > 0) | (acceptor_count > 0))
+    donor_site = site & (donor_count > acceptor_count)
+    acceptor_site = site & ~donor_site
+    intron = ~exon & ~site & (gc_percent < 40)
+
+    prediction = np.full(len(starts), 'unknown', dtype=object)
+    confidence = np.full(len(starts), 50.0)
+    prediction[exon], confidence[exon] = 'exon', 85.0
+    prediction[intron], confidence[intron] = 'intron', 70.0
+    prediction[donor_site] = 'donor_site'
+    confidence[donor_site] = _site_probability(
+        _best_in_window(donors, donor_scores, starts[donor_site], ends[donor_site]))
+    prediction[acceptor_site] = 'acceptor_site'
+    confidence[acceptor_site] = _site_probability(
+        _best_in_window(acceptors, acceptor_scores, starts[acceptor_site], ends[acceptor_site]))
+
+    return {
+        'start': starts,
+        'end': ends,
+        'gc_percent': gc_percent,
+        'masked_percent': (sizes - unmasked) / np.maximum(sizes, 1) * 100,
+        'donor_density': donor_count / kb,
+        'acceptor_density': acceptor_count / kb,
+        'cpg_ratio': cpg_ratio,
+        'orf_coverage': orf_fraction * 100,
+        'prediction': prediction,
+        'confidence': confidence
+    }
+
+
+def downsample_index(values: np.ndarray, max_points: int = MAX_PLOT_POINTS) -> np.ndarray:
+    """Indices of at most max_points values, keeping each bucket's lowest and highest so peaks survive"""
+    if len(values) <= max_points:
+        return np.arange(len(values))
+    buckets = max(max_points // 2, 1)
+    size = -(-len(values) // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:len(values)] = values
+    blocks = padded.reshape(buckets, size)
+    missing = np.isnan(blocks)
+    low = np.argmin(np.where(missing, np.inf, blocks), axis=1)
+    high = np.argmax(np.where(missing, -np.inf, blocks), axis=1)
+    base = np.arange(buckets) * size
+    index = np.unique(np.concatenate([base + low, base + high]))
+    return index[index < len(values)]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from splice_junction.orf_finder import find_orfs
+
+ORF_AFTER_GAP = 'ATG' + 'GCC' * 5 + 'NNN' + 'GCC' * 3 + 'ATG' + 'GCC' * 120 + 'TAA'
+
+
+def reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans('ACGTN', 'TGCAN'))
+
+
+def test_start_before_gap_does_not_hide_downstream_orf():
+    orfs = find_orfs(ORF_AFTER_GAP, both_strands=False)
+    assert orfs['start'].tolist() == [ORF_AFTER_GAP.rindex('ATG')]
+    assert orfs['end'].tolist() == [len(ORF_AFTER_GAP)]
+
+
+def test_gap_on_reverse_strand():
+    sequence = reverse_complement(ORF_AFTER_GAP)
+    orfs = find_orfs(sequence)
+    assert orfs['strand'].tolist() == ['-']
+    assert orfs['start'].tolist() == [0]
+    assert orfs['end'].tolist() == [len(sequence) - ORF_AFTER_GAP.rindex('ATG')]
+
+
+def test_orfs_never_span_masked_bases():
+    rng = np.random.default_rng(0)
+    sequence = ''.join(rng.choice(list('ACGT'), 20000))
+    sequence = sequence[:7000] + 'N' * 5 + sequence[7005:]
+    orfs = find_orfs(sequence, min_length=30)
+    spans_gap = (orfs['start'] < 7005) & (orfs['end'] > 7000)
+    assert len(orfs['start']) and not spans_gap.any()